@@ -0,0 +1,34 @@
+"""LAI Module — auto-generated by Factory OS."""
+import json
+import os
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            self._json_response({'status': 'ok'})
+        elif self.path == '/api/v1/items':
+            self._json_response({'items': [], 'total': 0})
+        else:
+            self.send_error(404)
+
+    def _json_response(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+def create_app():
+    return Handler
+
+def get_items():
+    return {'items': [], 'total': 0}
+
+def health_check():
+    return {'status': 'ok'}
+
+if __name__ == '__main__':
+    server = HTTPServer(('0.0.0.0', 8000), Handler)
+    print('Server running on port 8000')
+    server.serve_forever()
@@ -0,0 +1,20 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.main import health_check, get_items
+
+def test_health():
+    result = health_check()
+    assert result['status'] == 'ok'
+    print('PASS: test_health')
+
+def test_list_items():
+    result = get_items()
+    assert 'items' in result
+    assert result['total'] == 0
+    print('PASS: test_list_items')
+
+if __name__ == '__main__':
+    test_health()
+    test_list_items()
+    print('ALL TESTS PASSED')
@@ -0,0 +1,5 @@
+import os
+
+SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+SUPABASE_KEY = os.environ.get('SUPABASE_KEY', '')
+TENANT_ID = os.environ.get('TENANT_ID', 'default')
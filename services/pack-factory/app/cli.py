@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
 import sys
@@ -12,19 +13,26 @@ from typing import List, Optional, Dict, Any
 import jsonschema
 
 from .book import filemap_from_zip
+from .columnar import COLUMNAR_REL, fleet_report, write_columnar
+from .delta import apply_delta, make_delta
 from .diag import run_diag_on_zip
-from .inventory import scan_zip
-from .merger import merge_packs
+from .digest_cache import DIGEST_CACHE_ENV, DigestCache
+from .inventory import NestedScan, diff_zips, iter_scan_zip, scan_zip, write_scan_ndjson
+from .compression import CompressionPolicy
+from .hashchain import DEFAULT_CHECKPOINT_EVERY, DEFAULT_CHUNK_ENTRIES, checkpoint_entry_name, verify_hashchain
+from .merger import compact_snapshot, merge_packs, plan_merge
 from .oca import new_oca
 from .pack0_validator import report_to_dict, validate_pack0
 from .planner import generate_pack0
 from .pack1 import generate_pack1
 from .onca_scanner import scan_onca, validate_onca
-from .resolver import resolve_to_file
+from .resolver import DEFAULT_MAX_BYTES, DEFAULT_MAX_OPEN, has_glob, load_batch, parse_range, read_ref_range, resolve_batch, resolve_glob, resolve_to_file
+from .store import STORE_REF_PREFIX, PackStore
 from .exporter import export_manual, export_team_pack
 from .leak_check import leak_check_zip
 from .autonomous_agent import run_autonomous
-from .utils import write_json, sha256_file, utc_now_iso
+from .utils import fixed_epoch, json_bytes, reproducible_mode, write_json, sha256_file, utc_now_iso
+from .zipio import PackWriter
 
 
 def _p(path_str: str) -> Path:
@@ -74,18 +82,52 @@ def _actor_from_env_or_arg(arg: str) -> str:
     return os.environ.get("LAI_ACTOR_ID", "").strip() or "unknown"
 
 
+def _checkpoint_key(key_file: str) -> Optional[bytes]:
+    """Chave HMAC dos checkpoints do hashchain: --key-file, senão LAI_HASHCHAIN_KEY."""
+    if (key_file or "").strip():
+        return _p(key_file).read_bytes().strip() or None
+    return os.environ.get("LAI_HASHCHAIN_KEY", "").strip().encode("utf-8") or None
+
+
+def _compression_policy(args: argparse.Namespace) -> CompressionPolicy:
+    return CompressionPolicy(level=args.compress_level, lzma_min_bytes=args.lzma_min_bytes)
+
+
+def _pack_ref(ref: str) -> Path:
+    """Path de pack; refs "store:<nome>" passam intactas (resolvidas pelo PackStore)."""
+    return Path(ref) if ref.startswith(STORE_REF_PREFIX) else _p(ref)
+
+
+def _store(args: argparse.Namespace) -> Optional[PackStore]:
+    return PackStore(_p(args.store)) if getattr(args, "store", "") else None
+
+
+def _digest_cache(args: argparse.Namespace) -> Optional[DigestCache]:
+    """Cache de sha256 por entrada: --digest-cache ou env LAI_DIGEST_CACHE (vazio = sem cache)."""
+    path = (getattr(args, "digest_cache", "") or os.environ.get(DIGEST_CACHE_ENV, "")).strip()
+    return DigestCache(_p(path)) if path else None
+
+
+def _flush_cache(cache: Optional[DigestCache], rep: Dict[str, Any]) -> None:
+    if cache is not None:
+        cache.flush()
+        rep["digest_cache"] = cache.stats()
+
+
+def _patch_suffix(content: str) -> str:
+    """Sufixo único do arquivo no patch pack (modo reprodutível: digest do conteúdo)."""
+    if fixed_epoch() is not None:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:8]
+    return uuid.uuid4().hex[:8]
+
+
 def _mk_patch_pack(out_zip: Path, pack_id: str, version: str, trace_id: str, files: Dict[str, str]) -> None:
     """
     Cria um ZIP de patch pack (pack-first) mínimo:
     - 02_INVENTORY/manifest.json
     - arquivos em history/*
+    Conteúdo todo gerado em memória (sem diretório temporário).
     """
-    tmp_dir = out_zip.parent / f"._tmp_patch_{uuid.uuid4().hex[:8]}"
-    if tmp_dir.exists():
-        import shutil
-        shutil.rmtree(tmp_dir)
-    (tmp_dir / "02_INVENTORY").mkdir(parents=True, exist_ok=True)
-
     manifest = {
         "schema_version": "1.0",
         "pack_id": pack_id,
@@ -97,22 +139,16 @@ def _mk_patch_pack(out_zip: Path, pack_id: str, version: str, trace_id: str, fil
         "entrypoints": [],
         "trace": {"trace_id": trace_id},
     }
-    (tmp_dir / "02_INVENTORY" / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
-
+    entries: Dict[str, bytes] = {"02_INVENTORY/manifest.json": json_bytes(manifest)}
     for rel_path, content in files.items():
-        rp = tmp_dir / rel_path
-        rp.parent.mkdir(parents=True, exist_ok=True)
-        rp.write_text(content, encoding="utf-8")
+        entries[rel_path.replace("\\", "/")] = content.encode("utf-8")
 
+    out_zip.parent.mkdir(parents=True, exist_ok=True)
     if out_zip.exists():
         out_zip.unlink()
-    with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
-        for p in tmp_dir.rglob("*"):
-            if p.is_file():
-                z.write(p, arcname=str(p.relative_to(tmp_dir)).replace("\\", "/"))
-
-    import shutil
-    shutil.rmtree(tmp_dir)
+    with PackWriter(out_zip) as w:
+        for rel_path, data in entries.items():
+            w.add_bytes(rel_path, data)
 
 
 def main(argv: List[str] | None = None) -> int:
@@ -146,11 +182,13 @@ def main(argv: List[str] | None = None) -> int:
     p0.add_argument("--module", required=True)
     p0.add_argument("--out", required=True, help="Diretório de saída (volume /data/out).")
     p0.add_argument("--trace", default="trace_local")
+    p0.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
 
     p0a = sub.add_parser("pack0", help="Alias para plan-pack0 (compatibilidade com o orquestrador).")
     p0a.add_argument("--module", required=True)
     p0a.add_argument("--out", required=True)
     p0a.add_argument("--trace", default="trace_local")
+    p0a.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
 
     # Validate Pack0
     vp0 = sub.add_parser("validate-pack0", help="Valida conformidade do Pack0 (SRS + pack-first).")
@@ -160,12 +198,51 @@ def main(argv: List[str] | None = None) -> int:
 
     # Merge
     pm = sub.add_parser("merge", help="Faz merge de packs ZIP (ordem importa) e gera snapshot.")
-    pm.add_argument("--inputs", nargs="+", required=True, help="Lista de packs ZIP na ordem de aplicação.")
+    pm.add_argument("--inputs", nargs="+", required=True, help="Lista de packs ZIP na ordem de aplicação (com --base: só os novos patches).")
+    pm.add_argument("--base", default="", help="Snapshot já mergeado; aplica só os --inputs sobre ele (merge incremental, streaming).")
     pm.add_argument("--out", required=True, help="ZIP de saída.")
-    pm.add_argument("--tmp", required=True, help="Diretório temporário (volume /data/tmp).")
+    pm.add_argument("--tmp", default="", help="Diretório temporário (volume /data/tmp); só exigido pelo merge por extração (sem --plan/--stream/--base/--store).")
     pm.add_argument("--trace", default="trace_local")
     pm.add_argument("--no-book", action="store_true", help="Desabilita geração automática do Software Book.")
     pm.add_argument("--mode", default="candidate", choices=["candidate", "promoted"], help="candidate=sem gate; promoted=exige approval.")
+    pm.add_argument("--stream", action="store_true", help="Merge streaming ZIP->ZIP (sem extrair layers em --tmp).")
+    pm.add_argument("--plan", action="store_true", help="Só gera o plano JSON (central directories) em --out; não faz merge.")
+    pm.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
+
+    # Compactação de snapshot (base compacta para merge --base)
+    pcm = sub.add_parser("compact", help="Compacta snapshot promoted + linhagem de patch packs numa nova base.")
+    pcm.add_argument("--snapshot", required=True, help="Snapshot promoted (ZIP).")
+    pcm.add_argument("--lineage", nargs="*", default=[], help="Patch packs já incorporados ao snapshot.")
+    pcm.add_argument("--out", required=True, help="ZIP da base compacta.")
+    pcm.add_argument("--trace", default="trace_local")
+    pcm.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
+
+    # Delta entre snapshots
+    psd = sub.add_parser("snapshot-delta", help="Gera delta pack (adicionados/alterados + tombstones) entre dois snapshots.")
+    psd.add_argument("--from", dest="from_zip", required=True, help="Snapshot de origem (ZIP).")
+    psd.add_argument("--to", dest="to_zip", required=True, help="Snapshot de destino (ZIP).")
+    psd.add_argument("--out", required=True, help="ZIP do delta pack.")
+    psd.add_argument("--trace", default="trace_local")
+    psd.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
+
+    psa = sub.add_parser("snapshot-apply", help="Reconstrói o snapshot de destino a partir da origem + delta pack (verificado por digest).")
+    psa.add_argument("--base", required=True, help="Snapshot de origem do delta (ZIP).")
+    psa.add_argument("--delta", required=True, help="Delta pack (ZIP).")
+    psa.add_argument("--out", required=True, help="ZIP reconstruído.")
+    psa.add_argument("--trace", default="trace_local")
+    psa.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
+
+    # Verificação do hashchain
+    pvh = sub.add_parser("verify-hashchain", help="Verifica history/hashchain.jsonl (schema + links) em paralelo, com checkpoints assinados.")
+    pvh.add_argument("--target", required=True, help="Snapshot ZIP (ou hashchain .jsonl).")
+    pvh.add_argument("--out", required=True, help="Arquivo JSON de relatório.")
+    pvh.add_argument("--jobs", type=int, default=0, help="Processos de verificação (0 = todos os cores).")
+    pvh.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_ENTRIES, help="Entradas por segmento verificado em paralelo.")
+    pvh.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY, help="Entradas entre checkpoints.")
+    pvh.add_argument("--checkpoint-out", default="", help="Patch pack ZIP com o checkpoint assinado (aplicar com merge --base).")
+    pvh.add_argument("--key-file", default="", help="Chave HMAC dos checkpoints (default: env LAI_HASHCHAIN_KEY).")
+    pvh.add_argument("--full", action="store_true", help="Ignora checkpoints e verifica a cadeia inteira.")
+    pvh.add_argument("--trace", default="trace_local")
 
     # Diagnóstico
     pd = sub.add_parser("diag", help="Diagnóstico rápido de um pack ZIP.")
@@ -178,6 +255,31 @@ def main(argv: List[str] | None = None) -> int:
     pi.add_argument("--target", required=True)
     pi.add_argument("--out", required=True)
     pi.add_argument("--trace", default="trace_local")
+    pi.add_argument("--jobs", type=int, default=0, help="Threads de hash das entradas (0 = todos os cores, 1 = sequencial).")
+    pi.add_argument("--format", default="json", choices=["json", "ndjson"],
+                    help="json = documento único; ndjson = um item por linha em stream + trailer de summary (memória constante).")
+    pi.add_argument("--recursive", action="store_true", help="Desce em ZIPs aninhados (paths zip::<raiz>::<A.zip>::<arquivo>).")
+    pi.add_argument("--max-depth", type=int, default=4, help="Níveis máximos de ZIP aninhado com --recursive.")
+    pi.add_argument("--max-nested-bytes", type=int, default=512 * 1024 * 1024,
+                    help="ZIP aninhado maior que isto (descomprimido) não é descido.")
+
+    pic = sub.add_parser("inventory-columnar", help=f"Inventário colunar (.npz: path_id/kind/prefix/bytes/sha256), p.ex. {COLUMNAR_REL}.")
+    pic.add_argument("--target", required=True)
+    pic.add_argument("--out", required=True, help="Arquivo .npz (colunas .npy; numpy.load lê direto).")
+    pic.add_argument("--jobs", type=int, default=0, help="Threads de hash das entradas (0 = todos os cores, 1 = sequencial).")
+    pic.add_argument("--trace", default="trace_local")
+
+    pif = sub.add_parser("inventory-fleet", help="Resumos vetorizados (kind/prefixo/tamanho) e joins entre inventários colunares.")
+    pif.add_argument("--inputs", nargs="+", required=True, help="Inventários .npz na ordem dos snapshots.")
+    pif.add_argument("--out", required=True, help="Report JSON.")
+    pif.add_argument("--trace", default="trace_local")
+
+    pid = sub.add_parser("inventory-diff", help="Diff de dois packs pelos central directories (CRC/tamanho; renames por conteúdo).")
+    pid.add_argument("--from", dest="from_zip", required=True, help="Pack ZIP de origem.")
+    pid.add_argument("--to", dest="to_zip", required=True, help="Pack ZIP de destino.")
+    pid.add_argument("--out", required=True, help="Diff JSON.")
+    pid.add_argument("--confirm", action="store_true", help="Confere por sha256 as entradas com mesmo CRC e tamanho.")
+    pid.add_argument("--trace", default="trace_local")
 
     # OCA
     po = sub.add_parser("oca-new", help="Gera template de OCA (contrato auditável de mudança).")
@@ -229,6 +331,23 @@ def main(argv: List[str] | None = None) -> int:
     ps.add_argument("--out", required=True, help="Arquivo JSONL de saída (JSON estrito).")
     ps.add_argument("--trace", default="trace_local")
 
+    # Store local de packs (CAS por sha256)
+    pst = sub.add_parser("store", help="Store local de packs endereçado por conteúdo (dedup + gc).")
+    pst_sub = pst.add_subparsers(dest="store_cmd", required=True)
+    pst_p = pst_sub.add_parser("put", help="Guarda pack ZIP no store (blobs por sha256 + manifest no catalog).")
+    pst_p.add_argument("--store", required=True, help="Diretório do store.")
+    pst_p.add_argument("--pack", required=True, help="Pack ZIP.")
+    pst_p.add_argument("--name", default="", help="Nome no catalog (default: nome do ZIP sem extensão).")
+    pst_p.add_argument("--out", required=True, help="Report JSON.")
+    pst_g = pst_sub.add_parser("get", help="Reconstrói pack ZIP a partir do store.")
+    pst_g.add_argument("--store", required=True, help="Diretório do store.")
+    pst_g.add_argument("--name", required=True, help="Nome no catalog.")
+    pst_g.add_argument("--out", required=True, help="ZIP reconstruído.")
+    pst_gc = pst_sub.add_parser("gc", help="Remove blobs não referenciados pelo catalog.")
+    pst_gc.add_argument("--store", required=True, help="Diretório do store.")
+    pst_gc.add_argument("--out", required=True, help="Report JSON.")
+    pst_gc.add_argument("--dry-run", action="store_true", help="Só conta o que seria removido.")
+
     # Maintenance console
     pmc = sub.add_parser("maint", help="Console de manutenção (snapshot zip).")
     pmc_sub = pmc.add_subparsers(dest="maint_cmd", required=True)
@@ -283,12 +402,15 @@ def main(argv: List[str] | None = None) -> int:
     pet.add_argument("--out", required=True, help="ZIP de saída (team-safe).")
     pet.add_argument("--policy", default="", help="Policy JSON de audiência (opcional). Default: governance/audience_policy.team_pack0_only.v1.json")
     pet.add_argument("--trace", default="trace_local")
+    pet.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
 
     plc = sub.add_parser("leak-check", help="Gate hard no_leak para ZIP (team-safe).")
     plc.add_argument("--target", required=True, help="ZIP para checar.")
     plc.add_argument("--policy", default="", help="Policy JSON (audience). Default: governance/audience_policy.team_pack0_only.v1.json")
     plc.add_argument("--out", required=True, help="Relatório JSON de saída.")
     plc.add_argument("--trace", default="trace_local")
+    plc.add_argument("--content", action="store_true", help="Varre também o conteúdo das entradas permitidas em busca de segredos (tokens/chaves).")
+    plc.add_argument("--jobs", type=int, default=0, help="Threads do scan de conteúdo (0 = todos os cores).")
 
 
     # ONCA (inventário auditável)
@@ -312,8 +434,14 @@ def main(argv: List[str] | None = None) -> int:
 
     # Resolver de zip-chains
     prs = sub.add_parser("resolve", help="Resolve referência zip::...::file e extrai bytes.")
-    prs.add_argument("--ref", required=True)
-    prs.add_argument("--out", required=True)
+    prs.add_argument("--ref", default="", help="Ref única (exige --out); com glob (*, **, ?, [..]) em algum nível, exige --out-dir.")
+    prs.add_argument("--out", default="", help="Arquivo de saída da ref única.")
+    prs.add_argument("--batch", default="", help="refs.jsonl: uma ref por linha (string ou {\"ref\", \"out\"}); exige --out-dir.")
+    prs.add_argument("--out-dir", default="", help="Diretório de saída do batch (report em <out-dir>/resolve.report.json).")
+    prs.add_argument("--range", default="", help="Só os bytes start:end da entrada (p.ex. 0:4096); não lê a entrada inteira.")
+    prs.add_argument("--hash", action="store_true", help="Com --range: inclui o sha256 do trecho no report.")
+    prs.add_argument("--max-open", type=int, default=DEFAULT_MAX_OPEN, help="Batch: máximo de ZIPs abertos no LRU.")
+    prs.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES, help="Batch: bytes máximos de ZIPs aninhados em memória no LRU.")
     prs.add_argument("--trace", default="trace_local")
 
     # Pack1 scaffold (thin-slice executável)
@@ -321,11 +449,13 @@ def main(argv: List[str] | None = None) -> int:
     p1.add_argument("--module", required=True)
     p1.add_argument("--out", required=True)
     p1.add_argument("--trace", default="trace_local")
+    p1.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
 
     p1a = sub.add_parser("pack1", help="Alias para plan-pack1 (compatibilidade).")
     p1a.add_argument("--module", required=True)
     p1a.add_argument("--out", required=True)
     p1a.add_argument("--trace", default="trace_local")
+    p1a.add_argument("--jobs", type=int, default=0, help="Threads de compressão do ZIP (0 = todos os cores).")
 
     # Book / Filemap
     pb = sub.add_parser("book-filemap", help="Gera FILEMAP.md para um pack ZIP.")
@@ -334,7 +464,33 @@ def main(argv: List[str] | None = None) -> int:
     pb.add_argument("--include-restricted", action="store_true", help="Lista também paths restritos (use com cuidado).")
     pb.add_argument("--trace", default="trace_local")
 
+    # ZIP byte-reprodutível nos comandos que produzem packs
+    for pp in (p0, p0a, p1, p1a, pm, pcm, psd, psa, pvh, pwr, pwa, pet):
+        pp.add_argument(
+            "--reproducible",
+            action="store_true",
+            help="ZIP reprodutível: data fixa (SOURCE_DATE_EPOCH ou 1980-01-01), permissões normalizadas, compressão fixa.",
+        )
+
+    # Política de compressão por tipo (pdf/zip/xlsx/imagens: stored; texto: deflate)
+    for pp in (pm, pcm, pet):
+        pp.add_argument("--compress-level", type=int, default=-1, help="Nível deflate das entradas de texto (-1 = padrão zlib, 0-9).")
+        pp.add_argument("--lzma-min-bytes", type=int, default=0, help="Texto a partir deste tamanho vai em ZIP_LZMA (0 = desligado).")
+
+    # Cache persistente de sha256 por entrada (path, CRC, tamanhos)
+    for pp in (pi, pic, pid, pcm, pet):
+        pp.add_argument("--digest-cache", default="", help=f"Cache de digests (JSONL append-only). Default: env {DIGEST_CACHE_ENV}.")
+
+    # Leitura/escrita direta no store local de packs
+    for pp in (pm, pet):
+        pp.add_argument("--store", default="", help="Store local: lê refs store:<nome> e registra o ZIP de saída no catalog.")
+
     args = ap.parse_args(argv)
+    with reproducible_mode(bool(getattr(args, "reproducible", False))):
+        return _run(args)
+
+
+def _run(args: argparse.Namespace) -> int:
 
     # ── Autonomous Agent handlers ──
     if args.cmd == "auto-build":
@@ -393,13 +549,13 @@ def main(argv: List[str] | None = None) -> int:
     if args.cmd in ("plan-pack0", "pack0"):
         out_dir = _p(args.out)
         out_dir.mkdir(parents=True, exist_ok=True)
-        generate_pack0(module=args.module, out_dir=out_dir, trace_id=args.trace)
+        generate_pack0(module=args.module, out_dir=out_dir, trace_id=args.trace, jobs=args.jobs)
         return 0
 
     if args.cmd in ("plan-pack1", "pack1"):
         out_dir = _p(args.out)
         out_dir.mkdir(parents=True, exist_ok=True)
-        generate_pack1(module=args.module, out_dir=out_dir, trace_id=args.trace)
+        generate_pack1(module=args.module, out_dir=out_dir, trace_id=args.trace, jobs=args.jobs)
         return 0
 
     if args.cmd == "validate-pack0":
@@ -409,18 +565,119 @@ def main(argv: List[str] | None = None) -> int:
         write_json(_p(args.out), report)
         return 0 if report.get("ok") else 2
 
+    if args.cmd == "store":
+        store = PackStore(_p(args.store))
+        try:
+            if args.store_cmd == "put":
+                rep = store.put(_p(args.pack), name=(args.name or None))
+                write_json(_p(args.out), rep)
+                return 0
+            if args.store_cmd == "get":
+                rep = store.get(args.name, _p(args.out))
+                write_json(_p(str(_p(args.out)) + ".report.json"), rep)
+                return 0
+            if args.store_cmd == "gc":
+                write_json(_p(args.out), store.gc(dry_run=bool(args.dry_run)))
+                return 0
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        return 2
+
     if args.cmd == "merge":
-        inputs = [_p(x) for x in args.inputs]
+        inputs = [_pack_ref(x) for x in args.inputs]
+        if args.plan:
+            plan = plan_merge(
+                inputs,
+                trace_id=args.trace,
+                generate_software_book=(not args.no_book),
+                base_zip=(_pack_ref(args.base) if args.base else None),
+                store=_store(args),
+            )
+            write_json(_p(args.out), plan)
+            return 0 if plan.get("ok") else 2
+        store = _store(args)
+        if not args.tmp and not (args.stream or args.base or store is not None):
+            print("merge por extração exige --tmp (ou use --stream/--base/--store).", file=sys.stderr)
+            return 2
         merge_packs(
             pack_zips=inputs,
             out_zip=_p(args.out),
-            tmp_dir=_p(args.tmp),
+            tmp_dir=(_p(args.tmp) if args.tmp else None),
             trace_id=args.trace,
             generate_software_book=(not args.no_book),
             mode=args.mode,
+            streaming=bool(args.stream),
+            base_zip=(_pack_ref(args.base) if args.base else None),
+            jobs=args.jobs,
+            compression=_compression_policy(args),
+            store=store,
         )
         return 0
 
+    if args.cmd == "compact":
+        cache = _digest_cache(args)
+        try:
+            receipt = compact_snapshot(
+                _p(args.snapshot),
+                [_p(x) for x in args.lineage],
+                _p(args.out),
+                trace_id=args.trace,
+                jobs=args.jobs,
+                compression=_compression_policy(args),
+                cache=cache,
+            )
+        except (ValueError, RuntimeError) as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        _flush_cache(cache, receipt)
+        write_json(_p(str(_p(args.out)) + ".report.json"), receipt)
+        return 0
+
+    if args.cmd == "snapshot-delta":
+        rep = make_delta(_p(args.from_zip), _p(args.to_zip), _p(args.out), trace_id=args.trace, jobs=args.jobs)
+        write_json(_p(str(_p(args.out)) + ".report.json"), rep)
+        return 0
+
+    if args.cmd == "snapshot-apply":
+        try:
+            rep = apply_delta(_p(args.base), _p(args.delta), _p(args.out), jobs=args.jobs)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        rep["trace_id"] = args.trace
+        write_json(_p(str(_p(args.out)) + ".report.json"), rep)
+        return 0 if rep.get("ok") else 2
+
+    if args.cmd == "verify-hashchain":
+        key = _checkpoint_key(args.key_file)
+        if args.checkpoint_out and key is None:
+            print("--checkpoint-out exige chave (--key-file ou LAI_HASHCHAIN_KEY).", file=sys.stderr)
+            return 2
+        try:
+            report = verify_hashchain(
+                _p(args.target),
+                _load_schema("hashchain.entry.v1.schema.json"),
+                jobs=args.jobs,
+                chunk_entries=args.chunk,
+                checkpoint_every=args.checkpoint_every,
+                key=key,
+                use_checkpoints=(not args.full),
+                trace_id=args.trace,
+            )
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        checkpoint = report.pop("checkpoint", None)
+        if args.checkpoint_out and checkpoint is not None:
+            _validate("hashchain.checkpoint.v1.schema.json", checkpoint)
+            fname = checkpoint_entry_name(checkpoint)
+            _mk_patch_pack(_p(args.checkpoint_out), "patch-hashchain-checkpoint", "0.0.1", args.trace,
+                           {fname: json.dumps(checkpoint, ensure_ascii=False, indent=2)})
+            report["checkpoint_out"] = {"path": _p(args.checkpoint_out).name, "entry": fname}
+        write_json(_p(args.out), report)
+        return 0 if report.get("ok") else 2
+
     if args.cmd == "diag":
         d = run_diag_on_zip(_p(args.target))
         d["trace_id"] = args.trace
@@ -428,10 +685,44 @@ def main(argv: List[str] | None = None) -> int:
         return 0 if d.get("overall_status") == "PASS" else 2
 
     if args.cmd == "inventory-scan":
-        inv = scan_zip(_p(args.target), trace_id=args.trace)
+        cache = _digest_cache(args)
+        nested = NestedScan(max_depth=args.max_depth, max_nested_bytes=args.max_nested_bytes) if args.recursive else None
+        if args.format == "ndjson":
+            write_scan_ndjson(_p(args.target), _p(args.out), trace_id=args.trace, jobs=args.jobs, cache=cache, nested=nested)
+            if cache is not None:
+                cache.flush()
+            return 0
+        inv = scan_zip(_p(args.target), trace_id=args.trace, jobs=args.jobs, cache=cache, nested=nested)
+        _flush_cache(cache, inv)
         write_json(_p(args.out), inv)
         return 0
 
+    if args.cmd == "inventory-columnar":
+        cache = _digest_cache(args)
+        meta = write_columnar(iter_scan_zip(_p(args.target), jobs=args.jobs, cache=cache), _p(args.out), root=_p(args.target).name)
+        meta["trace_id"] = args.trace
+        _flush_cache(cache, meta)
+        write_json(_p(str(_p(args.out)) + ".report.json"), meta)
+        return 0
+
+    if args.cmd == "inventory-fleet":
+        try:
+            rep = fleet_report([_p(x) for x in args.inputs])
+        except (ValueError, KeyError) as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        rep["trace_id"] = args.trace
+        write_json(_p(args.out), rep)
+        return 0
+
+    if args.cmd == "inventory-diff":
+        cache = _digest_cache(args)
+        rep = diff_zips(_p(args.from_zip), _p(args.to_zip), confirm=bool(args.confirm), cache=cache)
+        rep["trace_id"] = args.trace
+        _flush_cache(cache, rep)
+        write_json(_p(args.out), rep)
+        return 0
+
     if args.cmd == "oca-new":
         oca_id = (args.oca_id or "").strip() or ("oca-" + utc_now_iso().replace(":", "").replace("-", "").replace("Z", "") + "-" + uuid.uuid4().hex[:8])
         author = _actor_from_env_or_arg(args.author)
@@ -529,8 +820,9 @@ def main(argv: List[str] | None = None) -> int:
         _validate("pack.run_report.v1.schema.json", rr)
         pack_ref = str(rr.get("pack_ref") or "unknown")
         ts = utc_now_iso().replace(":", "").replace("-", "").replace("Z", "")
-        fname = f"history/run_reports/{ts}_{pack_ref}_{uuid.uuid4().hex[:8]}.json"
-        patch_files = {fname: json.dumps(rr, ensure_ascii=False, indent=2)}
+        content = json.dumps(rr, ensure_ascii=False, indent=2)
+        fname = f"history/run_reports/{ts}_{pack_ref}_{_patch_suffix(content)}.json"
+        patch_files = {fname: content}
         _mk_patch_pack(_p(args.out), "patch-run-report", "0.0.1", args.trace, patch_files)
         return 0
 
@@ -539,8 +831,9 @@ def main(argv: List[str] | None = None) -> int:
         _validate("pack.approval.v1.schema.json", apj)
         pack_ref = str(apj.get("pack_ref") or "unknown")
         ts = utc_now_iso().replace(":", "").replace("-", "").replace("Z", "")
-        fname = f"history/approvals/{ts}_{pack_ref}_{uuid.uuid4().hex[:8]}.json"
-        patch_files = {fname: json.dumps(apj, ensure_ascii=False, indent=2)}
+        content = json.dumps(apj, ensure_ascii=False, indent=2)
+        fname = f"history/approvals/{ts}_{pack_ref}_{_patch_suffix(content)}.json"
+        patch_files = {fname: content}
         _mk_patch_pack(_p(args.out), "patch-approval", "0.0.1", args.trace, patch_files)
         return 0
 
@@ -684,17 +977,20 @@ def main(argv: List[str] | None = None) -> int:
 
     if args.cmd == "export-team-pack":
         policy_p = _p(args.policy) if getattr(args, 'policy', '') else None
+        cache = _digest_cache(args)
         try:
-            rep = export_team_pack(_repo_root(), _p(args.infile), _p(args.out), args.trace, policy_path=policy_p)
+            rep = export_team_pack(_repo_root(), _pack_ref(args.infile), _p(args.out), args.trace, policy_path=policy_p, jobs=args.jobs,
+                                   compression=_compression_policy(args), store=_store(args), cache=cache)
         except Exception as e:
             print(str(e), file=sys.stderr)
             return 2
+        _flush_cache(cache, rep)
         write_json(_p(str(_p(args.out)) + ".report.json"), rep)
         return 0
 
     if args.cmd == "leak-check":
         policy_p = _p(args.policy) if getattr(args, 'policy', '') else (_repo_root() / "governance" / "audience_policy.team_pack0_only.v1.json")
-        rep = leak_check_zip(_p(args.target), policy_p, out_path=_p(args.out))
+        rep = leak_check_zip(_p(args.target), policy_p, out_path=_p(args.out), content=bool(args.content), jobs=args.jobs)
         # Enriquecimento operacional (trace/timestamp) sem alterar contrato base
         rep["trace_id"] = args.trace
         rep["timestamp"] = utc_now_iso()
@@ -713,6 +1009,46 @@ def main(argv: List[str] | None = None) -> int:
         return 0 if rep.get("ok") else 2
 
     if args.cmd == "resolve":
+        if args.batch:
+            if not args.out_dir:
+                print("resolve --batch exige --out-dir", file=sys.stderr)
+                return 2
+            out_dir = _p(args.out_dir)
+            rep = resolve_batch(load_batch(_p(args.batch)), out_dir, args.trace, max_open=args.max_open, max_bytes=args.max_bytes)
+            write_json(out_dir / "resolve.report.json", rep)
+            return 0 if rep["ok"] else 2
+        if args.ref and any(has_glob(t) for t in args.ref.split("::")[1:]):
+            if not args.out_dir:
+                print("resolve com glob exige --out-dir", file=sys.stderr)
+                return 2
+            out_dir = _p(args.out_dir)
+            try:
+                rep = resolve_glob(str(args.ref), out_dir, args.trace)
+            except (ValueError, FileNotFoundError) as e:
+                print(str(e), file=sys.stderr)
+                return 2
+            write_json(out_dir / "resolve.report.json", rep)
+            return 0
+        if args.range:
+            if not (args.ref and args.out):
+                print("resolve --range exige --ref e --out", file=sys.stderr)
+                return 2
+            try:
+                start, end = parse_range(args.range)
+                data, rep = read_ref_range(str(args.ref), start, end, with_hash=bool(args.hash))
+            except (ValueError, FileNotFoundError) as e:
+                print(str(e), file=sys.stderr)
+                return 2
+            out_path = _p(args.out)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            out_path.write_bytes(data)
+            rep["trace_id"] = args.trace
+            rep["out"] = str(out_path)
+            write_json(_p(str(out_path) + ".report.json"), rep)
+            return 0
+        if not (args.ref and args.out):
+            print("resolve exige --ref e --out (ou --batch e --out-dir)", file=sys.stderr)
+            return 2
         rep = resolve_to_file(str(args.ref), _p(args.out), args.trace)
         write_json(_p(str(_p(args.out)) + ".report.json"), rep)
         return 0
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import io
+import json
+import struct
+import sys
+import zipfile
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .utils import utc_now_iso
+
+# NumPy é opcional: sem ele, leitura e agregações caem num caminho Python puro
+# com o mesmo resultado.
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    _NUMPY_AVAILABLE = False
+
+COLUMNAR_SCHEMA = "inventory.columnar.v1"
+# Artefato ao lado do manifest do pack (02_INVENTORY/)
+COLUMNAR_REL = "02_INVENTORY/inventory.columnar.npz"
+
+# Histograma de tamanho: bucket k = arquivos com bytes < 2**k (k = 0..40)
+SIZE_BUCKETS = 41
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# coluna -> (descr npy, typecode array, largura fixa por linha)
+_COLUMNS: Dict[str, Tuple[str, str, int]] = {
+    "path_id": ("<u8", "Q", 1),
+    "kind": ("|u1", "B", 1),
+    "prefix": ("<u4", "I", 1),
+    "bytes": ("<u8", "Q", 1),
+    "sha256": ("|u1", "B", 32),
+    "path_offsets": ("<u8", "Q", 1),
+    "path_blob": ("|u1", "B", 1),
+}
+
+
+def path_id(path: str) -> int:
+    """Id estável do path entre snapshots: 8 primeiros bytes do sha256 do path (joins por inteiro)."""
+    return int.from_bytes(hashlib.sha256(path.encode("utf-8")).digest()[:8], "little")
+
+
+def _prefix_of(path: str) -> str:
+    head, sep, _ = path.partition("/")
+    return head + "/" if sep else ""
+
+
+def _size_bucket(n: int) -> int:
+    return min(int(n).bit_length(), SIZE_BUCKETS - 1)
+
+
+def _npy_bytes(descr: str, shape: Tuple[int, ...], data: bytes) -> bytes:
+    """Arquivo .npy (formato 1.0) sem depender de NumPy."""
+    shape_s = "(" + ", ".join(str(x) for x in shape) + ("," if len(shape) == 1 else "") + ")"
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': %s, }" % (descr, shape_s)
+    pad = 64 - (len(_NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = header + " " * (pad % 64) + "\n"
+    return _NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1") + data
+
+
+def _le_bytes(a: array) -> bytes:
+    if sys.byteorder == "big" and a.itemsize > 1:
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def write_columnar(items: Iterable[Dict[str, Any]], out_path: Path, root: str = "") -> Dict[str, Any]:
+    """
+    Grava itens de inventário (path, kind, bytes, sha256 — p.ex. de
+    iter_scan_zip) em colunas .npy dentro de um .npz (legível com
+    numpy.load): path_id (u8), kind (u1, código em meta.kinds), prefix (u4,
+    1º segmento do path em meta.prefixes), bytes (u8), sha256 (u1 x 32) e a
+    tabela de paths (path_offsets/path_blob, estilo Arrow). Consome os itens
+    em stream; memória ~60 bytes + path por item.
+    """
+    cols = {name: array(tc) for name, (_, tc, _) in _COLUMNS.items()}
+    kinds: Dict[str, int] = {}
+    prefixes: Dict[str, int] = {}
+    n = 0
+    cols["path_offsets"].append(0)
+    for it in items:
+        path = str(it["path"])
+        raw = path.encode("utf-8")
+        cols["path_id"].append(path_id(path))
+        cols["kind"].append(kinds.setdefault(str(it["kind"]), len(kinds)))
+        cols["prefix"].append(prefixes.setdefault(_prefix_of(path), len(prefixes)))
+        cols["bytes"].append(int(it["bytes"]))
+        cols["sha256"].frombytes(bytes.fromhex(str(it["sha256"])))
+        cols["path_blob"].frombytes(raw)
+        cols["path_offsets"].append(len(cols["path_blob"]))
+        n += 1
+
+    meta = {
+        "schema": COLUMNAR_SCHEMA,
+        "generated_at": utc_now_iso(),
+        "root": root,
+        "rows": n,
+        "kinds": sorted(kinds, key=kinds.__getitem__),
+        "prefixes": sorted(prefixes, key=prefixes.__getitem__),
+    }
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for name, (descr, _, width) in _COLUMNS.items():
+            a = cols[name]
+            shape = (n, width) if width > 1 else (len(a),)
+            z.writestr(f"{name}.npy", _npy_bytes(descr, shape, _le_bytes(a)))
+        z.writestr("meta.npy", _npy_meta(meta))
+    return meta
+
+
+def _npy_meta(meta: Dict[str, Any]) -> bytes:
+    data = json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return _npy_bytes("|u1", (len(data),), data)
+
+
+def _parse_npy(raw: bytes) -> Tuple[str, Tuple[int, ...], bytes]:
+    if raw[:6] != _NPY_MAGIC[:6]:
+        raise ValueError("coluna não é .npy")
+    major = raw[6]
+    if major == 1:
+        hlen, start = struct.unpack("<H", raw[8:10])[0], 10
+    else:
+        hlen, start = struct.unpack("<I", raw[8:12])[0], 12
+    header = ast.literal_eval(raw[start:start + hlen].decode("latin1"))
+    if header.get("fortran_order"):
+        raise ValueError("coluna em fortran_order não suportada")
+    return str(header["descr"]), tuple(header["shape"]), raw[start + hlen:]
+
+
+class ColumnarInventory:
+    """
+    Inventário colunar carregado de um .npz de write_columnar. Com NumPy as
+    colunas são ndarrays e as agregações vetorizadas (bincount/isin); sem
+    NumPy, array.array e laços Python (mesmo resultado).
+    """
+
+    def __init__(self, meta: Dict[str, Any], cols: Dict[str, Any]) -> None:
+        self.meta = meta
+        self.cols = cols
+        self.rows = int(meta["rows"])
+
+    @classmethod
+    def load(cls, path: Path) -> "ColumnarInventory":
+        with zipfile.ZipFile(path, "r") as z:
+            _, _, data = _parse_npy(z.read("meta.npy"))
+            meta = json.loads(data.decode("utf-8"))
+            if meta.get("schema") != COLUMNAR_SCHEMA:
+                raise ValueError(f"schema colunar inesperado em {path.name}: {meta.get('schema')}")
+            cols: Dict[str, Any] = {}
+            for name, (descr, tc, _) in _COLUMNS.items():
+                raw = z.read(f"{name}.npy")
+                if _NUMPY_AVAILABLE:
+                    cols[name] = np.load(io.BytesIO(raw), allow_pickle=False)
+                    continue
+                d, _, body = _parse_npy(raw)
+                if d != descr:
+                    raise ValueError(f"coluna {name}: dtype {d} != {descr}")
+                a = array(tc)
+                a.frombytes(body)
+                if sys.byteorder == "big" and a.itemsize > 1:
+                    a.byteswap()
+                cols[name] = a
+        return cls(meta, cols)
+
+    def path(self, i: int) -> str:
+        off = self.cols["path_offsets"]
+        return bytes(self.cols["path_blob"][int(off[i]):int(off[i + 1])]).decode("utf-8")
+
+    def sha256(self, i: int) -> str:
+        col = self.cols["sha256"]
+        return bytes(col[i]).hex() if _NUMPY_AVAILABLE else bytes(col[32 * i:32 * i + 32]).hex()
+
+    def _digests(self) -> List[bytes]:
+        col = self.cols["sha256"]
+        if _NUMPY_AVAILABLE:
+            return [bytes(r) for r in col]
+        raw = col.tobytes()
+        return [raw[32 * i:32 * i + 32] for i in range(self.rows)]
+
+    # ── agregações ──
+
+    def _group(self, codes: Any, labels: List[str]) -> Dict[str, Dict[str, int]]:
+        if _NUMPY_AVAILABLE:
+            files = np.bincount(codes, minlength=len(labels))
+            total = np.bincount(codes, weights=self.cols["bytes"].astype(np.float64), minlength=len(labels))
+            pairs = [(int(files[c]), int(total[c])) for c in range(len(labels))]
+        else:
+            acc = [[0, 0] for _ in labels]
+            for c, b in zip(codes, self.cols["bytes"]):
+                acc[c][0] += 1
+                acc[c][1] += b
+            pairs = [(f, b) for f, b in acc]
+        out = {labels[c]: {"files": f, "bytes": b} for c, (f, b) in enumerate(pairs) if f}
+        return dict(sorted(out.items(), key=lambda kv: (-kv[1]["files"], kv[0])))
+
+    def size_histogram(self) -> List[Dict[str, int]]:
+        """[{"lt": 2**k, "files": n}] só dos buckets não vazios (bytes < 2**k)."""
+        b = self.cols["bytes"]
+        if _NUMPY_AVAILABLE:
+            _, exp = np.frexp(b.astype(np.float64))  # expoente == bit_length (0 para 0)
+            buckets = np.minimum(exp, SIZE_BUCKETS - 1)
+            counts = [int(x) for x in np.bincount(buckets, minlength=SIZE_BUCKETS)]
+        else:
+            counts = [0] * SIZE_BUCKETS
+            for x in b:
+                counts[_size_bucket(x)] += 1
+        return [{"lt": 2 ** k, "files": c} for k, c in enumerate(counts) if c]
+
+    def summary(self) -> Dict[str, Any]:
+        by_kind = self._group(self.cols["kind"], self.meta["kinds"])
+        return {
+            "root": self.meta.get("root", ""),
+            "files": self.rows,
+            "bytes": int(self.cols["bytes"].sum()) if _NUMPY_AVAILABLE else sum(self.cols["bytes"]),
+            "by_kind": {k: v["files"] for k, v in by_kind.items()},
+            "bytes_by_kind": {k: v["bytes"] for k, v in by_kind.items()},
+            "by_prefix": self._group(self.cols["prefix"], self.meta["prefixes"]),
+            "size_histogram": self.size_histogram(),
+        }
+
+    def join(self, other: "ColumnarInventory") -> Dict[str, Any]:
+        """
+        Join por path_id e por sha256 com outro snapshot (self = anterior):
+        paths comuns/alterados/só num lado e bytes de conteúdo compartilhado
+        (mesmo sha256 em qualquer path — o que um store CAS deduplicaria).
+        """
+        if _NUMPY_AVAILABLE:
+            a_ids, b_ids = self.cols["path_id"], other.cols["path_id"]
+            _, ia, ib = np.intersect1d(a_ids, b_ids, assume_unique=False, return_indices=True)
+            changed = int(np.count_nonzero(np.any(self.cols["sha256"][ia] != other.cols["sha256"][ib], axis=1)))
+            common = int(len(ia))
+            a_dig = self.cols["sha256"].view(np.dtype((np.void, 32))).ravel()
+            b_dig = other.cols["sha256"].view(np.dtype((np.void, 32))).ravel()
+            shared = int(other.cols["bytes"][np.isin(b_dig, a_dig)].sum())
+        else:
+            a_map = {pid: i for i, pid in enumerate(self.cols["path_id"])}
+            a_dig, b_dig = self._digests(), other._digests()
+            common = changed = 0
+            for j, pid in enumerate(other.cols["path_id"]):
+                i = a_map.get(pid)
+                if i is not None:
+                    common += 1
+                    changed += a_dig[i] != b_dig[j]
+            seen = set(a_dig)
+            shared = sum(int(b) for b, d in zip(other.cols["bytes"], b_dig) if d in seen)
+        return {
+            "from": self.meta.get("root", ""),
+            "to": other.meta.get("root", ""),
+            "common_paths": common,
+            "changed": changed,
+            "only_from": self.rows - common,
+            "only_to": other.rows - common,
+            "shared_content_bytes": shared,
+        }
+
+
+def fleet_report(paths: List[Path]) -> Dict[str, Any]:
+    """Resumo de cada inventário colunar + join entre snapshots consecutivos (na ordem dada)."""
+    invs = [ColumnarInventory.load(p) for p in paths]
+    return {
+        "schema_version": "1.0",
+        "generated_at": utc_now_iso(),
+        "engine": "numpy" if _NUMPY_AVAILABLE else "python",
+        "snapshots": [inv.summary() for inv in invs],
+        "joins": [a.join(b) for a, b in zip(invs, invs[1:])],
+    }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .inventory import _kind_from_name
+
+# Formatos já comprimidos: deflate gasta CPU para ~0% de ganho
+STORED_KINDS = frozenset({"pdf", "zip", "xlsx"})
+TEXT_KINDS = frozenset({"md", "json", "yaml", "py", "ts", "js", "csv"})
+
+DEFAULT_PROBE_BYTES = 64 * 1024
+DEFAULT_STORE_RATIO = 0.9
+
+METHOD_NAMES = {
+    zipfile.ZIP_STORED: "stored",
+    zipfile.ZIP_DEFLATED: "deflated",
+    zipfile.ZIP_LZMA: "lzma",
+}
+
+
+@dataclass
+class CompressionPolicy:
+    """
+    Método de compressão por tipo de entrada (inventory._kind_from_name):
+    - STORED_KINDS (pdf, zip, xlsx): ZIP_STORED
+    - TEXT_KINDS: ZIP_DEFLATED no nível `level`; ZIP_LZMA a partir de
+      lzma_min_bytes (0 = desligado)
+    - demais (imagens, binários): sonda de compressibilidade — deflate nível 1
+      dos primeiros probe_bytes; se não reduz abaixo de store_ratio, ZIP_STORED
+    """
+    level: int = zlib.Z_DEFAULT_COMPRESSION
+    lzma_min_bytes: int = 0
+    probe_bytes: int = DEFAULT_PROBE_BYTES
+    store_ratio: float = DEFAULT_STORE_RATIO
+
+    def choose(self, arcname: str, size: int, sample: Optional[bytes] = None) -> int:
+        kind = _kind_from_name(arcname)
+        if kind in STORED_KINDS:
+            return zipfile.ZIP_STORED
+        if kind in TEXT_KINDS:
+            if self.lzma_min_bytes > 0 and size >= self.lzma_min_bytes:
+                return zipfile.ZIP_LZMA
+            return zipfile.ZIP_DEFLATED
+        if sample:
+            probe = sample[: self.probe_bytes]
+            if len(zlib.compress(probe, 1)) >= self.store_ratio * len(probe):
+                return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+
+class CompressionStats:
+    """Por tipo: arquivos, bytes, bytes comprimidos, segundos e métodos usados (thread-safe)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, arcname: str, method: str, bytes_in: int, bytes_out: int, seconds: float = 0.0) -> None:
+        kind = _kind_from_name(arcname)
+        with self._lock:
+            k = self._kinds.setdefault(kind, {"files": 0, "bytes": 0, "compressed_bytes": 0, "seconds": 0.0, "methods": {}})
+            k["files"] += 1
+            k["bytes"] += int(bytes_in)
+            k["compressed_bytes"] += int(bytes_out)
+            k["seconds"] += seconds
+            k["methods"][method] = k["methods"].get(method, 0) + 1
+
+    def to_dict(self, timings: bool = True) -> Dict[str, Any]:
+        """timings=False omite segundos (conteúdo determinístico, p.ex. modo reprodutível)."""
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for kind in sorted(self._kinds):
+                k = self._kinds[kind]
+                row: Dict[str, Any] = {
+                    "files": k["files"],
+                    "bytes": k["bytes"],
+                    "compressed_bytes": k["compressed_bytes"],
+                    "ratio": (round(k["compressed_bytes"] / k["bytes"], 4) if k["bytes"] else 1.0),
+                    "methods": dict(sorted(k["methods"].items())),
+                }
+                if timings:
+                    row["seconds"] = round(k["seconds"], 4)
+                out[kind] = row
+        return out
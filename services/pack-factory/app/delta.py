@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import zipfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .compression import CompressionPolicy
+from .utils import file_lock, json_bytes, sha256_file, utc_now_iso
+from .zipio import PackWriter
+
+DELTA_MANIFEST = "delta.json"
+DELTA_FILES_PREFIX = "files/"
+
+
+def _entries(z: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    """Entradas de arquivo na ordem do ZIP (nome duplicado: última vence)."""
+    out: Dict[str, zipfile.ZipInfo] = {}
+    for info in z.infolist():
+        if not info.is_dir():
+            out[info.filename] = info
+    return out
+
+
+def content_digest(entries: Dict[str, zipfile.ZipInfo]) -> str:
+    """sha256 da listagem (path, CRC, tamanho) ordenada por path — só central directory."""
+    h = hashlib.sha256()
+    for name in sorted(entries):
+        info = entries[name]
+        h.update(f"{name}\0{info.CRC:08x}\0{info.file_size}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _meta(info: zipfile.ZipInfo) -> Dict[str, Any]:
+    return {"date_time": list(info.date_time), "external_attr": info.external_attr, "create_system": info.create_system}
+
+
+def make_delta(
+    from_zip: Path,
+    to_zip: Path,
+    out_zip: Path,
+    trace_id: str = "trace_local",
+    jobs: int = 0,
+    compression: Optional[CompressionPolicy] = None,
+) -> Dict[str, Any]:
+    """
+    Delta pack de from_zip -> to_zip calculado pelos central directories:
+    entradas com mesmo path, CRC e tamanho são consideradas inalteradas e não
+    são lidas; adicionadas/alteradas vão cruas (sem recompressão) em files/<path>;
+    removidas viram tombstones. delta.json guarda ordem e metadados de to_zip
+    para snapshot-apply reconstruí-lo fielmente, mais os digests de verificação.
+    """
+    with ExitStack() as stack:
+        za = stack.enter_context(zipfile.ZipFile(from_zip, "r"))
+        zb = stack.enter_context(zipfile.ZipFile(to_zip, "r"))
+        a, b = _entries(za), _entries(zb)
+
+        added: List[str] = []
+        changed: List[str] = []
+        meta_overrides: Dict[str, Dict[str, Any]] = {}
+        for name, info in b.items():
+            old = a.get(name)
+            if old is None:
+                added.append(name)
+            elif (old.CRC, old.file_size) != (info.CRC, info.file_size):
+                changed.append(name)
+            elif _meta(old) != _meta(info):
+                meta_overrides[name] = _meta(info)
+        tombstones = sorted(n for n in a if n not in b)
+
+        manifest = {
+            "schema_version": "1.0",
+            "kind": "snapshot_delta",
+            "trace_id": trace_id,
+            "timestamp": utc_now_iso(),
+            "from": {"path": from_zip.name, "sha256": sha256_file(from_zip), "content_digest": content_digest(a)},
+            "to": {"path": to_zip.name, "sha256": sha256_file(to_zip), "content_digest": content_digest(b), "entries": len(b)},
+            "added": sorted(added),
+            "changed": sorted(changed),
+            "tombstones": tombstones,
+            "order": list(b),
+            "meta_overrides": meta_overrides,
+        }
+
+        with PackWriter(out_zip, jobs=jobs, policy=compression) as w:
+            for name in added + changed:
+                w.add_entry(zb, b[name], arcname=DELTA_FILES_PREFIX + name)
+            w.add_bytes(DELTA_MANIFEST, json_bytes(manifest))
+
+    to_bytes = int(to_zip.stat().st_size)
+    delta_bytes = int(out_zip.stat().st_size)
+    return {
+        "schema_version": "1.0",
+        "trace_id": trace_id,
+        "timestamp": utc_now_iso(),
+        "ok": True,
+        "from": manifest["from"],
+        "to": manifest["to"],
+        "counts": {
+            "added": len(added),
+            "changed": len(changed),
+            "tombstones": len(tombstones),
+            "unchanged": len(b) - len(added) - len(changed),
+        },
+        "bytes": {"to_zip": to_bytes, "delta_zip": delta_bytes, "ratio": (round(delta_bytes / to_bytes, 4) if to_bytes else 0.0)},
+    }
+
+
+def apply_delta(base_zip: Path, delta_zip: Path, out_zip: Path, jobs: int = 0) -> Dict[str, Any]:
+    """
+    Reconstrói o snapshot de destino a partir de base_zip (o "from" do delta)
+    e do delta pack, na ordem e com os metadados do original; entradas são
+    copiadas cruas da base ou do delta. Verificação:
+    - sha256 do ZIP igual ao original (reconstrução byte a byte), ou
+    - content_digest igual e CRC de todos os dados conferido (testzip).
+    Base errada: ValueError. Verificação falhou: out_zip é removido.
+    """
+    out_zip.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(out_zip.parent / f".{out_zip.name}.lock"), ExitStack() as stack:
+        zd = stack.enter_context(zipfile.ZipFile(delta_zip, "r"))
+        if DELTA_MANIFEST not in zd.NameToInfo:
+            raise ValueError(f"{delta_zip.name} não é um delta pack (sem {DELTA_MANIFEST})")
+        manifest = json.loads(zd.read(DELTA_MANIFEST).decode("utf-8"))
+        base_sha = sha256_file(base_zip)
+        if base_sha != manifest["from"]["sha256"]:
+            raise ValueError(f"base {base_zip.name} não é o 'from' do delta ({manifest['from']['path']})")
+
+        za = stack.enter_context(zipfile.ZipFile(base_zip, "r"))
+        a = _entries(za)
+        payload = {n[len(DELTA_FILES_PREFIX):]: info for n, info in _entries(zd).items() if n.startswith(DELTA_FILES_PREFIX)}
+        overrides = manifest.get("meta_overrides") or {}
+
+        with PackWriter(out_zip, jobs=jobs, order=manifest["order"]) as w:
+            for name in manifest["order"]:
+                if name in payload:
+                    w.add_entry(zd, payload[name], arcname=name)
+                    continue
+                info = a[name]
+                if name in overrides:
+                    info = _with_meta(info, overrides[name])
+                w.add_entry(za, info, arcname=name)
+
+        out_sha = sha256_file(out_zip)
+        byte_identical = out_sha == manifest["to"]["sha256"]
+        with zipfile.ZipFile(out_zip, "r") as z:
+            digest = content_digest(_entries(z))
+            ok = byte_identical or (digest == manifest["to"]["content_digest"] and z.testzip() is None)
+        if not ok:
+            out_zip.unlink()
+    return {
+        "schema_version": "1.0",
+        "timestamp": utc_now_iso(),
+        "ok": ok,
+        "base": {"path": base_zip.name, "sha256": base_sha},
+        "delta": {"path": delta_zip.name, "sha256": sha256_file(delta_zip)},
+        "to": manifest["to"],
+        "out": {"path": out_zip.name, "sha256": out_sha, "content_digest": digest},
+        "byte_identical": byte_identical,
+    }
+
+
+def _with_meta(info: zipfile.ZipInfo, meta: Dict[str, Any]) -> zipfile.ZipInfo:
+    """Cópia do ZipInfo com date_time/permissões/create_system do destino (mesmos dados)."""
+    clone = zipfile.ZipInfo(info.filename, date_time=tuple(meta["date_time"]))
+    for attr in ("compress_type", "comment", "extra", "CRC", "compress_size", "file_size", "flag_bits", "header_offset"):
+        setattr(clone, attr, getattr(info, attr))
+    clone.external_attr = int(meta["external_attr"])
+    clone.create_system = int(meta["create_system"])
+    return clone
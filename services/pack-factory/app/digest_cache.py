@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .utils import file_lock
+
+DIGEST_CACHE_ENV = "LAI_DIGEST_CACHE"
+HASH_CHUNK = 1024 * 1024
+
+_Key = Tuple[str, int, int, int]
+
+
+def _key(info: zipfile.ZipInfo) -> _Key:
+    return (info.filename, int(info.CRC), int(info.compress_size), int(info.file_size))
+
+
+class DigestCache:
+    """
+    Cache persistente de sha256 de entradas ZIP, chaveado pela identidade da
+    entrada no central directory: (path, CRC32, tamanho comprimido, tamanho).
+    Entrada com a mesma chave em outro snapshot tem o sha256 devolvido sem
+    descomprimir.
+
+    Arquivo append-only (JSONL, uma linha por digest): carregado no open;
+    digests novos são anexados no close/flush sob lock de arquivo (vários
+    processos podem compartilhar o cache). Linha truncada é ignorada.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._map: Dict[_Key, str] = {}
+        self._new: List[Dict[str, object]] = []
+        self.hits = 0
+        self.misses = 0
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        d = json.loads(line)
+                        self._map[(str(d["p"]), int(d["c"]), int(d["z"]), int(d["s"]))] = str(d["h"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+    def __enter__(self) -> "DigestCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def get(self, info: zipfile.ZipInfo) -> Optional[str]:
+        with self._lock:
+            sha = self._map.get(_key(info))
+            if sha is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return sha
+
+    def put(self, info: zipfile.ZipInfo, sha: str) -> None:
+        k = _key(info)
+        with self._lock:
+            if self._map.get(k) == sha:
+                return
+            self._map[k] = sha
+            self._new.append({"p": k[0], "c": k[1], "z": k[2], "s": k[3], "h": sha})
+
+    def flush(self) -> None:
+        with self._lock:
+            new, self._new = self._new, []
+        if not new:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = "".join(json.dumps(d, ensure_ascii=False) + "\n" for d in new)
+        with file_lock(self.path.parent / f".{self.path.name}.lock"):
+            with self.path.open("a+b") as f:
+                if f.tell() > 0:
+                    f.seek(-1, 2)
+                    if f.read(1) != b"\n":  # linha truncada (processo interrompido)
+                        data = "\n" + data
+                f.write(data.encode("utf-8"))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+
+def hash_entry(z: zipfile.ZipFile, info: zipfile.ZipInfo) -> str:
+    """sha256 do conteúdo descomprimido da entrada (stream)."""
+    h = hashlib.sha256()
+    with z.open(info, "r") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def entry_digest(z: zipfile.ZipFile, info: zipfile.ZipInfo, cache: Optional[DigestCache] = None) -> str:
+    """sha256 da entrada, consultando/alimentando o cache quando dado."""
+    if cache is not None:
+        sha = cache.get(info)
+        if sha is not None:
+            return sha
+    sha = hash_entry(z, info)
+    if cache is not None:
+        cache.put(info, sha)
+    return sha
+
+
+def data_digest(info: zipfile.ZipInfo, data: bytes, cache: Optional[DigestCache] = None) -> str:
+    """sha256 de data (conteúdo já lido de info), consultando/alimentando o cache."""
+    sha = cache.get(info) if cache is not None else None
+    if sha is None:
+        sha = hashlib.sha256(data).hexdigest()
+        if cache is not None:
+            cache.put(info, sha)
+    return sha
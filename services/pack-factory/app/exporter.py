@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import hashlib
 import json
-import re
 import shutil
-import tempfile
 import zipfile
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
-from .public_export import load_public_export_policy, is_public_path
-from .utils import utc_now_iso, sha256_file
+from .compression import CompressionPolicy
+from .digest_cache import DigestCache, entry_digest
+from .policy_matcher import compile_policy
+from .public_export import load_public_export_policy
+from .store import CatalogPack, PackStore, add_raw_entry, open_pack
+from .utils import json_bytes, utc_now_iso, sha256_file
+from .zipio import PackWriter
 
 
 DEFAULT_AUDIENCE_POLICY_PATH = "governance/audience_policy.team_pack0_only.v1.json"
@@ -44,9 +48,9 @@ def load_audience_policy(repo_root: Path, policy_path: Optional[Path] = None) ->
     return json.loads(p.read_text(encoding="utf-8"))
 
 
-def _is_probably_release_pack(extracted_root: Path) -> bool:
+def _is_probably_release_pack(entries: Dict[str, Any]) -> bool:
     # Heurística conservadora: presença do runtime da própria Pack Factory
-    return (extracted_root / "services" / "pack-factory" / "app" / "cli.py").exists()
+    return "services/pack-factory/app/cli.py" in entries
 
 
 
@@ -76,6 +80,10 @@ def export_team_pack(
     out_zip: Path,
     trace_id: str,
     policy_path: Optional[Path] = None,
+    jobs: int = 0,
+    compression: Optional[CompressionPolicy] = None,
+    store: Optional[PackStore] = None,
+    cache: Optional[DigestCache] = None,
 ) -> Dict[str, Any]:
     """Gera ZIP 'team-safe' a partir de um **SNAPSHOT** (promoted) do ciclo PEC.
 
@@ -84,71 +92,58 @@ def export_team_pack(
     - Allowlist/denylist declarativa (audience policy).
     - Aplica policy governance/public_export_policy.json (regex e prefixes).
     - Recalcula pack.meta.json e atualiza trace no manifest.
+
+    Lê direto do ZIP de entrada (sem extrair): entradas inalteradas são copiadas
+    cruas (já comprimidas); só manifest.json e pack.meta.json são recomprimidos.
+
+    store: CAS local de packs; in_pack_zip "store:<nome>" é lido direto do
+    catalog (metadados e sha256) e dos blobs (cópia crua), sem reconstruir o
+    ZIP, e o ZIP exportado é registrado no catalog (nome = out_zip.stem).
+    cache: DigestCache para os sha256 do pack.meta.json (entradas inalteradas
+    não são descomprimidas).
     """
     now = utc_now_iso()
     public_policy = load_public_export_policy(repo_root)
     audience = load_audience_policy(repo_root, policy_path=policy_path)
 
-    allow_prefixes = [str(x) for x in (audience.get("allowlist_prefixes") or [])]
-    deny_prefixes = [str(x) for x in (audience.get("denylist_prefixes") or [])]
-    deny_regexes = [re.compile(str(x)) for x in (audience.get("denylist_regex") or [])]
+    matcher = compile_policy(audience, public_policy)
 
     copied = 0
     excluded = 0
 
-    with tempfile.TemporaryDirectory() as td:
-        td_path = Path(td)
-        src_root = td_path / "src"
-        dst_root = td_path / "dst"
-        src_root.mkdir(parents=True, exist_ok=True)
-        dst_root.mkdir(parents=True, exist_ok=True)
+    manifest_rel = "02_INVENTORY/manifest.json"
+    meta_rel = "02_INVENTORY/pack.meta.json"
 
-        with zipfile.ZipFile(in_pack_zip, "r") as z:
-            z.extractall(src_root)
+    with open_pack(in_pack_zip, store) as zin:
+        entries: Dict[str, zipfile.ZipInfo] = {}
+        for info in zin.infolist():
+            if info.is_dir():
+                continue
+            entries[info.filename.replace("\\", "/")] = info
 
         # Default-deny: bloquear erro operacional comum (passar Release Pack em vez de snapshot)
-        if audience.get("export_mode") == "pack0_only" and _is_probably_release_pack(src_root):
+        if audience.get("export_mode") == "pack0_only" and _is_probably_release_pack(entries):
             raise ValueError(
                 "export-team-pack recusado: entrada parece ser um Release Pack. "
                 "Gere um snapshot promoted via PEC Chain (merge --mode promoted) e exporte a partir dele."
             )
 
-        for p in src_root.rglob("*"):
-            if not p.is_file():
-                continue
-            rel = p.relative_to(src_root).as_posix()
-
-            # denylist prefix
-            if any(rel.startswith(pref) for pref in deny_prefixes):
+        # denylist prefix/regex (basename), allowlist e public policy num único matcher
+        selected: Dict[str, zipfile.ZipInfo] = {}
+        for (rel, info), reason in zip(entries.items(), matcher.classify_batch(entries)):
+            if reason is not None:
                 excluded += 1
                 continue
-
-            # denylist regex (aplica no basename)
-            base = rel.split("/")[-1]
-            if any(rx.search(base) for rx in deny_regexes):
-                excluded += 1
-                continue
-
-            # allowlist prefix
-            if allow_prefixes and not any(rel.startswith(pref) for pref in allow_prefixes):
-                excluded += 1
-                continue
-
-            # public policy (proteções extras)
-            if not is_public_path(rel, public_policy):
-                excluded += 1
-                continue
-
-            dest = dst_root / rel
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(p, dest)
+            selected[rel] = info
             copied += 1
 
+        # Entradas geradas (comprimidas); o resto é copiado cru do ZIP de entrada.
+        generated: Dict[str, bytes] = {}
+
         # update manifest trace
-        mpath = dst_root / "02_INVENTORY" / "manifest.json"
-        if mpath.exists():
+        if manifest_rel in selected:
             try:
-                m = json.loads(mpath.read_text(encoding="utf-8"))
+                m = json.loads(zin.read(selected[manifest_rel]).decode("utf-8"))
             except Exception:
                 m = {}
             m["trace"] = {"trace_id": trace_id}
@@ -159,18 +154,20 @@ def export_team_pack(
                 feats.append("team-pack0-only")
             m["features"] = feats
             m["created_at"] = now
-            mpath.write_text(json.dumps(m, ensure_ascii=False, indent=2), encoding="utf-8")
+            generated[manifest_rel] = json_bytes(m)
 
         # recompute pack.meta.json
-        meta_path = dst_root / "02_INVENTORY" / "pack.meta.json"
         files: List[Dict[str, Any]] = []
-        for fp in sorted(dst_root.rglob("*")):
-            if not fp.is_file():
+        for rel2 in sorted(set(selected) | set(generated), key=lambda n: n.split("/")):
+            if rel2 == meta_rel:
                 continue
-            rel2 = fp.relative_to(dst_root).as_posix()
-            if rel2 == "02_INVENTORY/pack.meta.json":
+            if rel2 in generated:
+                data = generated[rel2]
+                files.append({"path": rel2, "sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data)})
                 continue
-            files.append({"path": rel2, "sha256": sha256_file(fp), "bytes": int(fp.stat().st_size)})
+            info = selected[rel2]
+            sha = zin.sha256(info) if isinstance(zin, CatalogPack) else entry_digest(zin, info, cache)
+            files.append({"path": rel2, "sha256": sha, "bytes": int(info.file_size)})
 
         meta = {
             "schema_version": "1.0",
@@ -181,17 +178,17 @@ def export_team_pack(
             "files": files,
             "notes": "team-safe export (pack0_only, default-deny). pack.meta.json não inclui hash de si mesmo.",
         }
-        meta_path.parent.mkdir(parents=True, exist_ok=True)
-        meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        generated[meta_rel] = json_bytes(meta)
 
         if out_zip.exists():
             out_zip.unlink()
-        with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
-            for fp in dst_root.rglob("*"):
-                if fp.is_file():
-                    z.write(fp, fp.relative_to(dst_root).as_posix())
+        with PackWriter(out_zip, jobs=jobs, policy=compression) as w:
+            for rel2, info in selected.items():
+                add_raw_entry(w, zin, info, arcname=rel2)
+            for rel2, data in generated.items():
+                w.add_bytes(rel2, data)
 
-    return {
+    rep = {
         "schema_version": "1.0",
         "trace_id": trace_id,
         "timestamp": now,
@@ -203,3 +200,6 @@ def export_team_pack(
         "excluded_files": excluded,
         "policy": str((policy_path or (repo_root / DEFAULT_AUDIENCE_POLICY_PATH))),
     }
+    if store is not None:
+        rep["store"] = store.put(out_zip)
+    return rep
@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import jsonschema
+
+from .utils import json_bytes, utc_now_iso
+from .zipio import read_stored_range
+
+HASHCHAIN_REL = "history/hashchain.jsonl"
+# Sidecar de tamanho fixo com a cauda do hashchain (derivado: pode sobrescrever)
+HASHCHAIN_TAIL_REL = "history/hashchain.tail.json"
+
+CHECKPOINTS_PREFIX = "history/hashchain_checkpoints/"
+
+TAIL_BLOCK = 4096
+DEFAULT_CHUNK_ENTRIES = 50_000
+DEFAULT_CHECKPOINT_EVERY = 1_000_000
+MAX_REPORTED_ERRORS = 100
+
+
+def hashchain_entry_line(prev_hash: str, payload_sha: str, entry_type: str = "merge_receipt") -> str:
+    entry = {
+        "schema_version": "1.0",
+        "entry_type": entry_type,
+        "payload_sha256": payload_sha,
+        "prev_hash": prev_hash,
+        "timestamp": utc_now_iso(),
+    }
+    entry_str = json.dumps(entry, ensure_ascii=False, sort_keys=True)
+    entry_hash = hashlib.sha256((prev_hash + entry_str).encode("utf-8")).hexdigest()
+    entry["hash"] = entry_hash
+    return json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+def hash_from_line(line: str) -> str:
+    try:
+        return json.loads(line).get("hash","")
+    except Exception:
+        return ""
+
+
+# ── Cauda (última entrada) sem percorrer o arquivo ──
+
+def last_line(read_range: Callable[[int, int], bytes], size: int, block: int = TAIL_BLOCK) -> Tuple[int, str]:
+    """
+    (offset, texto) da última linha não vazia de um conteúdo de `size` bytes,
+    lendo blocos do fim para o início via read_range(start, end).
+    Custo proporcional ao tamanho da última linha, não do arquivo.
+    """
+    pos = size
+    buf = b""
+    while pos > 0:
+        n = min(block, pos)
+        pos -= n
+        buf = read_range(pos, pos + n) + buf
+        stripped = buf.rstrip()
+        if stripped:
+            cut = stripped.rfind(b"\n")
+            if cut >= 0:
+                return pos + cut + 1, stripped[cut + 1:].decode("utf-8", errors="ignore")
+    stripped = buf.rstrip()
+    return 0, stripped.decode("utf-8", errors="ignore")
+
+
+def tail_of_file(path: Path) -> Tuple[int, str]:
+    """(offset, hash) da última entrada de um hashchain em disco (seek a partir do fim)."""
+    if not path.exists():
+        return 0, ""
+    with path.open("rb") as f:
+        def _read(start: int, end: int) -> bytes:
+            f.seek(start)
+            return f.read(end - start)
+        offset, line = last_line(_read, path.stat().st_size)
+    return offset, hash_from_line(line)
+
+
+def tail_of_entry(
+    z: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    sidecar: Optional[zipfile.ZipInfo] = None,
+) -> Tuple[int, str]:
+    """
+    (offset, hash) da última entrada de um hashchain dentro de um ZIP:
+    - entrada ZIP_STORED: leitura do fim via seek no arquivo de origem; o
+      sidecar do mesmo layer (CRC/tamanho batendo) indica a linha a ler, e só
+      é aceito se o hash dessa linha for o last_hash dele
+    - senão: varredura da entrada (o sidecar não é usado: não dá para
+      conferi-lo sem descomprimir; o snapshot gerado grava o hashchain STORED)
+    z pode ser outra fonte com a interface de leitura do ZipFile e o próprio
+    read_stored_range(info, start, end) (store.CatalogPack).
+    """
+    if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x01:
+        ranged = getattr(z, "read_stored_range", None)
+
+        def _read(start: int, end: int) -> bytes:
+            if ranged is not None:
+                return ranged(info, start, end)
+            return read_stored_range(z, info, start, end)
+
+        if sidecar is not None:
+            tail = _verified_sidecar_tail(z, info, sidecar, _read)
+            if tail is not None:
+                return tail
+        offset, line = last_line(_read, info.file_size)
+        return offset, hash_from_line(line)
+    offset, pos, line = 0, 0, ""
+    with z.open(info, "r") as raw:
+        for ln in raw:
+            if ln.strip():
+                offset, line = pos, ln.decode("utf-8", errors="ignore")
+            pos += len(ln)
+    return offset, hash_from_line(line)
+
+
+def _verified_sidecar_tail(
+    z: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    sidecar: zipfile.ZipInfo,
+    read_range: Callable[[int, int], bytes],
+) -> Optional[Tuple[int, str]]:
+    """(last_offset, last_hash) do sidecar se a linha em last_offset confirma; senão None."""
+    try:
+        tail = json.loads(z.read(sidecar).decode("utf-8"))
+        if (int(tail.get("bytes", -1)), int(tail.get("crc32", -1))) != (info.file_size, info.CRC):
+            return None
+        offset, last_hash = int(tail.get("last_offset", -1)), str(tail.get("last_hash", ""))
+    except Exception:
+        return None
+    if not last_hash or not 0 <= offset < info.file_size or info.file_size - offset > 16 * TAIL_BLOCK:
+        return None
+    data = read_range(max(offset - 1, 0), info.file_size)
+    if offset > 0:
+        if data[:1] != b"\n":
+            return None
+        data = data[1:]
+    line = data.rstrip()
+    if b"\n" in line or hash_from_line(line.decode("utf-8", errors="ignore")) != last_hash:
+        return None
+    return offset, last_hash
+
+
+# ── Escrita com rastreio da cauda ──
+
+class TailWriter:
+    """Wrapper de escrita que acumula tamanho/CRC e o offset da última entrada escrita."""
+
+    def __init__(self, fout: IO[bytes]) -> None:
+        self.fout = fout
+        self.bytes = 0
+        self.crc32 = 0
+        self.last_offset = 0
+        self.last_hash = ""
+
+    def write(self, data: bytes) -> None:
+        self.fout.write(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+        self.bytes += len(data)
+
+    def append_entry(self, prev_hash: str, payload_sha: str, entry_type: str = "merge_receipt") -> str:
+        line = hashchain_entry_line(prev_hash, payload_sha, entry_type)
+        self.last_offset = self.bytes
+        self.last_hash = hash_from_line(line)
+        self.write(line.encode("utf-8"))
+        return self.last_hash
+
+    def sidecar(self) -> Dict[str, object]:
+        return tail_sidecar(self.bytes, self.crc32, self.last_offset, self.last_hash)
+
+
+def tail_sidecar(size: int, crc32: int, last_offset: int, last_hash: str) -> Dict[str, object]:
+    return {
+        "schema_version": "1.0",
+        "bytes": size,
+        "crc32": crc32,
+        "last_offset": last_offset,
+        "last_hash": last_hash,
+    }
+
+
+def append_to_file(path: Path, payload_sha: str, entry_type: str = "merge_receipt") -> Dict[str, object]:
+    """
+    Anexa uma entrada ao hashchain em disco com prev_hash lido da cauda
+    (sem reler o arquivo) e grava o sidecar ao lado. Retorna o sidecar.
+    O CRC continua o do sidecar anterior quando ele cobre o arquivo inteiro
+    (mesmo tamanho); senão o arquivo é relido uma vez.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sidecar_path = path.parent / Path(HASHCHAIN_TAIL_REL).name
+    _, prev_hash = tail_of_file(path)
+    data = hashchain_entry_line(prev_hash, payload_sha, entry_type).encode("utf-8")
+    with path.open("ab") as f:
+        last_offset = f.tell()
+        f.write(data)
+    crc: Optional[int] = None
+    try:
+        prev = json.loads(sidecar_path.read_text(encoding="utf-8"))
+        if int(prev["bytes"]) == last_offset:
+            crc = zlib.crc32(data, int(prev["crc32"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if crc is None:
+        crc = 0
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                crc = zlib.crc32(chunk, crc)
+    sidecar = tail_sidecar(last_offset + len(data), crc, last_offset, hash_from_line(data.decode("utf-8")))
+    sidecar_path.write_bytes(json_bytes(sidecar))
+    return sidecar
+
+
+# ── Verificação (paralela por segmentos, com checkpoints assinados) ──
+
+def entry_hash(entry: Dict[str, Any]) -> str:
+    """Recalcula sha256(prev_hash + entry_str) de uma entrada (sem o campo hash)."""
+    body = {k: v for k, v in entry.items() if k != "hash"}
+    entry_str = json.dumps(body, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256((str(entry.get("prev_hash", "")) + entry_str).encode("utf-8")).hexdigest()
+
+
+def _verify_segment(lines: List[bytes], first_index: int, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Verifica um segmento de entradas consecutivas: schema, hash de cada
+    entrada e links internos. O link com o segmento anterior (first_prev_hash)
+    é conferido por quem consome os resultados, na ordem.
+    """
+    validator = jsonschema.validators.validator_for(schema)(schema)
+    errors: List[Dict[str, Any]] = []
+    first_prev: Optional[str] = None
+    prev: Optional[str] = None
+    for n, raw in enumerate(lines):
+        index = first_index + n
+        try:
+            entry = json.loads(raw)
+        except Exception:
+            errors.append({"index": index, "error": "invalid_json"})
+            prev = None
+            continue
+        for err in validator.iter_errors(entry):
+            errors.append({"index": index, "error": "schema", "detail": err.message})
+            break
+        if not isinstance(entry, dict):
+            prev = None
+            continue
+        if entry_hash(entry) != entry.get("hash"):
+            errors.append({"index": index, "error": "hash_mismatch"})
+        if n == 0:
+            first_prev = entry.get("prev_hash")
+        elif prev is not None and entry.get("prev_hash") != prev:
+            errors.append({"index": index, "error": "broken_link"})
+        prev = entry.get("hash")
+    return {
+        "first_index": first_index,
+        "count": len(lines),
+        "first_prev_hash": first_prev,
+        "last_hash": prev,
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
+
+
+def _iter_segments(fin: IO[bytes], start_offset: int, chunk_entries: int) -> Iterator[Tuple[List[bytes], int]]:
+    """Segmentos de até chunk_entries linhas não vazias + offset (bytes) do fim de cada um."""
+    pos = start_offset
+    lines: List[bytes] = []
+    for raw in fin:
+        pos += len(raw)
+        if raw.strip():
+            lines.append(raw)
+            if len(lines) >= chunk_entries:
+                yield lines, pos
+                lines = []
+    if lines:
+        yield lines, pos
+
+
+def _canonical(doc: Dict[str, Any]) -> bytes:
+    body = {k: v for k, v in doc.items() if k != "signature"}
+    return json.dumps(body, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def _key_id(key: bytes) -> str:
+    return hashlib.sha256(key).hexdigest()[:16]
+
+
+def sign_checkpoint(doc: Dict[str, Any], key: bytes) -> Dict[str, Any]:
+    """Assina o documento de checkpoint com HMAC-SHA256 (campo signature)."""
+    signed = dict(doc)
+    signed["signature"] = {
+        "alg": "hmac-sha256",
+        "key_id": _key_id(key),
+        "value": hmac.new(key, _canonical(doc), hashlib.sha256).hexdigest(),
+    }
+    return signed
+
+
+def checkpoint_signature_ok(doc: Dict[str, Any], key: bytes) -> bool:
+    sig = doc.get("signature") or {}
+    if sig.get("alg") != "hmac-sha256" or sig.get("key_id") != _key_id(key):
+        return False
+    expected = hmac.new(key, _canonical(doc), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, str(sig.get("value", "")))
+
+
+def _last_checkpoint(z: zipfile.ZipFile, key: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """Checkpoint mais avançado entre history/hashchain_checkpoints/*.json com assinatura válida."""
+    if key is None:
+        return None
+    best: Optional[Dict[str, Any]] = None
+    for info in z.infolist():
+        name = info.filename.replace("\\", "/")
+        if not (name.startswith(CHECKPOINTS_PREFIX) and name.endswith(".json")):
+            continue
+        try:
+            doc = json.loads(z.read(info).decode("utf-8"))
+        except Exception:
+            continue
+        if not checkpoint_signature_ok(doc, key):
+            continue
+        for cp in doc.get("checkpoints") or []:
+            if best is None or int(cp.get("entries", 0)) > int(best["entries"]):
+                best = {**cp, "source": name}
+    return best
+
+
+def checkpoint_entry_name(doc: Dict[str, Any]) -> str:
+    """
+    Path do documento de checkpoint no snapshot, derivado do checkpoint mais
+    avançado (entries, offset, last_hash): verificações de estados
+    diferentes da cadeia não colidem em history/ (append-only).
+    """
+    cp = doc["checkpoints"][-1]
+    return f"{CHECKPOINTS_PREFIX}{int(cp['entries']):012d}_{int(cp['offset'])}_{str(cp['last_hash'])[:16]}.json"
+
+
+def _checkpoint_matches(fin: IO[bytes], cp: Dict[str, Any], size: int) -> bool:
+    """
+    A linha que termina em cp.offset é a entrada com hash cp.last_hash. Os
+    merges gravam o hashchain ZIP_STORED, então o seek é direto no arquivo;
+    num hashchain comprimido (snapshot reempacotado) ZipExtFile.seek
+    re-infla desde o início e a retomada só poupa o hashing.
+    """
+    offset = int(cp.get("offset", 0))
+    if offset <= 0 or offset > size:
+        return False
+    window = 16 * TAIL_BLOCK
+    start = max(0, offset - window)
+    fin.seek(start)
+    buf = fin.read(offset - start)
+    if not buf.endswith(b"\n") and offset != size:
+        return False
+    stripped = buf.rstrip()
+    cut = stripped.rfind(b"\n")
+    if cut < 0 and start > 0:
+        return False
+    return hash_from_line(stripped[cut + 1:].decode("utf-8", errors="ignore")) == cp.get("last_hash")
+
+
+def verify_hashchain(
+    target: Path,
+    schema: Dict[str, Any],
+    jobs: int = 0,
+    chunk_entries: int = DEFAULT_CHUNK_ENTRIES,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    key: Optional[bytes] = None,
+    use_checkpoints: bool = True,
+    trace_id: str = "trace_local",
+) -> Dict[str, Any]:
+    """
+    Re-verifica history/hashchain.jsonl (snapshot ZIP ou .jsonl solto):
+    schema hashchain.entry.v1 em cada entrada, sha256(prev_hash + entry_str)
+    e links prev_hash -> hash.
+
+    - Segmentos de chunk_entries entradas são verificados em paralelo
+      (processos; jobs<=0 = todos os cores, jobs=1 = inline); a leitura é em
+      stream e no máximo 2*jobs segmentos ficam em memória.
+    - Com key: retoma do último checkpoint assinado do snapshot
+      (history/hashchain_checkpoints/*.json) verificando só as entradas
+      posteriores, e produz um novo documento de checkpoint assinado (a cada
+      checkpoint_every entradas e no fim; só enquanto não há erro).
+    """
+    t0 = time.perf_counter()
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    errors: List[Dict[str, Any]] = []
+    checkpoints: List[Dict[str, Any]] = []
+    resumed: Optional[Dict[str, Any]] = None
+
+    with ExitStack() as stack:
+        if zipfile.is_zipfile(target):
+            z = stack.enter_context(zipfile.ZipFile(target, "r"))
+            if HASHCHAIN_REL not in z.NameToInfo:
+                raise ValueError(f"{target.name} sem {HASHCHAIN_REL}")
+            size = z.getinfo(HASHCHAIN_REL).file_size
+            fin = stack.enter_context(z.open(HASHCHAIN_REL, "r"))
+            cp = _last_checkpoint(z, key) if use_checkpoints else None
+        else:
+            size = target.stat().st_size
+            fin = stack.enter_context(target.open("rb"))
+            cp = None
+
+        start_offset, total, expected_prev = 0, 0, ""
+        if cp is not None:
+            if _checkpoint_matches(fin, cp, size):
+                start_offset, total, expected_prev = int(cp["offset"]), int(cp["entries"]), str(cp["last_hash"])
+                resumed = {"source": cp["source"], "entries": total, "offset": start_offset}
+            else:
+                errors.append({"index": int(cp.get("entries", 0)) - 1, "error": "checkpoint_mismatch", "detail": cp["source"]})
+        fin.seek(start_offset)
+
+        pool = stack.enter_context(ProcessPoolExecutor(max_workers=jobs)) if jobs > 1 else None
+        inflight: Deque[Tuple[Future, int]] = deque()
+        next_checkpoint = (total // checkpoint_every + 1) * checkpoint_every if checkpoint_every > 0 else None
+        head_hash: Optional[str] = expected_prev or None
+
+        def _consume(res: Dict[str, Any], end_offset: int) -> None:
+            nonlocal total, expected_prev, next_checkpoint, head_hash
+            if res["count"] and expected_prev is not None and res["first_prev_hash"] != expected_prev:
+                errors.append({
+                    "index": res["first_index"],
+                    "error": ("genesis_prev_hash" if res["first_index"] == 0 else "broken_link"),
+                })
+            errors.extend(res["errors"])
+            total += res["count"]
+            expected_prev = res["last_hash"]
+            head_hash = res["last_hash"]
+            if key is not None and not errors and next_checkpoint is not None and total >= next_checkpoint:
+                checkpoints.append({"entries": total, "offset": end_offset, "last_hash": res["last_hash"]})
+                next_checkpoint = (total // checkpoint_every + 1) * checkpoint_every
+
+        first_index = total
+        for lines, end_offset in _iter_segments(fin, start_offset, max(1, chunk_entries)):
+            if pool is None:
+                _consume(_verify_segment(lines, first_index, schema), end_offset)
+            else:
+                inflight.append((pool.submit(_verify_segment, lines, first_index, schema), end_offset))
+                while len(inflight) >= 2 * jobs:
+                    fut, off = inflight.popleft()
+                    _consume(fut.result(), off)
+            first_index += len(lines)
+        while inflight:
+            fut, off = inflight.popleft()
+            _consume(fut.result(), off)
+
+    if key is not None and not errors and total and (not checkpoints or checkpoints[-1]["entries"] != total):
+        if resumed is None or total > resumed["entries"]:
+            checkpoints.append({"entries": total, "offset": size, "last_hash": head_hash})
+
+    report: Dict[str, Any] = {
+        "schema_version": "1.0",
+        "trace_id": trace_id,
+        "timestamp": utc_now_iso(),
+        "target": target.name,
+        "ok": not errors,
+        "entries": total,
+        "verified_entries": total - (resumed["entries"] if resumed else 0),
+        "head_hash": head_hash or "",
+        "resumed_from": resumed,
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "errors_truncated": len(errors) > MAX_REPORTED_ERRORS,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+    if key is not None and checkpoints:
+        report["checkpoint"] = sign_checkpoint({
+            "schema_version": "1.0",
+            "trace_id": trace_id,
+            "timestamp": utc_now_iso(),
+            "hashchain": HASHCHAIN_REL,
+            "checkpoints": checkpoints,
+        }, key)
+    return report
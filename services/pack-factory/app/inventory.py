@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+import json
+import os
+import queue
+import threading
+import time
 import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Deque, Iterable, Iterator, List, Optional, Tuple
 
+from .digest_cache import DigestCache, entry_digest, hash_entry
 from .utils import utc_now_iso
 
 def _kind_from_name(name: str) -> str:
@@ -30,47 +40,348 @@ def _should_ignore(path: str) -> bool:
         return True
     return False
 
-def scan_zip(zip_path: Path, trace_id: str | None = None) -> Dict[str, Any]:
-    items: List[Dict[str, Any]] = []
-    ignored: List[str] = []
-    with zipfile.ZipFile(zip_path, "r") as z:
-        for info in z.infolist():
-            if info.is_dir():
-                continue
-            if _should_ignore(info.filename):
-                ignored.append(info.filename)
+MAX_IGNORED = 200
+# itens por fila de subárvore aninhada em voo (iter_scan_zip com jobs > 1)
+NESTED_QUEUE_ITEMS = 256
+
+
+class InventorySummary:
+    """Contadores do inventário atualizados item a item (memória constante)."""
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.bytes = 0
+        self.by_kind: Dict[str, int] = {}
+
+    def add(self, item: Dict[str, Any]) -> None:
+        self.files += 1
+        self.bytes += int(item.get("bytes", 0))
+        self.by_kind[item["kind"]] = self.by_kind.get(item["kind"], 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "by_kind": dict(sorted(self.by_kind.items(), key=lambda kv: (-kv[1], kv[0]))),
+        }
+
+
+def _iter_digests(
+    zip_path: Path,
+    z: zipfile.ZipFile,
+    infos: Iterable[zipfile.ZipInfo],
+    jobs: int,
+    window: int,
+    cache: Optional[DigestCache],
+) -> Iterator[Tuple[zipfile.ZipInfo, str]]:
+    """
+    (info, sha256) na ordem de infos. jobs > 1: entradas fora do cache são
+    hasheadas em threads (zlib e hashlib liberam o GIL), cada worker com seu
+    próprio ZipFile do mesmo arquivo; no máximo `window` entradas em voo
+    (memória limitada a ~jobs x 1 MiB de buffers).
+    """
+    if jobs <= 1:
+        for info in infos:
+            yield info, entry_digest(z, info, cache)
+        return
+
+    local = threading.local()
+    handles: List[zipfile.ZipFile] = []
+    handles_lock = threading.Lock()
+
+    def _work(info: zipfile.ZipInfo) -> str:
+        zw = getattr(local, "z", None)
+        if zw is None:
+            zw = local.z = zipfile.ZipFile(zip_path, "r")
+            with handles_lock:
+                handles.append(zw)
+        return hash_entry(zw, info)
+
+    def _done(info: zipfile.ZipInfo, sha: Optional[str], fut: Optional[Future]) -> Tuple[zipfile.ZipInfo, str]:
+        if sha is None:
+            sha = fut.result()
+            if cache is not None:
+                cache.put(info, sha)
+        return info, sha
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            pending: Deque[Tuple[zipfile.ZipInfo, Optional[str], Optional[Future]]] = deque()
+            for info in infos:
+                if len(pending) >= window:
+                    yield _done(*pending.popleft())
+                sha = cache.get(info) if cache is not None else None
+                pending.append((info, sha, None if sha is not None else pool.submit(_work, info)))
+            while pending:
+                yield _done(*pending.popleft())
+    finally:
+        for zw in handles:
+            zw.close()
+
+
+@dataclass
+class NestedScan:
+    """
+    Descida recursiva em ZIPs aninhados (kind "zip"): subárvores em paralelo,
+    itens com path encadeado zip::<raiz>::<A.zip>::...::<arquivo> (aceito
+    pelo resolver). Não desce além de max_depth níveis nem em ZIP aninhado
+    maior que max_nested_bytes; esses casos vão para `skipped`.
+    """
+    max_depth: int = 4
+    max_nested_bytes: int = 512 * 1024 * 1024
+    skipped: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def iter_scan_zip(
+    zip_path: Path,
+    jobs: int = 1,
+    window: int = 0,
+    cache: Optional[DigestCache] = None,
+    ignored: Optional[List[str]] = None,
+    nested: Optional[NestedScan] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Itens do inventário (path, kind, bytes, sha256) gerados um a um, na ordem
+    do central directory, à medida que são hasheados. jobs > 1 (<= 0 = todos
+    os cores) calcula os sha256 em paralelo com no máximo `window` entradas em
+    voo (default 4 x jobs); a sequência é idêntica à do scan sequencial.
+    cache: DigestCache; entradas com a mesma identidade (path, CRC, tamanhos)
+    não são descomprimidas, só as demais são hasheadas (e entram no cache).
+    ignored: se dada, recebe os primeiros MAX_IGNORED paths ignorados (ruído).
+    nested: se dado, cada ZIP aninhado é seguido pelos itens da sua subárvore,
+    também em stream. Com jobs > 1 até `jobs` subárvores são inventariadas à
+    frente, cada uma numa fila limitada (NESTED_QUEUE_ITEMS itens): a memória
+    fica em ~jobs x NESTED_QUEUE_ITEMS itens, qualquer que seja o tamanho dos
+    ZIPs aninhados.
+    """
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    # subárvores em voo: no máximo `jobs`, cada uma com uma fila de até
+    # NESTED_QUEUE_ITEMS itens (a memória não cresce com o tamanho delas)
+    pending: Deque[str] = deque()
+    running: Dict[str, "queue.Queue[Tuple[str, Any]]"] = {}
+    stop = threading.Event()
+
+    def _iter_subtree(name: str, skipped: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        from .nested import iter_nested  # nested importa zipio -> compression -> inventory
+        return iter_nested(zip_path, name, skipped, nested.max_depth, nested.max_nested_bytes, cache)
+
+    def _put(q: "queue.Queue[Tuple[str, Any]]", msg: Tuple[str, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(msg, timeout=0.1)
+                return True
+            except queue.Full:
                 continue
-            # sha256 do conteúdo extraído (stream)
-            h = __import__("hashlib").sha256()
-            with z.open(info, "r") as f:
-                for chunk in iter(lambda: f.read(1024 * 1024), b""):
-                    h.update(chunk)
-            items.append({
+        return False
+
+    def _produce(name: str, q: "queue.Queue[Tuple[str, Any]]") -> None:
+        skipped: List[Dict[str, Any]] = []
+        try:
+            for item in _iter_subtree(name, skipped):
+                if not _put(q, ("item", item)):
+                    return
+            _put(q, ("done", skipped))
+        except BaseException as e:
+            _put(q, ("error", e))
+
+    def _start(pool: ThreadPoolExecutor) -> None:
+        while pending and len(running) < jobs:
+            name = pending.popleft()
+            q: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=NESTED_QUEUE_ITEMS)
+            running[name] = q
+            pool.submit(_produce, name, q)
+
+    def _drain(q: "queue.Queue[Tuple[str, Any]]") -> Iterator[Dict[str, Any]]:
+        while True:
+            tag, val = q.get()
+            if tag == "item":
+                yield val
+            elif tag == "done":
+                nested.skipped.extend(val)
+                return
+            else:
+                raise val
+
+    with ExitStack() as stack:
+        pool = stack.enter_context(ThreadPoolExecutor(max_workers=jobs)) if nested is not None and jobs > 1 else None
+        stack.callback(stop.set)  # produtores bloqueados na fila desistem (gerador fechado no meio)
+
+        def _selected(z: zipfile.ZipFile) -> Iterator[zipfile.ZipInfo]:
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                if _should_ignore(info.filename):
+                    if ignored is not None and len(ignored) < MAX_IGNORED:
+                        ignored.append(info.filename)
+                    continue
+                if pool is not None and _kind_from_name(info.filename) == "zip":
+                    pending.append(info.filename)
+                    _start(pool)
+                yield info
+
+        z = stack.enter_context(zipfile.ZipFile(zip_path, "r"))
+        for info, digest in _iter_digests(zip_path, z, _selected(z), jobs, window if window > 0 else 4 * jobs, cache):
+            item = {
                 "path": info.filename,
                 "kind": _kind_from_name(info.filename),
                 "bytes": int(info.file_size),
-                "sha256": h.hexdigest(),
-            })
+                "sha256": digest,
+            }
+            yield item
+            if nested is not None and item["kind"] == "zip":
+                q = running.pop(info.filename, None)
+                if q is None:
+                    # ainda não iniciada (todas as vagas ocupadas): em stream, nesta thread
+                    if info.filename in pending:
+                        pending.remove(info.filename)
+                    yield from _iter_subtree(info.filename, nested.skipped)
+                else:
+                    yield from _drain(q)
+                if pool is not None:
+                    _start(pool)
+
+
+def scan_zip(
+    zip_path: Path,
+    trace_id: str | None = None,
+    jobs: int = 1,
+    window: int = 0,
+    cache: Optional[DigestCache] = None,
+    nested: Optional[NestedScan] = None,
+) -> Dict[str, Any]:
+    """Inventário completo em memória (ver iter_scan_zip)."""
+    ignored: List[str] = []
+    summary = InventorySummary()
+    items: List[Dict[str, Any]] = []
+    for item in iter_scan_zip(zip_path, jobs=jobs, window=window, cache=cache, ignored=ignored, nested=nested):
+        summary.add(item)
+        items.append(item)
     out: Dict[str, Any] = {
         "generated_at": utc_now_iso(),
         "root": zip_path.name,
         "items": items,
-        "ignored": ignored[:200],
-        "summary": _summarize(items),
+        "ignored": ignored,
+        "summary": summary.to_dict(),
     }
+    if nested is not None:
+        out["nested_skipped"] = nested.skipped
     if trace_id is not None:
         out["trace_id"] = trace_id
     return out
 
 
-def _summarize(items: List[Dict[str, Any]]) -> Dict[str, Any]:
-    by_kind: Dict[str, int] = {}
-    total_bytes = 0
-    for it in items:
-        by_kind[it["kind"]] = by_kind.get(it["kind"], 0) + 1
-        total_bytes += int(it.get("bytes", 0))
+def write_scan_ndjson(
+    zip_path: Path,
+    out_path: Path,
+    trace_id: str | None = None,
+    jobs: int = 1,
+    window: int = 0,
+    cache: Optional[DigestCache] = None,
+    nested: Optional[NestedScan] = None,
+) -> Dict[str, Any]:
+    """
+    Inventário em NDJSON: uma linha por item, escrita à medida que é hasheado,
+    e um trailer {"record": "summary", ...} com generated_at/root/ignored/
+    summary (+ trace_id). Memória constante no número de entradas. Retorna o
+    trailer.
+    """
+    ignored: List[str] = []
+    summary = InventorySummary()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8", newline="\n") as f:
+        for item in iter_scan_zip(zip_path, jobs=jobs, window=window, cache=cache, ignored=ignored, nested=nested):
+            summary.add(item)
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        trailer: Dict[str, Any] = {
+            "record": "summary",
+            "generated_at": utc_now_iso(),
+            "root": zip_path.name,
+            "ignored": ignored,
+            "summary": summary.to_dict(),
+        }
+        if nested is not None:
+            trailer["nested_skipped"] = nested.skipped
+        if trace_id is not None:
+            trailer["trace_id"] = trace_id
+        f.write(json.dumps(trailer, ensure_ascii=False) + "\n")
+    return trailer
+
+
+def _cd_entries(z: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    return {i.filename: i for i in z.infolist() if not i.is_dir() and not _should_ignore(i.filename)}
+
+
+def _cd_meta(info: zipfile.ZipInfo) -> Dict[str, Any]:
+    return {"bytes": int(info.file_size), "crc32": f"{info.CRC:08x}"}
+
+
+def diff_zips(
+    from_zip: Path,
+    to_zip: Path,
+    confirm: bool = False,
+    cache: Optional[DigestCache] = None,
+) -> Dict[str, Any]:
+    """
+    Diff de dois packs pelos central directories (sem descomprimir):
+    - added/removed: paths só em to_zip/from_zip
+    - modified: mesmo path com CRC32 ou tamanho diferente
+    - renamed: removido + adicionado com mesmo (CRC32, tamanho) — arquivos
+      vazios não entram (qualquer par bateria)
+    confirm=True: entradas tidas como iguais (mesmo path ou rename) têm o
+    sha256 conferido; divergência vira modified (ou add/remove). cache:
+    DigestCache para esses sha256.
+    """
+    t0 = time.perf_counter()
+    with zipfile.ZipFile(from_zip, "r") as za, zipfile.ZipFile(to_zip, "r") as zb:
+        a, b = _cd_entries(za), _cd_entries(zb)
+
+        def _same(ia: zipfile.ZipInfo, ib: zipfile.ZipInfo) -> bool:
+            if (ia.CRC, ia.file_size) != (ib.CRC, ib.file_size):
+                return False
+            return not confirm or entry_digest(za, ia, cache) == entry_digest(zb, ib, cache)
+
+        modified: List[Dict[str, Any]] = []
+        unchanged = 0
+        for name in sorted(set(a) & set(b)):
+            if _same(a[name], b[name]):
+                unchanged += 1
+            else:
+                modified.append({"path": name, "from": _cd_meta(a[name]), "to": _cd_meta(b[name])})
+
+        removed_by_key: Dict[Tuple[int, int], List[str]] = {}
+        for name in sorted(set(a) - set(b)):
+            if a[name].file_size > 0:
+                removed_by_key.setdefault((a[name].CRC, a[name].file_size), []).append(name)
+        renamed: List[Dict[str, Any]] = []
+        renamed_from = set()
+        added: List[str] = []
+        for name in sorted(set(b) - set(a)):
+            candidates = removed_by_key.get((b[name].CRC, b[name].file_size), [])
+            match = next((old for old in candidates if _same(a[old], b[name])), None)
+            if match is None:
+                added.append(name)
+                continue
+            candidates.remove(match)
+            renamed_from.add(match)
+            renamed.append({"from": match, "to": name, **_cd_meta(b[name])})
+        removed = [name for name in sorted(set(a) - set(b)) if name not in renamed_from]
+
     return {
-        "files": len(items),
-        "bytes": total_bytes,
-        "by_kind": dict(sorted(by_kind.items(), key=lambda kv: (-kv[1], kv[0]))),
+        "schema_version": "1.0",
+        "generated_at": utc_now_iso(),
+        "from": {"path": from_zip.name, "entries": len(a)},
+        "to": {"path": to_zip.name, "entries": len(b)},
+        "confirmed": confirm,
+        "counts": {
+            "added": len(added),
+            "removed": len(removed),
+            "modified": len(modified),
+            "renamed": len(renamed),
+            "unchanged": unchanged,
+        },
+        "added": added,
+        "removed": removed,
+        "modified": modified,
+        "renamed": renamed,
+        "elapsed_s": round(time.perf_counter() - t0, 4),
     }
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import json
-import re
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional
+
+from .policy_matcher import compile_policy
+from .secret_scan import scan_zip_content, secret_patterns_from_policy
 
 
 @dataclass
@@ -22,6 +24,8 @@ def leak_check_zip(
     target_zip: Path,
     policy_path: Path,
     out_path: Optional[Path] = None,
+    content: bool = False,
+    jobs: int = 0,
 ) -> Dict[str, Any]:
     """Valida um ZIP contra política de audiência (no_leak).
 
@@ -30,41 +34,46 @@ def leak_check_zip(
     - denylist_regex: qualquer basename que bata é violação
     - allowlist_prefixes (opcional): qualquer arquivo fora da allowlist é violação
 
+    Política compilada (trie de prefixos + regex único; cacheada pelo digest)
+    e namelist classificado em batch.
+
+    content=True: o conteúdo das entradas que passam pelos nomes é varrido em
+    busca de segredos (secret_scan; "secret_patterns" da policy substitui os
+    defaults), em `jobs` threads; achado vira violação "secret" com pattern e
+    offset, e o report ganha "content_scan" com o throughput.
+
     Retorna report JSON e, se out_path informado, escreve no disco.
     """
     policy = _load_policy(policy_path)
-    allow_prefixes: List[str] = [str(x) for x in (policy.get("allowlist_prefixes") or [])]
-    deny_prefixes: List[str] = [str(x) for x in (policy.get("denylist_prefixes") or [])]
-    deny_regexes = [re.compile(str(x)) for x in (policy.get("denylist_regex") or [])]
-
-    violations: List[LeakViolation] = []
+    matcher = compile_policy(policy)
 
     with zipfile.ZipFile(target_zip, "r") as z:
-        for name in z.namelist():
-            if not name or name.endswith("/"):
-                continue
-            # normalize
-            n = name.replace("\\", "/")
-            base = n.split("/")[-1]
-
-            if any(n.startswith(p) for p in deny_prefixes):
-                violations.append(LeakViolation(path=n, reason="deny_prefix"))
-                continue
-            if any(rx.search(base) for rx in deny_regexes):
-                violations.append(LeakViolation(path=n, reason="deny_regex"))
-                continue
-            if allow_prefixes and not any(n.startswith(p) for p in allow_prefixes):
-                violations.append(LeakViolation(path=n, reason="outside_allowlist"))
-                continue
+        files = [n for n in z.namelist() if n and not n.endswith("/")]
+    reasons = matcher.classify_batch(files)
+    violations: List[Dict[str, Any]] = [
+        LeakViolation(path=n.replace("\\", "/"), reason=r).__dict__ for n, r in zip(files, reasons) if r is not None
+    ]
+
+    scan: Optional[Dict[str, Any]] = None
+    secrets = 0
+    if content:
+        allowed = [n for n, r in zip(files, reasons) if r is None]
+        findings, scan = scan_zip_content(target_zip, allowed, secret_patterns_from_policy(policy), jobs=jobs)
+        secrets = len(findings)
+        for f in findings:
+            violations.append({"path": f["path"].replace("\\", "/"), "reason": "secret", "pattern": f["pattern"], "offset": f["offset"]})
 
     report: Dict[str, Any] = {
         "schema_version": "1.0",
         "status": "PASS" if not violations else "FAIL",
         "checked_zip": str(target_zip),
         "policy": str(policy_path),
-        "violations": [v.__dict__ for v in violations],
+        "violations": violations,
         "counts": {"violations": len(violations)},
     }
+    if scan is not None:
+        report["counts"]["secrets"] = secrets
+        report["content_scan"] = scan
 
     if out_path is not None:
         out_path.parent.mkdir(parents=True, exist_ok=True)
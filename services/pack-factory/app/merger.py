@@ -1,18 +1,33 @@
 from __future__ import annotations
 
 import hashlib
+import io
 import re
 import json
 import shutil
+import tempfile
 import zipfile
+import zlib
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .software_book import write_software_book
-from .utils import sha256_file, utc_now_iso, write_json
+from .compression import CompressionPolicy
+from .digest_cache import DigestCache, entry_digest
+from .hashchain import HASHCHAIN_REL, HASHCHAIN_TAIL_REL, TailWriter, hash_from_line, tail_of_entry
+from .public_export import public_export_policy_from_text, public_paths
+from .software_book import NAV_ASSETS, navigation_assets, render_filemap, render_software_book, write_software_book
+from .store import STORE_REF_PREFIX, PackStore, add_raw_entry, open_pack, raw_entry_chunks
+from .utils import file_lock, fixed_epoch, json_bytes, sha256_file, utc_now_iso, write_json
+from .zipio import COPY_CHUNK, FLAG_ENCRYPTED, PackWriter
 from . import module_registry
 
 HISTORY_PREFIX = "history/"
+CHAIN_STATE_REL = "history/chain_state.json"
+
+# Sufixo do hashchain (patches + entrada nova): em memória até este tamanho
+HASHCHAIN_SPOOL_BYTES = 8 * 1024 * 1024
 
 
 def _unzip_to_dir(zip_path: Path, out_dir: Path) -> None:
@@ -21,27 +36,31 @@ def _unzip_to_dir(zip_path: Path, out_dir: Path) -> None:
         z.extractall(out_dir)
 
 
-def _copy_tree(src: Path, dst: Path) -> None:
+def _copy_tree(src: Path, dst: Path, skip: Tuple[str, ...] = ()) -> None:
     """
     Overlay determinístico:
     - O pack mais recente sobrescreve o anterior
     - history/ é append-only, com exceções controladas:
-      - history/chain_state.json: pode sobrescrever (arquivo derivado)
+      - history/chain_state.json e history/hashchain.tail.json: podem
+        sobrescrever (arquivos derivados)
       - history/hashchain.jsonl: merge append-only (concat)
+    - paths em skip não são copiados
     """
     for p in src.rglob("*"):
         if not p.is_file():
             continue
         rel = str(p.relative_to(src)).replace("\\", "/")
+        if rel in skip:
+            continue
         dest = dst / rel
         dest.parent.mkdir(parents=True, exist_ok=True)
 
         # Exceções controladas
-        if rel == "history/chain_state.json":
+        if rel in (CHAIN_STATE_REL, HASHCHAIN_TAIL_REL):
             shutil.copy2(p, dest)
             continue
 
-        if rel == "history/hashchain.jsonl" and dest.exists():
+        if rel == HASHCHAIN_REL and dest.exists():
             with dest.open("a", encoding="utf-8") as fout, p.open("r", encoding="utf-8", errors="ignore") as fin:
                 for line in fin:
                     if line.strip():
@@ -92,72 +111,46 @@ def _next_expected_from_pack_ref(pack_ref: str) -> str:
     return "unknown"
 
 
-def merge_packs(
-    pack_zips: List[Path],
-    out_zip: Path,
-    tmp_dir: Path,
-    trace_id: str = "trace_local",
-    generate_software_book: bool = True,
-    mode: str = "candidate",
-) -> None:
-    """
-    Faz merge determinístico em snapshot ZIP final.
-    mode:
-      - candidate: não exige approval
-      - promoted: exige pelo menos 1 approval com decision=approved
-    """
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-    work = tmp_dir / "work"
-    if work.exists():
-        shutil.rmtree(work)
-    work.mkdir(parents=True, exist_ok=True)
-
-    # Layered unzip + overlay copy
-    for i, pzip in enumerate(pack_zips):
-        layer = tmp_dir / f"layer_{i}"
-        if layer.exists():
-            shutil.rmtree(layer)
-        _unzip_to_dir(pzip, layer)
-        _copy_tree(layer, work)
-
-    # Gate promoted
-    last_approval = _read_last_approval(work)
+def _gate_promoted(last_approval: dict | None, mode: str) -> None:
     if mode == "promoted":
         if not last_approval:
             raise RuntimeError("promoted merge exige approval (history/approvals/*).")
         if str(last_approval.get("decision","")) != "approved":
             raise RuntimeError("promoted merge exige approval decision=approved.")
 
-    # Auto docs
-    if generate_software_book:
-        write_software_book(
-            work,
-            packs_merged=[p.name for p in pack_zips],
-            trace_id=trace_id,
-        )
 
-    # Merge receipt + chain_state + hashchain (tamper-evident)
-    receipts_dir = work / "history" / "merge_receipts"
-    receipts_dir.mkdir(parents=True, exist_ok=True)
+def _input_meta(pzip: Path, store: Optional[PackStore] = None) -> dict:
+    if store is not None and str(pzip).startswith(STORE_REF_PREFIX):
+        # ref do store: sha256 do ZIP guardado, do catalog (nada é reconstruído)
+        return {"path": str(pzip), "sha256": str(store.manifest(str(pzip)[len(STORE_REF_PREFIX):])["zip"]["sha256"])}
+    try:
+        return {"path": pzip.name, "sha256": sha256_file(pzip)}
+    except Exception:
+        return {"path": pzip.name, "sha256": ""}
 
-    inputs_meta = []
-    for pzip in pack_zips:
-        try:
-            inputs_meta.append({"path": pzip.name, "sha256": sha256_file(pzip)})
-        except Exception:
-            inputs_meta.append({"path": pzip.name, "sha256": ""})
 
+def _build_receipt(
+    pack_zips: List[Path],
+    trace_id: str,
+    mode: str,
+    base_zip: Optional[Path] = None,
+    store: Optional[PackStore] = None,
+) -> dict:
     receipt = {
         "schema_version": "1.0",
         "trace_id": trace_id,
         "timestamp": utc_now_iso(),
-        "inputs": inputs_meta,
+        "inputs": [_input_meta(pzip, store) for pzip in pack_zips],
         "mode": mode,
         "notes": "gerado automaticamente pelo merge (determinístico)",
     }
-    receipt_path = receipts_dir / f"{trace_id}.json"
-    write_json(receipt_path, receipt)
+    if base_zip is not None:
+        receipt["base"] = _input_meta(base_zip, store)
+        receipt["notes"] = "gerado automaticamente pelo merge incremental (base + patches)"
+    return receipt
+
 
+def _build_chain_state(last_approval: dict | None, trace_id: str, mode: str) -> dict:
     chain_state = {
         "schema_version": "1.0",
         "trace_id": trace_id,
@@ -193,42 +186,15 @@ def merge_packs(
                         chain_state["next_expected_note"] = slices_cfg["note"]
     except Exception:
         pass
+    return chain_state
 
-    chain_state_path = work / "history" / "chain_state.json"
-    write_json(chain_state_path, chain_state)
 
-    # Hashchain append-only
-    hashchain_path = work / "history" / "hashchain.jsonl"
-    prev_hash = ""
-    if hashchain_path.exists():
-        try:
-            last_line = [ln for ln in hashchain_path.read_text(encoding="utf-8", errors="ignore").splitlines() if ln.strip()][-1]
-            prev_hash = json.loads(last_line).get("hash","")
-        except Exception:
-            prev_hash = ""
-    payload_sha = sha256_file(receipt_path)
-    entry = {
-        "schema_version": "1.0",
-        "entry_type": "merge_receipt",
-        "payload_sha256": payload_sha,
-        "prev_hash": prev_hash,
-        "timestamp": utc_now_iso(),
-    }
-    entry_str = json.dumps(entry, ensure_ascii=False, sort_keys=True)
-    entry_hash = hashlib.sha256((prev_hash + entry_str).encode("utf-8")).hexdigest()
-    entry["hash"] = entry_hash
-    hashchain_path.parent.mkdir(parents=True, exist_ok=True)
-    with hashchain_path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-
-    # Prompt de continuidade determinístico (público)
-    pc_path = work / "docs" / "public" / "PROMPT_CONTINUIDADE.md"
-    pc_path.parent.mkdir(parents=True, exist_ok=True)
+def _render_prompt_continuidade(pack_names: List[str], chain_state: dict, trace_id: str, mode: str) -> str:
     pc_lines = []
     pc_lines.append("# Prompt de Continuidade (snapshot)\n")
     pc_lines.append(f"**trace_id:** {trace_id}\n")
     pc_lines.append("## Packs merged\n")
-    for p in [p.name for p in pack_zips]:
+    for p in pack_names:
         pc_lines.append(f"- `{p}`")
     pc_lines.append("")
     pc_lines.append("## Estado (chain_state)\n")
@@ -246,13 +212,597 @@ def merge_packs(
         pc_lines.append("- Para promover: gere RUN_REPORT + APPROVAL, empacote como patch packs e refaça merge em `--mode promoted`.\n")
     else:
         pc_lines.append(f"- Próximo pack esperado: `{chain_state.get('next_expected','')}`\n")
-    pc_path.write_text("\n".join(pc_lines) + "\n", encoding="utf-8")
+    return "\n".join(pc_lines) + "\n"
 
-    # Zip snapshot
+
+# ── Overlay por metadados (central directory) ──
+
+@dataclass
+class _Overlay:
+    winners: Dict[str, Tuple[int, zipfile.ZipInfo]] = field(default_factory=dict)
+    overwritten: Dict[str, List[int]] = field(default_factory=dict)
+    hashchain_sources: List[Tuple[int, zipfile.ZipInfo]] = field(default_factory=list)
+    violations: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _layer_entries(z: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    """Entradas de arquivo de um layer (nome normalizado; nome duplicado: última vence, como extractall)."""
+    out: Dict[str, zipfile.ZipInfo] = {}
+    for info in z.infolist():
+        if info.is_dir():
+            continue
+        out[info.filename.replace("\\", "/")] = info
+    return out
+
+
+def _overlay_entries(layers: List[Dict[str, zipfile.ZipInfo]], strict: bool = True) -> _Overlay:
+    """
+    Mesmas regras de _copy_tree, só com metadados:
+    - winners: {rel: (layer, info)} do vencedor de cada path
+    - hashchain_sources: fontes de history/hashchain.jsonl na ordem de concatenação
+    - strict=True: RuntimeError na primeira violação append-only;
+      strict=False: coleta em violations (usado pelo plano)
+    """
+    ov = _Overlay()
+    for i, entries in enumerate(layers):
+        for rel, info in entries.items():
+            if rel == HASHCHAIN_REL:
+                ov.hashchain_sources.append((i, info))
+                continue
+            if rel in ov.winners:
+                if rel.startswith(HISTORY_PREFIX) and rel not in (CHAIN_STATE_REL, HASHCHAIN_TAIL_REL):
+                    if strict:
+                        raise RuntimeError(f"append-only violation on {rel}")
+                    ov.violations.append({"path": rel, "layer": i, "existing_layer": ov.winners[rel][0], "reason": "append_only"})
+                    continue
+                ov.overwritten.setdefault(rel, []).append(ov.winners[rel][0])
+            ov.winners[rel] = (i, info)
+    return ov
+
+
+def _read_layers(layer_zips: List[Path], store: Optional[PackStore] = None) -> List[Dict[str, zipfile.ZipInfo]]:
+    """Entradas de cada layer; com store, refs "store:<nome>" vêm do catalog."""
+    layers = []
+    for pzip in layer_zips:
+        with open_pack(pzip, store) as z:
+            layers.append(_layer_entries(z))
+    return layers
+
+
+def _generated_rels(trace_id: str, generate_software_book: bool) -> List[str]:
+    """Paths que o merge (re)gera — sempre comprimidos, nunca copiados de layer."""
+    rels = [
+        f"history/merge_receipts/{trace_id}.json",
+        CHAIN_STATE_REL,
+        HASHCHAIN_REL,
+        HASHCHAIN_TAIL_REL,
+        "docs/public/PROMPT_CONTINUIDADE.md",
+    ]
+    if generate_software_book:
+        rels += ["docs/public/FILEMAP.md", "docs/public/SOFTWARE_BOOK.md"]
+        rels += [f"docs/public/{f}" for f in NAV_ASSETS]
+    return rels
+
+
+def plan_merge(
+    pack_zips: List[Path],
+    trace_id: str = "trace_local",
+    generate_software_book: bool = True,
+    base_zip: Optional[Path] = None,
+    store: Optional[PackStore] = None,
+) -> Dict[str, Any]:
+    """
+    Plano do merge calculado só com ZipFile.infolist() de cada entrada
+    (nenhum conteúdo é lido/extraído): vencedor por path, layers sobrescritos,
+    violações append-only, fontes do hashchain e estimativa de bytes. Refs
+    "store:<nome>" usam o catalog do store (sem reconstruir o pack).
+    """
+    layer_zips = ([base_zip] if base_zip is not None else []) + list(pack_zips)
+    layers = _read_layers(layer_zips, store)
+    ov = _overlay_entries(layers, strict=False)
+    generated = _generated_rels(trace_id, generate_software_book)
+
+    entries = []
+    out_bytes = 0
+    out_zip_bytes = 0
+    for rel in sorted(ov.winners):
+        i, info = ov.winners[rel]
+        entries.append({
+            "path": rel,
+            "layer": i,
+            "overwritten_layers": ov.overwritten.get(rel, []),
+            "bytes": int(info.file_size),
+            "compress_size": int(info.compress_size),
+            "regenerated": rel in generated,
+        })
+        out_bytes += int(info.file_size)
+        out_zip_bytes += int(info.compress_size)
+    hashchain_bytes = sum(int(info.file_size) for _, info in ov.hashchain_sources)
+
+    return {
+        "schema_version": "1.0",
+        "timestamp": utc_now_iso(),
+        "trace_id": trace_id,
+        "ok": not ov.violations,
+        "layers": [
+            {"index": i, "path": pz.name, "role": ("base" if (base_zip is not None and i == 0) else "layer"), "files": len(layers[i])}
+            for i, pz in enumerate(layer_zips)
+        ],
+        "violations": ov.violations,
+        "hashchain_sources": [{"layer": i, "bytes": int(info.file_size)} for i, info in ov.hashchain_sources],
+        "generated": generated,
+        "entries": entries,
+        "estimate": {
+            "files": len(set(ov.winners) | set(generated)),
+            # conteúdo vindo dos layers (sem contar os arquivos regenerados pequenos)
+            "output_bytes": out_bytes + hashchain_bytes,
+            "output_zip_bytes": out_zip_bytes + hashchain_bytes,
+            # engine por extração: layers extraídos + work/
+            "tmp_bytes": sum(int(info.file_size) for layer in layers for info in layer.values()) + out_bytes + hashchain_bytes,
+        },
+    }
+
+
+def merge_packs(
+    pack_zips: List[Path],
+    out_zip: Path,
+    tmp_dir: Optional[Path],
+    trace_id: str = "trace_local",
+    generate_software_book: bool = True,
+    mode: str = "candidate",
+    streaming: bool = False,
+    base_zip: Optional[Path] = None,
+    jobs: int = 0,
+    compression: Optional[CompressionPolicy] = None,
+    store: Optional[PackStore] = None,
+) -> None:
+    """
+    Faz merge determinístico em snapshot ZIP final.
+    mode:
+      - candidate: não exige approval
+      - promoted: exige pelo menos 1 approval com decision=approved
+    streaming:
+      - False: extrai cada layer num workspace próprio (tmp_dir/merge_*),
+        removido ao final; várias invocações podem compartilhar tmp_dir
+        (obrigatório só neste caminho)
+      - True: overlay calculado dos central directories e escrita direta
+        ZIP->ZIP (tmp_dir não é usado; pode ser None)
+    base_zip (merge incremental, implica streaming):
+      - snapshot já mergeado usado como estado inicial; pack_zips são só os
+        novos layers (patches). Mesmas regras append-only/hashchain e um novo
+        merge receipt; o conteúdo da base é copiado cru (sem recompressão).
+    jobs: threads de compressão do PackWriter (0 = todos os cores).
+    compression: política de compressão por tipo (default: CompressionPolicy());
+      o merge receipt registra as estatísticas por tipo em "compression".
+    store (implica streaming): CAS local de packs; entradas "store:<nome>"
+      em pack_zips/base_zip são lidas direto do catalog (metadados) e dos
+      blobs (cópia crua), sem reconstruir o ZIP, e o snapshot de saída é
+      registrado no catalog (nome = out_zip.stem) ainda sob o lock do merge.
+
+    Merges com o mesmo out_zip são serializados por lock de arquivo
+    (o history/hashchain do snapshot de saída não é produzido por dois merges
+    ao mesmo tempo); merges para snapshots diferentes rodam em paralelo.
+    """
     out_zip.parent.mkdir(parents=True, exist_ok=True)
-    if out_zip.exists():
-        out_zip.unlink()
-    with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
-        for p in work.rglob("*"):
-            if p.is_file():
-                z.write(p, arcname=str(p.relative_to(work)).replace("\\", "/"))
+    with file_lock(out_zip.parent / f".{out_zip.name}.lock"):
+        if streaming or base_zip is not None or store is not None:
+            _merge_packs_streaming(
+                pack_zips, out_zip, trace_id, generate_software_book, mode,
+                base_zip=base_zip, jobs=jobs, compression=compression, store=store,
+            )
+            if store is not None:
+                store.put(out_zip)
+            return
+
+        if tmp_dir is None:
+            raise ValueError("merge por extração exige tmp_dir (ou streaming/base_zip/store).")
+
+        # Fail-fast: violações append-only detectadas só com os central directories
+        overlay = _overlay_entries(_read_layers(pack_zips))
+
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        workspace = Path(tempfile.mkdtemp(prefix="merge_", dir=tmp_dir))
+        try:
+            _merge_packs_extract(pack_zips, out_zip, workspace, overlay, trace_id, generate_software_book, mode, jobs, compression)
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+def _crc32_file(path: Path) -> int:
+    crc = 0
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _merge_packs_extract(
+    pack_zips: List[Path],
+    out_zip: Path,
+    workspace: Path,
+    overlay: _Overlay,
+    trace_id: str,
+    generate_software_book: bool,
+    mode: str,
+    jobs: int,
+    compression: Optional[CompressionPolicy] = None,
+) -> None:
+    work = workspace / "work"
+    work.mkdir(parents=True, exist_ok=True)
+
+    # Layered unzip + overlay copy
+    for i, pzip in enumerate(pack_zips):
+        layer = workspace / f"layer_{i}"
+        _unzip_to_dir(pzip, layer)
+        # o hashchain é escrito em stream dos ZIPs junto com o receipt
+        _copy_tree(layer, work, skip=(HASHCHAIN_REL, HASHCHAIN_TAIL_REL))
+
+    # Gate promoted
+    last_approval = _read_last_approval(work)
+    _gate_promoted(last_approval, mode)
+
+    # Auto docs
+    if generate_software_book:
+        write_software_book(
+            work,
+            packs_merged=[p.name for p in pack_zips],
+            trace_id=trace_id,
+            extra_names=[rel for rel in (HASHCHAIN_REL, HASHCHAIN_TAIL_REL)
+                         if rel in overlay.winners or (rel == HASHCHAIN_REL and overlay.hashchain_sources)],
+        )
+
+    # Merge receipt + hashchain são escritos por último no ZIP (adiados)
+    receipt = _build_receipt(pack_zips, trace_id, mode)
+    receipt_rel = f"history/merge_receipts/{trace_id}.json"
+
+    chain_state = _build_chain_state(last_approval, trace_id, mode)
+    chain_state_path = work / "history" / "chain_state.json"
+    write_json(chain_state_path, chain_state)
+
+    # Prompt de continuidade determinístico (público)
+    pc_path = work / "docs" / "public" / "PROMPT_CONTINUIDADE.md"
+    pc_path.parent.mkdir(parents=True, exist_ok=True)
+    pc_path.write_text(_render_prompt_continuidade([p.name for p in pack_zips], chain_state, trace_id, mode), encoding="utf-8")
+
+    # Zip snapshot: arquivos gerados pelo merge são comprimidos; os demais
+    # vêm intactos de um layer (mesmo tamanho e CRC32) e são copiados crus do
+    # ZIP de origem. O hashchain é concatenado a partir dos layers (mesmas
+    # regras de _copy_tree) junto com o receipt.
+    generated = set(_generated_rels(trace_id, generate_software_book))
+    deferred = {receipt_rel, HASHCHAIN_REL, HASHCHAIN_TAIL_REL}
+
+    with ExitStack() as stack:
+        zips = [stack.enter_context(zipfile.ZipFile(p, "r")) for p in pack_zips]
+        layers = [_layer_entries(z) for z in zips]
+        winners = overlay.winners
+        with PackWriter(out_zip, jobs=jobs, policy=compression) as w:
+            for p in work.rglob("*"):
+                if p.is_file():
+                    rel = str(p.relative_to(work)).replace("\\", "/")
+                    if rel in deferred:
+                        continue
+                    src = winners.get(rel) if rel not in generated else None
+                    if src is not None and src[1].file_size == p.stat().st_size and src[1].CRC == _crc32_file(p):
+                        w.add_entry(zips[src[0]], src[1], arcname=rel)
+                    else:
+                        w.add_file(p, arcname=rel)
+            _add_receipt_and_hashchain(w, receipt_rel, receipt, zips, layers, overlay.hashchain_sources)
+
+
+# ── Streaming merge (ZIP -> ZIP, sem layers em disco) ──
+
+def _hashchain_chunks(
+    zips: List[zipfile.ZipFile],
+    layers: List[Dict[str, zipfile.ZipInfo]],
+    sources: List[Tuple[int, zipfile.ZipInfo]],
+    payload_sha: str,
+    entry_type: str = "merge_receipt",
+) -> Tuple[TailWriter, Iterator[bytes]]:
+    """
+    history/hashchain.jsonl concatenando as fontes em stream (1ª fonte bytes
+    crus, demais normalizadas por linha, como _copy_tree) mais a entrada do
+    merge: (TailWriter com tamanho/CRC/cauda do resultado, chunks).
+    A 1ª fonte (a base, que cresce a cada merge) ZIP_STORED é copiada crua
+    da origem: tamanho e CRC partem dos do central directory e só o sufixo
+    (patches + entrada nova, num spool) passa pelo TailWriter, com o CRC
+    continuado (zlib.crc32(sufixo, info.CRC)). O prev_hash dela vem da
+    cauda (sidecar do layer ou leitura do fim); as demais fontes já são
+    lidas linha a linha na concatenação.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=HASHCHAIN_SPOOL_BYTES)
+    try:
+        out = TailWriter(spool)
+        head: Iterable[bytes] = ()
+        prev_hash = ""
+        for n, (i, info) in enumerate(sources):
+            if n == 0:
+                _, prev_hash = tail_of_entry(zips[i], info, layers[i].get(HASHCHAIN_TAIL_REL))
+                if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & FLAG_ENCRYPTED:
+                    out.bytes, out.crc32 = int(info.file_size), int(info.CRC)
+                    head = raw_entry_chunks(zips[i], info)
+                else:
+                    with zips[i].open(info, "r") as raw:
+                        shutil.copyfileobj(raw, out, COPY_CHUNK)
+                continue
+            last_line = None
+            with zips[i].open(info, "r") as raw:
+                for line in io.TextIOWrapper(raw, encoding="utf-8", errors="ignore"):
+                    if line.strip():
+                        last_line = line
+                        out.write((line.rstrip("\n") + "\n").encode("utf-8"))
+            if last_line is not None:
+                prev_hash = hash_from_line(last_line)
+        out.append_entry(prev_hash, payload_sha, entry_type)
+    except BaseException:
+        spool.close()
+        raise
+
+    def _chunks() -> Iterator[bytes]:
+        with spool:
+            yield from head
+            spool.seek(0)
+            yield from iter(lambda: spool.read(COPY_CHUNK), b"")
+
+    return out, _chunks()
+
+
+def _add_hashchain(
+    w: PackWriter,
+    zips: List[zipfile.ZipFile],
+    layers: List[Dict[str, zipfile.ZipInfo]],
+    sources: List[Tuple[int, zipfile.ZipInfo]],
+    payload_sha: Callable[[], str],
+    entry_type: str = "merge_receipt",
+    compress_type: Optional[int] = None,
+    deferred: bool = False,
+) -> None:
+    """
+    Registra hashchain + sidecar da cauda (escritos nessa ordem pelo serializer).
+    payload_sha é chamado na escrita (o payload pode ser uma entrada adiada).
+    O hashchain é sempre ZIP_STORED: a cauda (e o sidecar, conferido contra
+    ela) é lida por seek no próximo merge, sem descomprimir o histórico, e a
+    base é copiada crua com o CRC continuado (PackWriter.add_stored).
+    """
+    state: Dict[str, TailWriter] = {}
+
+    def _chain() -> Tuple[int, int, Iterable[bytes]]:
+        tail, chunks = _hashchain_chunks(zips, layers, sources, payload_sha(), entry_type)
+        state["tail"] = tail
+        return tail.crc32, tail.bytes, chunks
+
+    w.add_stored(HASHCHAIN_REL, _chain, deferred=deferred)
+    w.add_stream(
+        HASHCHAIN_TAIL_REL,
+        lambda f: f.write(json_bytes(state["tail"].sidecar())),
+        compress_type=compress_type,
+        deferred=deferred,
+    )
+
+
+def _add_receipt_and_hashchain(
+    w: PackWriter,
+    receipt_rel: str,
+    receipt: dict,
+    zips: List[zipfile.ZipFile],
+    layers: List[Dict[str, zipfile.ZipInfo]],
+    sources: List[Tuple[int, zipfile.ZipInfo]],
+) -> None:
+    """
+    Merge receipt, hashchain e sidecar como entradas adiadas (escritas depois
+    de todas as outras): o receipt registra em "compression" as estatísticas
+    por tipo das demais entradas do snapshot, e o hashchain encadeia o sha256
+    desse receipt. Segundos são omitidos no modo reprodutível.
+    """
+    state: Dict[str, str] = {}
+
+    def _receipt(f: IO[bytes]) -> None:
+        receipt["compression"] = w.stats.to_dict(timings=fixed_epoch() is None)
+        data = json_bytes(receipt)
+        state["sha"] = hashlib.sha256(data).hexdigest()
+        f.write(data)
+
+    w.add_stream(receipt_rel, _receipt, deferred=True)
+    _add_hashchain(w, zips, layers, sources, lambda: state["sha"], deferred=True)
+
+
+def _merge_packs_streaming(
+    pack_zips: List[Path],
+    out_zip: Path,
+    trace_id: str,
+    generate_software_book: bool,
+    mode: str,
+    base_zip: Optional[Path] = None,
+    jobs: int = 0,
+    compression: Optional[CompressionPolicy] = None,
+    store: Optional[PackStore] = None,
+) -> None:
+    layer_zips = ([base_zip] if base_zip is not None else []) + list(pack_zips)
+    receipt_rel = f"history/merge_receipts/{trace_id}.json"
+    with ExitStack() as stack:
+        zips = [stack.enter_context(open_pack(p, store)) for p in layer_zips]
+        layers = [_layer_entries(z) for z in zips]
+        if base_zip is not None:
+            if CHAIN_STATE_REL not in layers[0]:
+                raise ValueError(f"--base não parece um snapshot (sem {CHAIN_STATE_REL}): {base_zip.name}")
+        overlay = _overlay_entries(layers)
+        winners, hashchain_sources = overlay.winners, overlay.hashchain_sources
+        if base_zip is not None and receipt_rel in winners:
+            raise RuntimeError(f"append-only violation on {receipt_rel}")
+
+        generated: Dict[str, bytes] = {}
+
+        def _read_text(rel: str) -> str:
+            if rel in generated:
+                return generated[rel].decode("utf-8", errors="ignore")
+            if rel not in winners:
+                return ""
+            i, info = winners[rel]
+            try:
+                return zips[i].read(info).decode("utf-8", errors="ignore")
+            except Exception:
+                return ""
+
+        # Gate promoted
+        last_approval = None
+        approvals = sorted(
+            rel for rel in winners
+            if rel.startswith("history/approvals/") and rel.count("/") == 2 and rel.endswith(".json")
+        )
+        if approvals:
+            try:
+                last_approval = json.loads(_read_text(approvals[-1]))
+            except Exception:
+                last_approval = None
+        _gate_promoted(last_approval, mode)
+
+        pack_names = [p.name for p in layer_zips]
+
+        # Auto docs
+        if generate_software_book:
+            generated.update(navigation_assets())
+            names = set(winners) | set(generated)
+            if hashchain_sources:
+                names.add(HASHCHAIN_REL)
+            policy_text = _read_text("governance/public_export_policy.json") if "governance/public_export_policy.json" in names else None
+            policy = public_export_policy_from_text(policy_text)
+            filemap = sorted(public_paths(names, policy))
+            generated["docs/public/FILEMAP.md"] = render_filemap(filemap).encode("utf-8")
+            names_list = sorted(names)
+            generated["docs/public/SOFTWARE_BOOK.md"] = render_software_book(
+                names_list, _read_text, packs_merged=pack_names, trace_id=trace_id,
+            ).encode("utf-8")
+
+        # chain_state (receipt + hashchain são escritos por último, em stream)
+        receipt = _build_receipt(pack_zips, trace_id, mode, base_zip=base_zip, store=store)
+        chain_state = _build_chain_state(last_approval, trace_id, mode)
+        generated[CHAIN_STATE_REL] = json_bytes(chain_state)
+        generated["docs/public/PROMPT_CONTINUIDADE.md"] = _render_prompt_continuidade(pack_names, chain_state, trace_id, mode).encode("utf-8")
+
+        with PackWriter(out_zip, jobs=jobs, policy=compression) as w:
+            for rel, (i, info) in winners.items():
+                add_raw_entry(w, zips[i], info, arcname=rel)
+            for rel, data in generated.items():
+                w.add_bytes(rel, data)
+            _add_receipt_and_hashchain(w, receipt_rel, receipt, zips, layers, hashchain_sources)
+
+
+# ── Compactação (snapshot + linhagem de patch packs -> base compacta) ──
+
+def _scan_hashchain(zips: List[zipfile.ZipFile], sources: List[Tuple[int, zipfile.ZipInfo]]) -> Tuple[int, str]:
+    """(nº de entradas, hash da última entrada) do hashchain concatenado."""
+    count = 0
+    last_line = ""
+    for i, info in sources:
+        with zips[i].open(info, "r") as raw:
+            for line in io.TextIOWrapper(raw, encoding="utf-8", errors="ignore"):
+                if line.strip():
+                    count += 1
+                    last_line = line
+    return count, hash_from_line(last_line)
+
+
+def _inflate_from(src: zipfile.ZipFile, info: zipfile.ZipInfo) -> Callable[[IO[bytes]], None]:
+    """produce de PackWriter.add_stream: conteúdo descomprimido da entrada, em chunks."""
+    def _produce(f: IO[bytes]) -> None:
+        with src.open(info, "r") as r:
+            shutil.copyfileobj(r, f, COPY_CHUNK)
+    return _produce
+
+
+def compact_snapshot(
+    snapshot_zip: Path,
+    lineage_zips: List[Path],
+    out_zip: Path,
+    trace_id: str = "trace_local",
+    jobs: int = 0,
+    compression: Optional[CompressionPolicy] = None,
+    cache: Optional[DigestCache] = None,
+) -> Dict[str, Any]:
+    """
+    Gera uma base compacta a partir de um snapshot promoted e da sua linhagem
+    de patch packs (wrap-run-report / wrap-approval já mergeados nele).
+
+    - Cada patch da linhagem precisa estar incorporado ao snapshot: todo
+      history/* do patch existe no snapshot com mesmo CRC e tamanho
+      (senão ValueError: rode merge --base antes de compactar).
+    - history/* é gravado sem compressão (ZIP_STORED): leitura direta, sem inflate.
+    - Receipt em history/compactions/<trace_id>.json com sha256 de cada
+      entrada de history/ e a cabeça do hashchain, mais uma entrada
+      entry_type=compaction no hashchain (verificável); cache (DigestCache)
+      reaproveita os sha256 de entradas já vistas.
+
+    Merges seguintes usam a base compacta via merge --base.
+    """
+    receipt_rel = f"history/compactions/{trace_id}.json"
+    out_zip.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(out_zip.parent / f".{out_zip.name}.lock"), ExitStack() as stack:
+        snap = stack.enter_context(zipfile.ZipFile(snapshot_zip, "r"))
+        entries = _layer_entries(snap)
+        if CHAIN_STATE_REL not in entries:
+            raise ValueError(f"snapshot sem {CHAIN_STATE_REL}: {snapshot_zip.name}")
+        try:
+            chain_state = json.loads(snap.read(entries[CHAIN_STATE_REL]).decode("utf-8"))
+        except Exception:
+            chain_state = {}
+        if chain_state.get("blocking_reasons"):
+            raise ValueError(f"compactação exige snapshot promoted (blocking_reasons={chain_state.get('blocking_reasons')}).")
+        if receipt_rel in entries:
+            raise RuntimeError(f"append-only violation on {receipt_rel}")
+
+        lineage = []
+        for pz in lineage_zips:
+            with zipfile.ZipFile(pz, "r") as zp:
+                hist = {rel: info for rel, info in _layer_entries(zp).items()
+                        if rel.startswith(HISTORY_PREFIX) and rel not in (CHAIN_STATE_REL, HASHCHAIN_REL)}
+            missing = [
+                rel for rel, info in sorted(hist.items())
+                if rel not in entries or (entries[rel].CRC, entries[rel].file_size) != (info.CRC, info.file_size)
+            ]
+            if missing:
+                raise ValueError(
+                    f"patch {pz.name} não está incorporado ao snapshot ({missing[0]}); "
+                    "rode merge --base antes de compactar."
+                )
+            lineage.append({**_input_meta(pz), "history_entries": len(hist)})
+
+        hashchain_sources = [(0, entries[HASHCHAIN_REL])] if HASHCHAIN_REL in entries else []
+        chain_count, chain_head = _scan_hashchain([snap], hashchain_sources)
+
+        # só o índice (path, sha256, bytes) fica em memória: o sha256 sai em
+        # stream e o conteúdo é relido do snapshot na escrita
+        history_rels = [
+            rel for rel in sorted(entries)
+            if rel.startswith(HISTORY_PREFIX) and rel not in (HASHCHAIN_REL, HASHCHAIN_TAIL_REL)
+        ]
+        history_index = [
+            {"path": rel, "sha256": entry_digest(snap, entries[rel], cache), "bytes": int(entries[rel].file_size)}
+            for rel in history_rels
+        ]
+
+        receipt = {
+            "schema_version": "1.0",
+            "trace_id": trace_id,
+            "timestamp": utc_now_iso(),
+            "snapshot": _input_meta(snapshot_zip),
+            "lineage": lineage,
+            "hashchain": {"entries": chain_count, "head_hash": chain_head},
+            "history": history_index,
+            "notes": "compactação: history/ em ZIP_STORED; patches da linhagem já incorporados",
+        }
+        receipt_bytes = json_bytes(receipt)
+        payload_sha = hashlib.sha256(receipt_bytes).hexdigest()
+
+        with PackWriter(out_zip, jobs=jobs, policy=compression) as w:
+            history_set = set(history_rels)
+            for rel, info in entries.items():
+                if rel not in history_set and rel not in (HASHCHAIN_REL, HASHCHAIN_TAIL_REL):
+                    w.add_entry(snap, info, arcname=rel)
+            for rel in history_rels:
+                info = entries[rel]
+                if info.compress_type == zipfile.ZIP_STORED:
+                    w.add_entry(snap, info, arcname=rel)
+                else:
+                    w.add_stream(rel, _inflate_from(snap, info), compress_type=zipfile.ZIP_STORED)
+            w.add_bytes(receipt_rel, receipt_bytes, compress_type=zipfile.ZIP_STORED)
+            _add_hashchain(w, [snap], [entries], hashchain_sources, lambda: payload_sha, entry_type="compaction", compress_type=zipfile.ZIP_STORED)
+    return receipt
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import io
+import shutil
+import tempfile
+import zipfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from .digest_cache import DigestCache, entry_digest
+from .inventory import _kind_from_name, _should_ignore
+from .zipio import COPY_CHUNK, FLAG_ENCRYPTED, raw_data_offset
+
+CHAIN_SEP = "::"
+CHAIN_PREFIX = "zip"
+
+# ZIP aninhado comprimido: até este tamanho o spool fica em memória
+SPOOL_MEM_BYTES = 8 * 1024 * 1024
+
+
+def chain_ref(root: Path, chain: List[str]) -> str:
+    """Ref zip::<root>::<A.zip>::...::<arquivo> aceita pelo resolver."""
+    return CHAIN_SEP.join([CHAIN_PREFIX, str(root)] + chain)
+
+
+class ZipWindow(io.RawIOBase):
+    """
+    Janela somente leitura [offset, offset + length) sobre outro arquivo
+    seekable (inclusive outra ZipWindow): ZIP aninhado ZIP_STORED aberto no
+    lugar, sem cópia. Não é thread-safe (um handle base por thread).
+    """
+
+    def __init__(self, base: IO[bytes], offset: int, length: int) -> None:
+        super().__init__()
+        self._base = base
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._length
+        if pos < 0:
+            raise OSError(22, "posição negativa")  # como arquivo real (zipfile trata OSError)
+        self._pos = pos
+        return pos
+
+    def readinto(self, b: Any) -> int:
+        n = max(0, min(len(b), self._length - self._pos))
+        if n == 0:
+            return 0
+        self._base.seek(self._offset + self._pos)
+        data = self._base.read(n)
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def open_nested(z: zipfile.ZipFile, info: zipfile.ZipInfo, stack: ExitStack) -> zipfile.ZipFile:
+    """
+    Abre a entrada `info` de `z` como ZipFile:
+    - ZIP_STORED em claro: ZipWindow sobre os bytes no arquivo de origem (zero cópia)
+    - demais: descomprimida num SpooledTemporaryFile (memória até SPOOL_MEM_BYTES, depois disco)
+    Handles registrados em `stack`.
+    """
+    if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & FLAG_ENCRYPTED:
+        fp: IO[bytes] = ZipWindow(z.fp, raw_data_offset(z, info), info.compress_size)
+    else:
+        fp = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=SPOOL_MEM_BYTES))
+        with z.open(info, "r") as fin:
+            shutil.copyfileobj(fin, fp, COPY_CHUNK)
+        fp.seek(0)
+    return stack.enter_context(zipfile.ZipFile(fp, "r"))
+
+
+def iter_nested(
+    zip_path: Path,
+    entry_name: str,
+    skipped: List[Dict[str, Any]],
+    max_depth: int = 4,
+    max_nested_bytes: int = 512 * 1024 * 1024,
+    cache: Optional[DigestCache] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Inventário da subárvore do ZIP aninhado `entry_name` de zip_path (handle
+    próprio: roda em paralelo com outras subárvores). Itens com path
+    encadeado (chain_ref) gerados um a um, na ordem do central directory, em
+    profundidade; ZIPs aninhados não descidos vão para `skipped` com o
+    motivo (depth/size/not_a_zip/bad_zip).
+    """
+
+    def _walk(z: zipfile.ZipFile, chain: List[str], depth: int) -> Iterator[Dict[str, Any]]:
+        for info in z.infolist():
+            if info.is_dir() or _should_ignore(info.filename):
+                continue
+            sub = chain + [info.filename]
+            kind = _kind_from_name(info.filename)
+            yield {
+                "path": chain_ref(zip_path, sub),
+                "kind": kind,
+                "bytes": int(info.file_size),
+                "sha256": entry_digest(z, info, cache),
+            }
+            if kind == "zip":
+                yield from _descend(z, info, sub, depth + 1)
+
+    def _descend(z: zipfile.ZipFile, info: zipfile.ZipInfo, chain: List[str], depth: int) -> Iterator[Dict[str, Any]]:
+        ref = chain_ref(zip_path, chain)
+        if depth > max_depth:
+            skipped.append({"path": ref, "reason": "depth"})
+            return
+        if info.file_size > max_nested_bytes:
+            skipped.append({"path": ref, "reason": "size"})
+            return
+        with ExitStack() as stack:
+            try:
+                inner = open_nested(z, info, stack)
+            except zipfile.BadZipFile:
+                skipped.append({"path": ref, "reason": "not_a_zip"})
+                return
+            try:
+                yield from _walk(inner, chain, depth)
+            except zipfile.BadZipFile:
+                skipped.append({"path": ref, "reason": "bad_zip"})
+
+    with zipfile.ZipFile(zip_path, "r") as z:
+        yield from _descend(z, z.getinfo(entry_name), [entry_name], 1)
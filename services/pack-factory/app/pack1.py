@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 import re
-import zipfile
 from pathlib import Path
 
 from .manifest import new_manifest, write_manifest
 from .utils import ensure_dir, write_json
+from .zipio import PackWriter
 from . import module_registry
 
 
-def generate_pack1(module: str, out_dir: Path, trace_id: str) -> Path:
+def generate_pack1(module: str, out_dir: Path, trace_id: str, jobs: int = 0) -> Path:
     """
     Pack1 = scaffold executável mínimo (thin-slice).
     Gera estrutura de serviço + contratos + runbooks + testes.
@@ -116,8 +116,8 @@ def generate_pack1(module: str, out_dir: Path, trace_id: str) -> Path:
     out_zip = out_dir / f"{pack_id}-{version}.zip"
     if out_zip.exists():
         out_zip.unlink()
-    with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
+    with PackWriter(out_zip, jobs=jobs) as w:
         for p in pack_root.rglob("*"):
             if p.is_file():
-                z.write(p, p.relative_to(pack_root).as_posix())
+                w.add_file(p, p.relative_to(pack_root).as_posix())
     return out_zip
@@ -1,12 +1,12 @@
 from __future__ import annotations
-import zipfile
 import re
 from pathlib import Path
 from .manifest import new_manifest, write_manifest
 from .utils import ensure_dir, write_json
+from .zipio import PackWriter
 from . import module_registry
 
-def generate_pack0(module: str, out_dir: Path, trace_id: str) -> Path:
+def generate_pack0(module: str, out_dir: Path, trace_id: str, jobs: int = 0) -> Path:
     pack_id = f"pack0-{module}"
     version = "0.0.1"
     pack_root = out_dir / f"{pack_id}-{version}"
@@ -100,11 +100,10 @@ def generate_pack0(module: str, out_dir: Path, trace_id: str) -> Path:
     out_zip = out_dir / f"{pack_id}-{version}.zip"
     if out_zip.exists():
         out_zip.unlink()
-    with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
+    with PackWriter(out_zip, jobs=jobs) as w:
         for p in pack_root.rglob("*"):
-            if p.is_dir():
-                continue
-            z.write(p, p.relative_to(pack_root).as_posix())
+            if p.is_file():
+                w.add_file(p, p.relative_to(pack_root).as_posix())
     return out_zip
 
 def _plan_template(module: str, trace_id: str) -> str:
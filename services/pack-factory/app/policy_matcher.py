@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+# Códigos de motivo (mesmos do relatório do leak-check + os da public policy)
+DENY_PREFIX = "deny_prefix"
+DENY_REGEX = "deny_regex"
+OUTSIDE_ALLOWLIST = "outside_allowlist"
+PUBLIC_PREFIX = "public_prefix"
+PUBLIC_REGEX = "public_regex"
+
+_CACHE_MAX = 32
+
+
+class PrefixTrie:
+    """
+    Trie de prefixos (por caractere). Compilada para um único regex ancorado
+    com os prefixos comuns fatorados (`docs/(?:references/|x/)`): o teste
+    "algum prefixo casa?" vira um .match em C, sem laço Python por prefixo.
+    """
+
+    _END = ""
+
+    def __init__(self, prefixes: Iterable[str] = ()) -> None:
+        self._root: Dict[str, Any] = {}
+        self.size = 0
+        for p in prefixes:
+            self.add(p)
+
+    def add(self, prefix: str) -> None:
+        node = self._root
+        for ch in prefix:
+            if self._END in node:
+                return  # prefixo mais curto já cobre este
+            node = node.setdefault(ch, {})
+        node.clear()
+        node[self._END] = True
+        self.size += 1
+
+    def pattern(self) -> str:
+        def _node(node: Dict[str, Any]) -> str:
+            if self._END in node:
+                return ""
+            alts = [re.escape(ch) + _node(child) for ch, child in sorted(node.items())]
+            return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+        return _node(self._root)
+
+    def compile(self) -> Optional[Pattern[str]]:
+        """Regex ancorado no início (usar .match); None se a trie está vazia."""
+        if not self._root:
+            return None
+        return re.compile(self.pattern())
+
+
+def combine_regexes(patterns: Sequence[str], flags: int = 0, skip_invalid: bool = False) -> Optional[Pattern[str]]:
+    """
+    Uma alternação `(?:r1)|(?:r2)|...` com todos os padrões: um .search por
+    nome em vez de um por regex. skip_invalid descarta padrões inválidos (como
+    is_public_path sempre fez); senão re.error propaga. Padrões com grupos
+    não entram na alternação (a junção renumera os grupos e uma backreference
+    \\1 passaria a apontar para o grupo de outro padrão): são testados em
+    separado, assim como todos se a alternação não compila (flag inline no
+    meio, nome de grupo repetido).
+    """
+    plain: List[str] = []
+    grouped: List[Pattern[str]] = []
+    for p in patterns:
+        try:
+            rx = re.compile(p, flags)
+        except re.error:
+            if skip_invalid:
+                continue
+            raise
+        if rx.groups:
+            grouped.append(rx)
+        else:
+            plain.append(p)
+    rxs = list(grouped)
+    if plain:
+        try:
+            rxs.insert(0, re.compile("|".join(f"(?:{p})" for p in plain), flags))
+        except re.error:
+            rxs[:0] = [re.compile(p, flags) for p in plain]
+    if not rxs:
+        return None
+    return rxs[0] if len(rxs) == 1 else _AnyOf(rxs)  # type: ignore[return-value]
+
+
+class _AnyOf:
+    """Fallback de combine_regexes: mesma interface .search de um Pattern."""
+
+    def __init__(self, rxs: List[Pattern[str]]) -> None:
+        self._rxs = rxs
+
+    def search(self, s: str) -> bool:
+        return any(rx.search(s) for rx in self._rxs)
+
+
+class PolicyMatcher:
+    """
+    Política de audiência (allowlist/denylist) + public export policy
+    compiladas num único objeto. Ordem de avaliação = a do leak-check e do
+    export-team-pack: deny_prefix, deny_regex (basename), outside_allowlist,
+    public_prefix, public_regex (basename, case-insensitive).
+    """
+
+    def __init__(self, audience: Dict[str, Any], public: Optional[Any] = None) -> None:
+        deny = [str(x) for x in (audience.get("denylist_prefixes") or [])]
+        allow = [str(x) for x in (audience.get("allowlist_prefixes") or [])]
+        pub = [str(x) for x in public.exclude_prefixes] if public is not None else []
+        self._deny = PrefixTrie(deny).compile()
+        self._deny_rx = combine_regexes([str(x) for x in (audience.get("denylist_regex") or [])])
+        self._allow = PrefixTrie(allow).compile()
+        self._pub = None
+        self._pub_rx = None
+        # prefixos terminados em '/' só olham o diretório do path
+        self._dir_keyed = all(p.endswith("/") for p in deny + allow + pub)
+        if public is not None:
+            self._pub = PrefixTrie(pub).compile()
+            self._pub_rx = combine_regexes(list(public.exclude_name_regexes), re.IGNORECASE, skip_invalid=True)
+
+    def classify(self, name: str) -> Optional[str]:
+        """Motivo de exclusão do path (já normalizado com '/'), ou None se passa."""
+        base = name.rsplit("/", 1)[-1]
+        if self._deny is not None and self._deny.match(name):
+            return DENY_PREFIX
+        if self._deny_rx is not None and self._deny_rx.search(base):
+            return DENY_REGEX
+        if self._allow is not None and not self._allow.match(name):
+            return OUTSIDE_ALLOWLIST
+        if self._pub is not None and self._pub.match(name):
+            return PUBLIC_PREFIX
+        if self._pub_rx is not None and self._pub_rx.search(base):
+            return PUBLIC_REGEX
+        return None
+
+    def classify_batch(self, names: Iterable[str]) -> List[Optional[str]]:
+        """
+        classify para um namelist inteiro (mesma ordem). Paths são normalizados
+        ('\\' -> '/'); o resultado dos prefixos é memorizado por diretório
+        quando todos os prefixos terminam em '/' (caso comum: o diretório
+        decide, e snapshots têm muito mais arquivos que diretórios).
+        """
+        if not self._dir_keyed:
+            classify = self.classify
+            return [classify(n.replace("\\", "/")) for n in names]
+        deny_rx = self._deny_rx.search if self._deny_rx is not None else None
+        pub_rx = self._pub_rx.search if self._pub_rx is not None else None
+        dirs: Dict[str, Optional[str]] = {}
+        out: List[Optional[str]] = []
+        append = out.append
+        for n in names:
+            d, _, base = n.replace("\\", "/").rpartition("/")
+            try:
+                pre = dirs[d]
+            except KeyError:
+                pre = dirs[d] = self._prefix_reason(d + "/" if d else "")
+            if pre == DENY_PREFIX:
+                append(pre)
+            elif deny_rx is not None and deny_rx(base):
+                append(DENY_REGEX)
+            elif pre is not None:
+                append(pre)
+            elif pub_rx is not None and pub_rx(base):
+                append(PUBLIC_REGEX)
+            else:
+                append(None)
+        return out
+
+    def _prefix_reason(self, name: str) -> Optional[str]:
+        """Só a parte de prefixos de classify (deny, allowlist, public)."""
+        if self._deny is not None and self._deny.match(name):
+            return DENY_PREFIX
+        if self._allow is not None and not self._allow.match(name):
+            return OUTSIDE_ALLOWLIST
+        if self._pub is not None and self._pub.match(name):
+            return PUBLIC_PREFIX
+        return None
+
+
+_cache: Dict[str, PolicyMatcher] = {}
+_cache_lock = threading.Lock()
+
+
+def policy_digest(audience: Dict[str, Any], public: Optional[Any] = None) -> str:
+    """sha256 do conteúdo das políticas (chave do cache de matchers compilados)."""
+    doc: Dict[str, Any] = {"audience": audience}
+    if public is not None:
+        doc["public"] = [list(public.exclude_prefixes), list(public.exclude_name_regexes)]
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def public_matcher(public: Any) -> PolicyMatcher:
+    """PolicyMatcher só da public export policy (sem audiência), cacheado."""
+    return _public_matcher(tuple(public.exclude_prefixes), tuple(public.exclude_name_regexes))
+
+
+@lru_cache(maxsize=_CACHE_MAX)
+def _public_matcher(prefixes: Tuple[str, ...], regexes: Tuple[str, ...]) -> PolicyMatcher:
+    return PolicyMatcher({}, SimpleNamespace(exclude_prefixes=prefixes, exclude_name_regexes=regexes))
+
+
+def compile_policy(audience: Dict[str, Any], public: Optional[Any] = None) -> PolicyMatcher:
+    """PolicyMatcher das políticas, cacheado pelo digest do conteúdo."""
+    key = policy_digest(audience, public)
+    with _cache_lock:
+        m = _cache.get(key)
+        if m is not None:
+            _cache[key] = _cache.pop(key)  # LRU: mais recente no fim
+            return m
+    m = PolicyMatcher(audience, public)
+    with _cache_lock:
+        _cache[key] = m
+        while len(_cache) > _CACHE_MAX:
+            _cache.pop(next(iter(_cache)))
+    return m
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import json
-import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Optional
+
+from .policy_matcher import public_matcher
 
 
 @dataclass(frozen=True)
@@ -23,7 +24,21 @@ def load_public_export_policy(repo_root: Path) -> PublicExportPolicy:
     policy_path = repo_root / "governance" / "public_export_policy.json"
     if policy_path.exists():
         try:
-            obj = json.loads(policy_path.read_text(encoding="utf-8"))
+            return public_export_policy_from_text(policy_path.read_text(encoding="utf-8"))
+        except Exception:
+            pass
+    return public_export_policy_from_text(None)
+
+
+def public_export_policy_from_text(text: Optional[str]) -> PublicExportPolicy:
+    """
+    Mesma policy de load_public_export_policy, a partir do conteúdo JSON já lido
+    (ex.: entrada governance/public_export_policy.json dentro de um ZIP).
+    None ou JSON inválido -> defaults conservadores.
+    """
+    if text is not None:
+        try:
+            obj = json.loads(text)
             return PublicExportPolicy(
                 exclude_prefixes=list(obj.get("exclude_prefixes") or []),
                 exclude_name_regexes=list(obj.get("exclude_name_regexes") or []),
@@ -50,15 +65,11 @@ def load_public_export_policy(repo_root: Path) -> PublicExportPolicy:
 
 
 def is_public_path(rel_path: str, policy: PublicExportPolicy) -> bool:
-    p = (rel_path or "").replace("\\", "/")
-    for pref in policy.exclude_prefixes:
-        if p.startswith(pref):
-            return False
-    base = p.split("/")[-1]
-    for rx in policy.exclude_name_regexes:
-        try:
-            if re.search(rx, base, flags=re.IGNORECASE):
-                return False
-        except re.error:
-            continue
-    return True
+    # matcher compilado uma vez por policy (regex inválido é ignorado)
+    return public_matcher(policy).classify((rel_path or "").replace("\\", "/")) is None
+
+
+def public_paths(names: Iterable[str], policy: PublicExportPolicy) -> List[str]:
+    """Filtra um namelist inteiro pela policy (batch; mesma ordem)."""
+    names = list(names)
+    return [n for n, r in zip(names, public_matcher(policy).classify_batch(names)) if r is None]
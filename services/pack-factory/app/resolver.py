@@ -1,19 +1,40 @@
 from __future__ import annotations
 
+import glob
 import hashlib
+import io
 import json
+import re
+import shutil
+import tempfile
 import zipfile
-from io import BytesIO
-from pathlib import Path
-from typing import Dict, Any, Tuple
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import IO, Dict, Any, Iterator, List, Optional, Tuple
 
+from . import nested
+from .nested import ZipWindow, open_nested
+from .zipio import FLAG_ENCRYPTED, raw_data_offset
 from .utils import utc_now_iso
 
+# LRU do resolver em batch: ZIPs abertos e bytes de ZIPs aninhados em memória
+DEFAULT_MAX_OPEN = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
 
 def _sha256_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
 
+def _parse_ref(ref: str) -> Tuple[Path, List[str]]:
+    parts = [p for p in (ref or "").split("::") if p != ""]
+    if len(parts) < 3 or parts[0].strip().lower() != "zip":
+        raise ValueError("ref inválida. Use: zip::<zip1>::<...>::<file>")
+    return Path(parts[1]).expanduser(), parts[2:]
+
+
 def resolve_zip_chain(ref: str) -> Tuple[bytes, Dict[str, Any]]:
     """
     Resolve referência no formato:
@@ -21,38 +42,27 @@ def resolve_zip_chain(ref: str) -> Tuple[bytes, Dict[str, Any]]:
 
     Exemplo:
       zip::/mnt/data/A.zip::B.zip::docs/PLAN.md
-    """
-    parts = [p for p in (ref or "").split("::") if p != ""]
-    if len(parts) < 3 or parts[0].strip().lower() != "zip":
-        raise ValueError("ref inválida. Use: zip::<zip1>::<...>::<file>")
 
-    zip1_path = Path(parts[1]).expanduser()
+    ZIPs intermediários não são lidos para memória: ZIP_STORED é aberto como
+    janela sobre o arquivo externo (zero cópia); comprimido é descomprimido
+    num spool (memória até nested.SPOOL_MEM_BYTES, depois arquivo temporário).
+    Pico de memória ~ tamanho da entrada final.
+    """
+    zip1_path, chain = _parse_ref(ref)
     if not zip1_path.exists():
         raise FileNotFoundError(f"zip não encontrado: {zip1_path}")
 
-    chain = parts[2:]
-
-    current_zip_path: Path | None = zip1_path
-    current_zip_bytes: bytes | None = None
-
-    def _open_zip() -> zipfile.ZipFile:
-        if current_zip_path is not None:
-            return zipfile.ZipFile(current_zip_path, "r")
-        assert current_zip_bytes is not None
-        return zipfile.ZipFile(BytesIO(current_zip_bytes), "r")
-
-    # intermediate zips
-    for token in chain[:-1]:
-        with _open_zip() as z:
+    with ExitStack() as stack:
+        z = stack.enter_context(zipfile.ZipFile(zip1_path, "r"))
+        # intermediate zips
+        for token in chain[:-1]:
             try:
-                data = z.read(token)
+                info = z.getinfo(token)
             except KeyError:
                 raise FileNotFoundError(f"entrada não encontrada no zip: {token}")
-        current_zip_path = None
-        current_zip_bytes = data
+            z = open_nested(z, info, stack)
 
-    final_name = chain[-1]
-    with _open_zip() as z:
+        final_name = chain[-1]
         try:
             out_bytes = z.read(final_name)
         except KeyError:
@@ -68,6 +78,65 @@ def resolve_zip_chain(ref: str) -> Tuple[bytes, Dict[str, Any]]:
     return out_bytes, report
 
 
+@contextmanager
+def open_ref(ref: str) -> Iterator[IO[bytes]]:
+    """
+    Stream somente leitura e seekable da entrada final da ref (sem ler tudo):
+    - ZIP_STORED em claro: janela direta sobre os bytes no arquivo (seek = offset)
+    - comprimida: ZipExtFile — descomprime só até a posição lida (seek para
+      trás recomeça do início da entrada)
+    ZIPs intermediários como em resolve_zip_chain. Válido dentro do with.
+    """
+    zip1_path, chain = _parse_ref(ref)
+    if not zip1_path.exists():
+        raise FileNotFoundError(f"zip não encontrado: {zip1_path}")
+    with ExitStack() as stack:
+        z = stack.enter_context(zipfile.ZipFile(zip1_path, "r"))
+        for token in chain[:-1]:
+            try:
+                info = z.getinfo(token)
+            except KeyError:
+                raise FileNotFoundError(f"entrada não encontrada no zip: {token}")
+            z = open_nested(z, info, stack)
+        try:
+            info = z.getinfo(chain[-1])
+        except KeyError:
+            raise FileNotFoundError(f"entrada final não encontrada no zip: {chain[-1]}")
+        if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & FLAG_ENCRYPTED:
+            yield io.BufferedReader(ZipWindow(z.fp, raw_data_offset(z, info), info.file_size))
+        else:
+            yield stack.enter_context(z.open(info, "r"))
+
+
+def parse_range(spec: str) -> Tuple[int, Optional[int]]:
+    """"start:end" (end exclusivo; qualquer lado pode ficar vazio) -> (start, end|None)."""
+    head, sep, tail = (spec or "").partition(":")
+    if not sep:
+        raise ValueError("range inválido. Use start:end (p.ex. 0:4096, :1024, 100:)")
+    start = int(head) if head.strip() else 0
+    end = int(tail) if tail.strip() else None
+    if start < 0 or (end is not None and end < start):
+        raise ValueError(f"range inválido: {spec}")
+    return start, end
+
+
+def read_ref_range(ref: str, start: int, end: Optional[int], with_hash: bool = False) -> Tuple[bytes, Dict[str, Any]]:
+    """Bytes [start:end) da entrada (end None = até o fim); sha256 do trecho só com with_hash."""
+    with open_ref(ref) as f:
+        f.seek(start)
+        data = f.read() if end is None else f.read(end - start)
+    report: Dict[str, Any] = {
+        "schema_version": "1.0",
+        "timestamp": utc_now_iso(),
+        "ref": ref,
+        "range": {"start": start, "end": start + len(data)},
+        "bytes": len(data),
+    }
+    if with_hash:
+        report["sha256"] = _sha256_bytes(data)
+    return data, report
+
+
 def resolve_to_file(ref: str, out_path: Path, trace_id: str) -> Dict[str, Any]:
     b, rep = resolve_zip_chain(ref)
     out_path.parent.mkdir(parents=True, exist_ok=True)
@@ -75,3 +144,282 @@ def resolve_to_file(ref: str, out_path: Path, trace_id: str) -> Dict[str, Any]:
     rep["trace_id"] = trace_id
     rep["out"] = str(out_path)
     return rep
+
+
+@dataclass
+class _Archive:
+    z: zipfile.ZipFile
+    stack: ExitStack
+    cost: int  # bytes do ZIP aninhado mantidos em memória (spool)
+
+
+class ZipChainResolver:
+    """
+    Resolve várias refs zip::... mantendo um LRU de ZIPs abertos (externos e
+    aninhados, chave = prefixo da cadeia). Despejo por contagem (max_open) e
+    por memória dos aninhados comprimidos em spool (max_bytes); despejar um
+    ZIP fecha antes os aninhados abertos dentro dele. Usar como context manager.
+    """
+
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_open = max(1, max_open)
+        self.max_bytes = max_bytes
+        self._lru: "OrderedDict[Tuple[str, ...], _Archive]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"opened": 0, "hits": 0, "evicted": 0}
+
+    def __enter__(self) -> "ZipChainResolver":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for key in list(self._lru):
+            self._evict(key)
+
+    def _evict(self, key: Tuple[str, ...]) -> None:
+        for k in [k for k in self._lru if len(k) > len(key) and k[:len(key)] == key]:
+            self._evict(k)
+        arc = self._lru.pop(key, None)
+        if arc is None:
+            return
+        arc.stack.close()
+        self._bytes -= arc.cost
+        self.stats["evicted"] += 1
+
+    def _shrink(self, keep: Tuple[str, ...]) -> None:
+        while len(self._lru) > self.max_open or self._bytes > self.max_bytes:
+            victim = next((k for k in self._lru if keep[:len(k)] != k), None)
+            if victim is None:
+                return  # só restam ancestrais da cadeia em uso
+            self._evict(victim)
+
+    def _archive(self, key: Tuple[str, ...]) -> zipfile.ZipFile:
+        arc = self._lru.get(key)
+        if arc is not None:
+            for n in range(1, len(key) + 1):  # ancestrais ficam mais recentes que o LRU
+                if key[:n] in self._lru:
+                    self._lru.move_to_end(key[:n])
+            self.stats["hits"] += 1
+            self._shrink(key)
+            return arc.z
+        stack = ExitStack()
+        try:
+            if len(key) == 1:
+                path = Path(key[0])
+                if not path.exists():
+                    raise FileNotFoundError(f"zip não encontrado: {path}")
+                z, cost = stack.enter_context(zipfile.ZipFile(path, "r")), 0
+            else:
+                parent = self._archive(key[:-1])
+                try:
+                    info = parent.getinfo(key[-1])
+                except KeyError:
+                    raise FileNotFoundError(f"entrada não encontrada no zip: {key[-1]}")
+                z = open_nested(parent, info, stack)
+                in_memory = info.compress_type != zipfile.ZIP_STORED and info.file_size <= nested.SPOOL_MEM_BYTES
+                cost = int(info.file_size) if in_memory else 0
+        except BaseException:
+            stack.close()
+            raise
+        self._lru[key] = _Archive(z, stack, cost)
+        self._bytes += cost
+        self.stats["opened"] += 1
+        self._shrink(key)
+        return z
+
+    def read(self, ref: str) -> Tuple[bytes, Dict[str, Any]]:
+        """Como resolve_zip_chain, reaproveitando os ZIPs abertos por refs anteriores."""
+        zip1_path, chain = _parse_ref(ref)
+        z = self._archive((str(zip1_path),) + tuple(chain[:-1]))
+        try:
+            out_bytes = z.read(chain[-1])
+        except KeyError:
+            raise FileNotFoundError(f"entrada final não encontrada no zip: {chain[-1]}")
+        return out_bytes, {
+            "schema_version": "1.0",
+            "timestamp": utc_now_iso(),
+            "ref": ref,
+            "bytes": len(out_bytes),
+            "sha256": _sha256_bytes(out_bytes),
+        }
+
+
+def _batch_out_name(ref: str, out: str) -> Path:
+    """Path relativo de saída: o dado (sem absoluto/..) ou <sha256(ref)[:12]>_<basename>."""
+    if out:
+        rel = PurePosixPath(out.replace("\\", "/"))
+        if rel.is_absolute() or ".." in rel.parts:
+            raise ValueError(f"out inválido no batch: {out}")
+        return Path(*rel.parts)
+    base = ref.split("::")[-1].replace("\\", "/").split("/")[-1] or "entry"
+    return Path(f"{_sha256_bytes(ref.encode('utf-8'))[:12]}_{base}")
+
+
+def load_batch(path: Path) -> List[Dict[str, str]]:
+    """refs.jsonl: uma ref por linha, como string JSON ou {"ref": ..., "out": ...}."""
+    out: List[Dict[str, str]] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        d = json.loads(line)
+        out.append({"ref": d, "out": ""} if isinstance(d, str) else {"ref": str(d["ref"]), "out": str(d.get("out") or "")})
+    return out
+
+
+def resolve_batch(
+    refs: List[Dict[str, str]],
+    out_dir: Path,
+    trace_id: str,
+    max_open: int = DEFAULT_MAX_OPEN,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> Dict[str, Any]:
+    """
+    Resolve as refs para arquivos em out_dir. Processa em ordem de cadeia
+    (refs com o mesmo prefixo ficam juntas: cada ZIP intermediário é aberto
+    uma vez por batch, respeitados os limites do LRU); results saem na ordem
+    de entrada, com erro por ref sem abortar o batch.
+    """
+    results: List[Dict[str, Any]] = [{} for _ in refs]
+    order = sorted(range(len(refs)), key=lambda i: refs[i]["ref"].split("::"))
+    with ZipChainResolver(max_open=max_open, max_bytes=max_bytes) as resolver:
+        for i in order:
+            ref = refs[i]["ref"]
+            try:
+                out_path = out_dir / _batch_out_name(ref, refs[i].get("out", ""))
+                b, rep = resolver.read(ref)
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                out_path.write_bytes(b)
+                rep.pop("schema_version")
+                rep.pop("timestamp")
+                results[i] = {"ok": True, **rep, "out": str(out_path)}
+            except (ValueError, FileNotFoundError, zipfile.BadZipFile) as e:
+                results[i] = {"ok": False, "ref": ref, "error": str(e)}
+        stats = dict(resolver.stats)
+    return {
+        "schema_version": "1.0",
+        "timestamp": utc_now_iso(),
+        "trace_id": trace_id,
+        "ok": all(r["ok"] for r in results),
+        "refs": len(refs),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "archives": stats,
+        "results": results,
+    }
+
+
+_GLOB_MAGIC = re.compile(r"[*?\[]")
+
+
+def has_glob(token: str) -> bool:
+    return bool(_GLOB_MAGIC.search(token))
+
+
+def _glob_regex(pattern: str) -> "re.Pattern[str]":
+    """Glob de path de entrada: * e ? não cruzam "/", ** casa zero ou mais segmentos, [..] classe."""
+    out = ""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out += "(?:[^/]*/)*"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out += ".*"
+            i += 2
+            continue
+        if c == "*":
+            out += "[^/]*"
+        elif c == "?":
+            out += "[^/]"
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j < 0:
+                out += re.escape(c)
+            else:
+                body = pattern[i + 1:j]
+                out += "[" + ("^" + body[1:] if body.startswith("!") else body) + "]"
+                i = j
+        else:
+            out += re.escape(c)
+        i += 1
+    return re.compile(out + r"\Z")
+
+
+def _matching(z: zipfile.ZipFile, token: str) -> Iterator[zipfile.ZipInfo]:
+    if not has_glob(token):
+        try:
+            yield z.getinfo(token)
+        except KeyError:
+            return
+        return
+    rx = _glob_regex(token)
+    for info in z.infolist():
+        if not info.is_dir() and rx.match(info.filename):
+            yield info
+
+
+def iter_glob_chain(ref: str) -> Iterator[Tuple[str, IO[bytes], str]]:
+    """
+    Refs zip:: com glob em qualquer nível (inclusive o ZIP externo), p.ex.
+      zip::bundle.zip::*.zip::docs/**/*.md
+    Gera (ref concreta, stream do conteúdo, sha256) por entrada casada, na
+    ordem dos central directories e em profundidade. Cada ZIP aninhado é
+    aberto uma vez (janela/spool, como resolve_zip_chain) e fechado ao fim da
+    sua subárvore; nada é acumulado. A entrada final é descomprimida uma
+    única vez: o sha256 é calculado enquanto ela vai para um spool (memória
+    até nested.SPOOL_MEM_BYTES, depois disco), e o stream entregue é esse
+    spool. O stream deve ser consumido antes de avançar o gerador.
+    """
+    zip1, chain = _parse_ref(ref)
+    roots = sorted(Path(p) for p in glob.glob(str(zip1))) if has_glob(str(zip1)) else [zip1]
+
+    def _walk(z: zipfile.ZipFile, prefix: List[str], level: int) -> Iterator[Tuple[str, IO[bytes], str]]:
+        token = chain[level]
+        last = level == len(chain) - 1
+        for info in _matching(z, token):
+            concrete = prefix + [info.filename]
+            if last:
+                h = hashlib.sha256()
+                with z.open(info, "r") as f, tempfile.SpooledTemporaryFile(max_size=nested.SPOOL_MEM_BYTES) as spool:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        h.update(chunk)
+                        spool.write(chunk)
+                    spool.seek(0)
+                    yield "::".join(concrete), spool, h.hexdigest()
+                continue
+            with ExitStack() as stack:
+                try:
+                    inner = open_nested(z, info, stack)
+                except zipfile.BadZipFile:
+                    if has_glob(token):
+                        continue  # glob casou algo que não é ZIP
+                    raise
+                yield from _walk(inner, concrete, level + 1)
+
+    for root in roots:
+        if not root.exists():
+            raise FileNotFoundError(f"zip não encontrado: {root}")
+        with zipfile.ZipFile(root, "r") as z:
+            yield from _walk(z, ["zip", str(root)], 0)
+
+
+def resolve_glob(ref: str, out_dir: Path, trace_id: str) -> Dict[str, Any]:
+    """Grava cada entrada casada por iter_glob_chain em out_dir (<sha256(ref)[:12]>_<basename>)."""
+    matches: List[Dict[str, Any]] = []
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for concrete, stream, sha in iter_glob_chain(ref):
+        out_path = out_dir / _batch_out_name(concrete, "")
+        with out_path.open("wb") as fout:
+            shutil.copyfileobj(stream, fout, 1024 * 1024)
+        matches.append({"ref": concrete, "bytes": out_path.stat().st_size, "sha256": sha, "out": str(out_path)})
+    return {
+        "schema_version": "1.0",
+        "timestamp": utc_now_iso(),
+        "trace_id": trace_id,
+        "ref": ref,
+        "matches": len(matches),
+        "results": matches,
+    }
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from .policy_matcher import PrefixTrie
+
+SCAN_CHUNK = 1024 * 1024
+# maior segredo confirmado independentemente da posição no stream: marcador
+# não confirmado a menos disso do fim do buffer aguarda o próximo chunk
+SCAN_MAX_SECRET = 64 * 1024
+
+
+@dataclass(frozen=True)
+class SecretPattern:
+    """
+    Marcador literal (achado pelo scanner multi-padrão) e regex opcional de
+    confirmação aplicado na posição do marcador (evita falso positivo de
+    marcadores curtos como "AKIA"). ignore_case: o marcador casa sem
+    diferenciar maiúsculas (ASCII), p.ex. AWS_SECRET_ACCESS_KEY em .env.
+    """
+    id: str
+    marker: str
+    regex: Optional[str] = None
+    ignore_case: bool = False
+
+
+SECRET_PATTERNS: List[SecretPattern] = [
+    SecretPattern("private_key", "PRIVATE KEY-----"),
+    SecretPattern("aws_access_key_id", "AKIA", r"AKIA[0-9A-Z]{16}"),
+    SecretPattern("aws_secret_access_key", "aws_secret_access_key", r"(?i)aws_secret_access_key\s*[=:]\s*\S{20,}", ignore_case=True),
+    SecretPattern("github_token", "ghp_", r"ghp_[A-Za-z0-9]{36}"),
+    SecretPattern("github_pat", "github_pat_", r"github_pat_[A-Za-z0-9_]{40,}"),
+    SecretPattern("anthropic_api_key", "sk-ant-", r"sk-ant-[A-Za-z0-9_\-]{20,}"),
+    SecretPattern("openai_api_key", "sk-", r"sk-(?:proj-)?[A-Za-z0-9]{20,}"),
+    SecretPattern("stripe_live_key", "sk_live_", r"sk_live_[A-Za-z0-9]{20,}"),
+    SecretPattern("slack_token", "xox", r"xox[abprs]-[A-Za-z0-9-]{10,}"),
+    SecretPattern("google_api_key", "AIza", r"AIza[0-9A-Za-z_\-]{35}"),
+    SecretPattern("jwt", "eyJ", r"eyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}"),
+]
+
+
+def secret_patterns_from_policy(policy: Dict[str, Any]) -> List[SecretPattern]:
+    """
+    "secret_patterns" da policy de audiência ([{id, marker, regex?,
+    ignore_case?}]) substitui os defaults; ausente -> SECRET_PATTERNS.
+    """
+    raw = policy.get("secret_patterns")
+    if not raw:
+        return list(SECRET_PATTERNS)
+    return [
+        SecretPattern(str(d["id"]), str(d["marker"]), (str(d["regex"]) if d.get("regex") else None), bool(d.get("ignore_case")))
+        for d in raw
+    ]
+
+
+class MarkerScanner:
+    """
+    Scanner multi-padrão de passada única (estilo Aho-Corasick): os marcadores
+    vão para uma PrefixTrie, compilada num regex de bytes com prefixos
+    fatorados — o buffer é percorrido uma vez contra todos os marcadores, em
+    C; após um marcador não confirmado a busca recomeça no byte seguinte
+    (marcadores sobrepostos não se perdem). Marcadores ignore_case ficam numa
+    segunda trie (minúscula) compilada em (?i:...) na mesma alternação. Na
+    posição achada, os padrões cujo marcador é prefixo do trecho casado (ou
+    o contrário) são conferidos e confirmados na ordem da lista.
+    """
+
+    def __init__(self, patterns: Sequence[SecretPattern]) -> None:
+        if not patterns:
+            raise ValueError("nenhum secret pattern")
+        self.patterns = list(patterns)
+        # latin-1: 1 char por byte, então a trie (de str) vira regex de bytes;
+        # ignore_case usa bytes.lower() (só ASCII, como re.IGNORECASE em bytes)
+        markers = [p.marker.encode("utf-8") for p in self.patterns]
+        exact = PrefixTrie(m.decode("latin-1") for p, m in zip(self.patterns, markers) if not p.ignore_case)
+        folded = PrefixTrie(m.lower().decode("latin-1") for p, m in zip(self.patterns, markers) if p.ignore_case)
+        alts = ([exact.pattern()] if exact.size else []) + ([f"(?i:{folded.pattern()})"] if folded.size else [])
+        self._rx = re.compile("|".join(alts).encode("latin-1"))
+        self._candidates: Dict[bytes, List[Tuple[SecretPattern, bytes, Optional[Pattern[bytes]]]]] = {}
+        self._compiled = [
+            (p, (m.lower() if p.ignore_case else m), re.compile(p.regex.encode("utf-8")) if p.regex else None)
+            for p, m in zip(self.patterns, markers)
+        ]
+        # marcador cortado no fim do buffer: estes bytes seguem para o próximo
+        self._marker_tail = max(len(m) for m in markers) - 1
+
+    def _for_anchor(self, anchor: bytes) -> List[Tuple[SecretPattern, bytes, Optional[Pattern[bytes]]]]:
+        c = self._candidates.get(anchor)
+        if c is None:
+            c = self._candidates[anchor] = [t for t in self._compiled if _prefix_related(t[1], anchor.lower() if t[0].ignore_case else anchor)]
+        return c
+
+    def first_match(self, buf: bytes) -> Optional[Tuple[int, str]]:
+        """(offset, id) do primeiro segredo confirmado em buf (buffer completo)."""
+        return self._scan(buf, final=True)[0]
+
+    def _scan(self, buf: bytes, final: bool) -> Tuple[Optional[Tuple[int, str]], int]:
+        """
+        (primeiro segredo confirmado, início do que segue para o próximo
+        chunk). Sem final, um marcador não confirmado a menos de
+        SCAN_MAX_SECRET do fim pode depender dos bytes seguintes: a varredura
+        para nele e o buffer é carregado a partir do início do marcador.
+        """
+        search = self._rx.search
+        n = len(buf)
+        pos = 0
+        while True:
+            m = search(buf, pos)
+            if m is None:
+                return None, (n if final else max(0, n - self._marker_tail))
+            pos = m.start()
+            for p, marker, rx in self._for_anchor(m.group()):
+                found = buf[pos:pos + len(marker)].lower() == marker if p.ignore_case else buf.startswith(marker, pos)
+                if found and (rx is None or rx.match(buf, pos)):
+                    return (pos, p.id), n
+            if not final and n - pos < SCAN_MAX_SECRET:
+                return None, pos
+            pos += 1  # próximo marcador pode começar dentro deste
+
+    def scan_stream(self, f: Any) -> Tuple[Optional[Tuple[int, str]], int]:
+        """
+        Varre o stream em chunks de SCAN_CHUNK; o que pode continuar no chunk
+        seguinte (marcador cortado ou ainda não confirmado) é carregado para
+        ele, então segredos de até SCAN_MAX_SECRET bytes são achados em
+        qualquer posição. Para no primeiro segredo (early exit). Retorna
+        (match, bytes lidos).
+        """
+        base = 0
+        read = 0
+        buf = b""
+        while True:
+            chunk = f.read(SCAN_CHUNK)
+            read += len(chunk)
+            buf += chunk
+            hit, keep = self._scan(buf, final=not chunk)
+            if hit is not None:
+                return (base + hit[0], hit[1]), read
+            if not chunk:
+                return None, read
+            buf = buf[keep:]
+            base += keep
+
+
+def _prefix_related(a: bytes, b: bytes) -> bool:
+    return a.startswith(b) or b.startswith(a)
+
+
+def scan_zip_content(
+    zip_path: Path,
+    names: Iterable[str],
+    patterns: Optional[Sequence[SecretPattern]] = None,
+    jobs: int = 0,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Procura segredos no conteúdo das entradas `names` de zip_path. Entradas
+    em paralelo (threads; a descompressão zlib libera o GIL), cada worker com
+    seu ZipFile; jobs<=0 = todos os cores. Retorna (achados na ordem de
+    names: {path, pattern, offset}, estatísticas de throughput).
+    """
+    scanner = MarkerScanner(patterns if patterns is not None else SECRET_PATTERNS)
+    names = list(names)
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    local = threading.local()
+    handles: List[zipfile.ZipFile] = []
+    handles_lock = threading.Lock()
+
+    def _work(name: str) -> Tuple[Optional[Tuple[int, str]], int]:
+        zw = getattr(local, "z", None)
+        if zw is None:
+            zw = local.z = zipfile.ZipFile(zip_path, "r")
+            with handles_lock:
+                handles.append(zw)
+        with zw.open(name, "r") as f:
+            return scanner.scan_stream(f)
+
+    t0 = time.perf_counter()
+    try:
+        if jobs <= 1:
+            results = list(map(_work, names))
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(_work, names))
+    finally:
+        for zw in handles:
+            zw.close()
+    elapsed = time.perf_counter() - t0
+
+    findings = [
+        {"path": name, "pattern": hit[1], "offset": hit[0]}
+        for name, (hit, _) in zip(names, results)
+        if hit is not None
+    ]
+    scanned = sum(n for _, n in results)
+    stats = {
+        "entries": len(names),
+        "bytes_scanned": scanned,
+        "jobs": jobs,
+        "patterns": [p.id for p in scanner.patterns],
+        "elapsed_s": round(elapsed, 4),
+        "mb_per_s": round(scanned / (1024 * 1024) / elapsed, 2) if elapsed > 0 else None,
+    }
+    return findings, stats
@@ -1,27 +1,27 @@
 from __future__ import annotations
 
 import json
-import shutil
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 
 from .public_export import load_public_export_policy, is_public_path
 
-def _list_files(root: Path, public_only: bool = True) -> List[str]:
+NAV_ASSETS = ["MAPA_MESTRE.md", "INDICE_NAVEGAVEL.md", "MODO_CLONE_GITHUB.md"]
+
+
+def _list_files(root: Path, public_only: bool = True, extra_names: Iterable[str] = ()) -> List[str]:
     policy = load_public_export_policy(root)
-    files: List[str] = []
-    for p in root.rglob("*"):
-        if p.is_file():
-            rel = str(p.relative_to(root)).replace("\\", "/")
-            if public_only and (not is_public_path(rel, policy)):
-                continue
-            files.append(rel)
-    return sorted(files)
-
-def write_filemap(root: Path, out_path: Path) -> None:
-    files = _list_files(root, public_only=True)
+    names = {str(p.relative_to(root)).replace("\\", "/") for p in root.rglob("*") if p.is_file()}
+    names.update(extra_names)
+    return sorted(rel for rel in names if not public_only or is_public_path(rel, policy))
+
+def render_filemap(files: List[str]) -> str:
+    return "# FILEMAP\n\n" + "\n".join(f"- `{f}`" for f in files) + "\n"
+
+def write_filemap(root: Path, out_path: Path, extra_names: Iterable[str] = ()) -> None:
+    files = _list_files(root, public_only=True, extra_names=extra_names)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text("# FILEMAP\n\n" + "\n".join(f"- `{f}`" for f in files) + "\n", encoding="utf-8")
+    out_path.write_text(render_filemap(files), encoding="utf-8")
 
 def _read_text_if_exists(root: Path, rel: str) -> str:
     p = root / rel
@@ -32,55 +32,64 @@ def _read_text_if_exists(root: Path, rel: str) -> str:
     except Exception:
         return ""
 
-def _extract_contract_list(root: Path) -> List[str]:
-    cdir = root / "contracts"
-    if not cdir.exists():
-        return []
-    return sorted([str(p.relative_to(root)).replace("\\","/") for p in cdir.rglob("*.json") if p.is_file()])
-
-def _extract_runbooks(root: Path) -> List[str]:
-    rdir = root / "runbooks"
-    if not rdir.exists():
-        return []
-    return sorted([str(p.relative_to(root)).replace("\\","/") for p in rdir.glob("*.md") if p.is_file()])
-
-def _extract_history(root: Path) -> List[str]:
-    hdir = root / "history"
-    if not hdir.exists():
-        return []
-    return sorted([str(p.relative_to(root)).replace("\\","/") for p in hdir.rglob("*") if p.is_file()])
-
-def write_software_book(root: Path, packs_merged: Optional[List[str]]=None, trace_id: str="trace_local") -> None:
+def navigation_assets() -> Dict[str, bytes]:
     """
-    Gera docs/public/SOFTWARE_BOOK.md e FILEMAP.md a partir do snapshot atual.
-    Não apaga histórico: apenas escreve em docs/public/.
+    Assets de navegação (Mapa Mestre / Índice Navegável / Modo Clone GitHub)
+    copiados para docs/public/ no snapshot. Retorna {rel_path: bytes}.
     """
-    docs_public = root / "docs" / "public"
-    docs_public.mkdir(parents=True, exist_ok=True)
-
-    # Assets de navegação (Mapa Mestre / Índice Navegável / Modo Clone GitHub)
+    out: Dict[str, bytes] = {}
     try:
         assets_dir = Path(__file__).resolve().parents[3] / "docs" / "assets"
-        for fname in ["MAPA_MESTRE.md","INDICE_NAVEGAVEL.md","MODO_CLONE_GITHUB.md"]:
+        for fname in NAV_ASSETS:
             src = assets_dir / fname
             if src.exists():
-                shutil.copy2(src, docs_public / fname)
+                out[f"docs/public/{fname}"] = src.read_bytes()
     except Exception:
         pass
+    return out
+
+def write_software_book(
+    root: Path,
+    packs_merged: Optional[List[str]] = None,
+    trace_id: str = "trace_local",
+    extra_names: Iterable[str] = (),
+) -> None:
+    """
+    Gera docs/public/SOFTWARE_BOOK.md e FILEMAP.md a partir do snapshot atual.
+    Não apaga histórico: apenas escreve em docs/public/. extra_names: paths
+    do snapshot que não estão em root (escritos direto no ZIP).
+    """
+    docs_public = root / "docs" / "public"
+    docs_public.mkdir(parents=True, exist_ok=True)
 
+    for rel, data in navigation_assets().items():
+        (root / rel).write_bytes(data)
 
     # FileMap
-    write_filemap(root, docs_public / "FILEMAP.md")
-
-    # Inputs
-    manifest = _read_text_if_exists(root, "02_INVENTORY/manifest.json")
-    plan = _read_text_if_exists(root, "docs/PLAN.md")
-    troubleshooting = _read_text_if_exists(root, "docs/TROUBLESHOOTING.md")
-    continuity = _read_text_if_exists(root, "docs/PROMPT_CONTINUIDADE.md")
+    write_filemap(root, docs_public / "FILEMAP.md", extra_names=extra_names)
+
+    names = _list_files(root, public_only=False, extra_names=extra_names)
+    book = render_software_book(names, lambda rel: _read_text_if_exists(root, rel), packs_merged=packs_merged, trace_id=trace_id)
+    (docs_public / "SOFTWARE_BOOK.md").write_text(book, encoding="utf-8")
+
+def render_software_book(
+    names: List[str],
+    read_text: Callable[[str], str],
+    packs_merged: Optional[List[str]] = None,
+    trace_id: str = "trace_local",
+) -> str:
+    """
+    Conteúdo do SOFTWARE_BOOK.md a partir da lista de paths do snapshot.
+    read_text(rel) devolve o texto do arquivo ("" se não existir); permite gerar o
+    book tanto de um diretório quanto direto dos ZIPs (merge streaming).
+    """
+    plan = read_text("docs/PLAN.md") if "docs/PLAN.md" in names else ""
+    troubleshooting = read_text("docs/TROUBLESHOOTING.md") if "docs/TROUBLESHOOTING.md" in names else ""
+    continuity = read_text("docs/PROMPT_CONTINUIDADE.md") if "docs/PROMPT_CONTINUIDADE.md" in names else ""
 
-    contracts = _extract_contract_list(root)
-    runbooks = _extract_runbooks(root)
-    history = _extract_history(root)
+    contracts = sorted(n for n in names if n.startswith("contracts/") and n.endswith(".json"))
+    runbooks = sorted(n for n in names if n.startswith("runbooks/") and n.count("/") == 1 and n.endswith(".md"))
+    history = sorted(n for n in names if n.startswith("history/"))
 
     # Compose
     lines: List[str] = []
@@ -152,4 +161,4 @@ def write_software_book(root: Path, packs_merged: Optional[List[str]]=None, trac
     lines.append("## FileMap\n")
     lines.append("Veja: `docs/public/FILEMAP.md`\n")
 
-    (docs_public / "SOFTWARE_BOOK.md").write_text("\n".join(lines) + "\n", encoding="utf-8")
\ No newline at end of file
+    return "\n".join(lines) + "\n"
\ No newline at end of file
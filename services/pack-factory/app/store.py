@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+import zipfile
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .delta import content_digest
+from .utils import file_lock, json_bytes, sha256_file, utc_now_iso
+from .zipio import COPY_CHUNK, FLAG_ENCRYPTED, PackWriter, iter_raw_entry, write_raw_entry
+
+STORE_REF_PREFIX = "store:"
+OBJECTS_DIR = "objects"
+CATALOG_DIR = "catalog"
+
+
+class PackStore:
+    """
+    Repositório local endereçado por conteúdo (CAS) para pack ZIPs.
+
+    Layout em root:
+    - objects/<ab>/<sha256>.<método>: conteúdo de uma entrada (sha256 do
+      conteúdo descomprimido) guardado já comprimido, com o método ZIP no
+      sufixo. Conteúdo igual em packs diferentes é guardado uma vez só.
+    - catalog/<nome>.json: manifest do pack (ordem das entradas, path,
+      sha256, CRC, tamanho e metadados de cada uma + digests do ZIP).
+
+    get reconstrói o ZIP copiando os blobs crus (sem recompressão): rebuild é
+    leitura do catalog + cópia de bytes; merge/export leem o pack direto do
+    catalog (open_pack), sem reconstruí-lo. put e gc são serializados por
+    lock no root (gc nunca remove blob de um put em andamento).
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _lock(self):
+        return file_lock(self.root / ".store.lock")
+
+    def _catalog_path(self, name: str) -> Path:
+        if not name or "/" in name or "\\" in name or name.startswith("."):
+            raise ValueError(f"nome de pack inválido no store: {name!r}")
+        return self.root / CATALOG_DIR / f"{name}.json"
+
+    def _blob_path(self, sha: str, method: int) -> Path:
+        return self.root / OBJECTS_DIR / sha[:2] / f"{sha}.{method}"
+
+    def _find_blob(self, sha: str) -> Optional[Path]:
+        d = self.root / OBJECTS_DIR / sha[:2]
+        if not d.is_dir():
+            return None
+        for p in d.glob(f"{sha}.*"):
+            if p.suffix[1:].isdigit():
+                return p
+        return None
+
+    def names(self) -> List[str]:
+        d = self.root / CATALOG_DIR
+        return sorted(p.stem for p in d.glob("*.json")) if d.is_dir() else []
+
+    def manifest(self, name: str) -> Dict[str, Any]:
+        p = self._catalog_path(name)
+        if not p.exists():
+            raise ValueError(f"pack não encontrado no store: {name}")
+        return json.loads(p.read_text(encoding="utf-8"))
+
+    def has(self, name: str) -> bool:
+        return self._catalog_path(name).exists()
+
+    # ── put ──
+
+    def _put_entry(self, z: zipfile.ZipFile, info: zipfile.ZipInfo) -> Dict[str, Any]:
+        if info.flag_bits & FLAG_ENCRYPTED:
+            raise ValueError(f"entrada criptografada não suportada no store: {info.filename}")
+        h = hashlib.sha256()
+        with z.open(info, "r") as f:
+            for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+                h.update(chunk)
+        sha = h.hexdigest()
+        blob = self._find_blob(sha)
+        new = blob is None
+        if new:
+            blob = self._blob_path(sha, info.compress_type)
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.parent / f".{blob.name}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with tmp.open("wb") as fout:
+                    write_raw_entry(z, info, fout)
+                os.replace(tmp, blob)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        return {
+            "path": info.filename,
+            "sha256": sha,
+            "bytes": int(info.file_size),
+            "crc32": int(info.CRC),
+            "date_time": list(info.date_time),
+            "external_attr": int(info.external_attr),
+            "create_system": int(info.create_system),
+            "_new": new,
+            "_stored_bytes": int(blob.stat().st_size),
+        }
+
+    def put(self, pack_zip: Path, name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Guarda o pack (blobs novos + manifest no catalog). Mesmo nome:
+        manifest substituído. O put inteiro (dedup, escrita dos blobs e do
+        manifest) roda sob o lock do store: um gc não remove um blob entre o
+        put achá-lo e o manifest que passa a referenciá-lo.
+        """
+        name = name or pack_zip.stem
+        cat = self._catalog_path(name)
+        with self._lock(), zipfile.ZipFile(pack_zip, "r") as z:
+            by_name: Dict[str, zipfile.ZipInfo] = {}
+            for info in z.infolist():
+                if not info.is_dir():
+                    by_name[info.filename] = info  # nome duplicado: última entrada vence
+            entries = [self._put_entry(z, info) for info in by_name.values()]
+
+            new_blobs = sum(1 for e in entries if e["_new"])
+            new_bytes = sum(e["_stored_bytes"] for e in entries if e["_new"])
+            for e in entries:
+                e.pop("_new")
+                e.pop("_stored_bytes")
+            manifest = {
+                "schema_version": "1.0",
+                "kind": "pack_store_manifest",
+                "name": name,
+                "stored_at": utc_now_iso(),
+                "zip": {"path": pack_zip.name, "sha256": sha256_file(pack_zip), "bytes": int(pack_zip.stat().st_size)},
+                "content_digest": content_digest(by_name),
+                "entries": entries,
+            }
+            cat.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cat.parent / f".{cat.name}.{uuid.uuid4().hex[:8]}.tmp"
+            tmp.write_bytes(json_bytes(manifest))
+            os.replace(tmp, cat)
+        return {
+            "ok": True,
+            "name": name,
+            "entries": len(entries),
+            "new_blobs": new_blobs,
+            "new_bytes": new_bytes,
+            "zip_bytes": manifest["zip"]["bytes"],
+            "dedup_entries": len(entries) - new_blobs,
+        }
+
+    # ── get ──
+
+    def _entry_blob(self, e: Dict[str, Any]) -> Tuple[Path, zipfile.ZipInfo]:
+        """Blob de uma entrada do manifest e o ZipInfo que ela terá no pack reconstruído."""
+        blob = self._find_blob(e["sha256"])
+        if blob is None:
+            raise ValueError(f"blob ausente no store: {e['sha256']} ({e['path']})")
+        zi = zipfile.ZipInfo(e["path"], date_time=tuple(e["date_time"]))
+        zi.compress_type = int(blob.suffix[1:])
+        zi.external_attr = int(e["external_attr"])
+        zi.create_system = int(e["create_system"])
+        zi.CRC = int(e["crc32"])
+        zi.file_size = int(e["bytes"])
+        zi.compress_size = int(blob.stat().st_size)
+        if zi.compress_type == zipfile.ZIP_LZMA:
+            zi.flag_bits |= 0x02  # EOS marker
+        return blob, zi
+
+    def get(self, name: str, out_zip: Path, jobs: int = 0) -> Dict[str, Any]:
+        """
+        Reconstrói o pack a partir do catalog + blobs (cópia crua, ordem
+        original) e confere o content digest (path, CRC, tamanho) e o CRC
+        dos dados (testzip). Falha: out_zip removido e ValueError.
+        """
+        manifest = self.manifest(name)
+        out_zip.parent.mkdir(parents=True, exist_ok=True)
+        with PackWriter(out_zip, jobs=jobs, order=[e["path"] for e in manifest["entries"]]) as w:
+            for e in manifest["entries"]:
+                blob, zi = self._entry_blob(e)
+                w.add_blob(e["path"], blob, zi)
+
+        out_sha = sha256_file(out_zip)
+        with zipfile.ZipFile(out_zip, "r") as z:
+            digest = content_digest({i.filename: i for i in z.infolist() if not i.is_dir()})
+            ok = digest == manifest["content_digest"] and z.testzip() is None
+        if not ok:
+            out_zip.unlink()
+            raise ValueError(f"reconstrução de {name} não confere com o catalog")
+        return {
+            "ok": True,
+            "name": name,
+            "out": {"path": out_zip.name, "sha256": out_sha, "content_digest": digest},
+            "byte_identical": out_sha == manifest["zip"]["sha256"],
+        }
+
+    def open_pack(self, ref: str) -> "CatalogPack":
+        """Ref 'store:<nome>' (ou só o nome) -> CatalogPack para leitura direta dos blobs."""
+        name = ref[len(STORE_REF_PREFIX):] if ref.startswith(STORE_REF_PREFIX) else ref
+        return CatalogPack(self, name)
+
+    # ── gc ──
+
+    def gc(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Remove blobs não referenciados por nenhum manifest do catalog (e temporários órfãos)."""
+        with self._lock():
+            referenced: Set[str] = set()
+            for name in self.names():
+                referenced.update(e["sha256"] for e in self.manifest(name)["entries"])
+            removed = 0
+            freed = 0
+            kept = 0
+            objects = self.root / OBJECTS_DIR
+            for p in sorted(objects.glob("*/*")) if objects.is_dir() else []:
+                if p.name.split(".")[0] in referenced:  # temporários (".<nome>.tmp") nunca batem
+                    kept += 1
+                    continue
+                removed += 1
+                freed += int(p.stat().st_size)
+                if not dry_run:
+                    p.unlink()
+        return {
+            "ok": True,
+            "timestamp": utc_now_iso(),
+            "dry_run": dry_run,
+            "packs": len(self.names()),
+            "blobs_kept": kept,
+            "blobs_removed": removed,
+            "bytes_freed": freed,
+        }
+
+
+class CatalogPack:
+    """
+    Pack do catalog lido sem reconstruir o ZIP: a parte de leitura de
+    zipfile.ZipFile usada por merge/export (infolist, getinfo, open, read),
+    com o conteúdo vindo dos blobs. ZipInfos com método, CRC e tamanhos do
+    ZIP reconstruído; open descomprime o blob (ZipExtFile, CRC conferido).
+    """
+
+    def __init__(self, store: PackStore, name: str) -> None:
+        self.filename = f"{STORE_REF_PREFIX}{name}"
+        self.manifest = store.manifest(name)
+        self._blobs: Dict[str, Path] = {}
+        self._sha256: Dict[str, str] = {}
+        self._infos: List[zipfile.ZipInfo] = []
+        for e in self.manifest["entries"]:
+            blob, zi = store._entry_blob(e)
+            self._infos.append(zi)
+            self._blobs[zi.filename] = blob
+            self._sha256[zi.filename] = str(e["sha256"])
+        self.NameToInfo = {zi.filename: zi for zi in self._infos}
+
+    def __enter__(self) -> "CatalogPack":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def infolist(self) -> List[zipfile.ZipInfo]:
+        return list(self._infos)
+
+    def namelist(self) -> List[str]:
+        return [zi.filename for zi in self._infos]
+
+    def getinfo(self, name: str) -> zipfile.ZipInfo:
+        try:
+            return self.NameToInfo[name]
+        except KeyError:
+            raise KeyError(f"There is no item named {name!r} in the archive")
+
+    def _info(self, name: Any) -> zipfile.ZipInfo:
+        return name if isinstance(name, zipfile.ZipInfo) else self.getinfo(name)
+
+    def blob(self, name: Any) -> Path:
+        """Arquivo com os dados comprimidos da entrada (bytes do ZIP, sem header)."""
+        return self._blobs[self._info(name).filename]
+
+    def sha256(self, name: Any) -> str:
+        """sha256 do conteúdo (do manifest: nada é lido)."""
+        return self._sha256[self._info(name).filename]
+
+    def open(self, name: Any, mode: str = "r") -> IO[bytes]:
+        if mode != "r":
+            raise ValueError("CatalogPack é só leitura")
+        info = self._info(name)
+        return zipfile.ZipExtFile(self.blob(info).open("rb"), "r", info, None, True)
+
+    def read(self, name: Any) -> bytes:
+        with self.open(name) as f:
+            return f.read()
+
+    def read_stored_range(self, info: zipfile.ZipInfo, start: int, end: int) -> bytes:
+        """Como zipio.read_stored_range: blob ZIP_STORED é o próprio conteúdo."""
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"entrada não é ZIP_STORED em claro: {info.filename}")
+        start = max(0, min(start, info.file_size))
+        end = max(start, min(end, info.file_size))
+        with self.blob(info).open("rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+
+def open_pack(ref: Path, store: Optional[PackStore] = None) -> Any:
+    """Ref "store:<nome>" (com store) -> CatalogPack; senão zipfile.ZipFile do path."""
+    if store is not None and str(ref).startswith(STORE_REF_PREFIX):
+        return store.open_pack(str(ref))
+    return zipfile.ZipFile(ref, "r")
+
+
+def add_raw_entry(w: PackWriter, src: Any, info: zipfile.ZipInfo, arcname: Optional[str] = None) -> None:
+    """PackWriter.add_entry para ZipFile ou CatalogPack (blob copiado cru, sem reconstruir o pack)."""
+    if isinstance(src, CatalogPack):
+        w.add_blob(arcname or info.filename, src.blob(info), info)
+    else:
+        w.add_entry(src, info, arcname=arcname)
+
+
+def raw_entry_chunks(src: Any, info: zipfile.ZipInfo) -> Iterator[bytes]:
+    """zipio.iter_raw_entry para ZipFile ou CatalogPack (chunks do blob)."""
+    if isinstance(src, CatalogPack):
+        with src.blob(info).open("rb") as f:
+            yield from iter(lambda: f.read(COPY_CHUNK), b"")
+    else:
+        yield from iter_raw_entry(src, info)
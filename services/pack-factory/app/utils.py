@@ -1,7 +1,15 @@
 from __future__ import annotations
 import hashlib
 import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, Optional
+
+# 1980-01-01T00:00:00Z: menor data representável numa entrada ZIP
+ZIP_EPOCH = 315532800
+
+_fixed_epoch: Optional[int] = None
 
 def sha256_file(path: Path) -> str:
     h = hashlib.sha256()
@@ -10,13 +18,66 @@ def sha256_file(path: Path) -> str:
             h.update(chunk)
     return h.hexdigest()
 
+def json_bytes(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
 def write_json(path: Path, obj) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    path.write_bytes(json_bytes(obj))
 
 def utc_now_iso() -> str:
     import datetime
+    if _fixed_epoch is not None:
+        return datetime.datetime.fromtimestamp(_fixed_epoch, tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
+def fixed_epoch() -> Optional[int]:
+    """Instante fixo do modo reprodutível (None = relógio real)."""
+    return _fixed_epoch
+
+@contextmanager
+def reproducible_mode(enabled: bool = True) -> Iterator[Optional[int]]:
+    """
+    Modo reprodutível (por processo): utc_now_iso() e as datas das entradas
+    dos ZIPs (PackWriter) usam um instante fixo — SOURCE_DATE_EPOCH, senão
+    ZIP_EPOCH. enabled=False não altera nada.
+    """
+    global _fixed_epoch
+    prev = _fixed_epoch
+    if enabled:
+        env = os.environ.get("SOURCE_DATE_EPOCH", "").strip()
+        _fixed_epoch = max(int(env), ZIP_EPOCH) if env.isdigit() else ZIP_EPOCH
+    try:
+        yield _fixed_epoch
+    finally:
+        _fixed_epoch = prev
+
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
+
+@contextmanager
+def file_lock(lock_path: Path) -> Iterator[None]:
+    """Lock exclusivo entre processos (advisory) em lock_path; bloqueia até obter."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+import time
+import uuid
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from .compression import METHOD_NAMES, CompressionPolicy, CompressionStats
+from .utils import fixed_epoch
+
+COPY_CHUNK = 1024 * 1024
+
+# Janela de memória do PackWriter (bytes não comprimidos em voo) e tamanho a
+# partir do qual a entrada é comprimida em stream pela thread serializadora.
+DEFAULT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+DEFAULT_STREAM_THRESHOLD = 16 * 1024 * 1024
+
+
+def reproducible_date_time() -> Optional[Tuple[int, ...]]:
+    """date_time fixo das entradas no modo reprodutível (UTC), ou None."""
+    epoch = fixed_epoch()
+    return None if epoch is None else tuple(time.gmtime(epoch)[:6])
+
+
+def new_zipinfo(arcname: str, date_time: Optional[Tuple[int, ...]] = None) -> zipfile.ZipInfo:
+    """ZipInfo padrão dos packs (DEFLATED, 0644)."""
+    zi = zipfile.ZipInfo(arcname, date_time=tuple(date_time or time.localtime(time.time())[:6]))
+    zi.compress_type = zipfile.ZIP_DEFLATED
+    zi.external_attr = 0o644 << 16
+    return zi
+
+
+def _normalize_zipinfo(zi: zipfile.ZipInfo, date_time: Tuple[int, ...], executable: bool) -> None:
+    """Metadados independentes de filesystem/plataforma: data fixa, 0644/0755, create_system=unix, sem extra."""
+    zi.date_time = date_time
+    zi.external_attr = (0o755 if executable else 0o644) << 16
+    zi.create_system = 3
+    zi.extra = b""
+    zi.comment = b""
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """Remove o campo zip64 (id 0x0001) do extra: o zipfile o regenera ao escrever."""
+    out = b""
+    i = 0
+    while i + 4 <= len(extra):
+        hid, ln = struct.unpack("<HH", extra[i:i + 4])
+        if hid != 0x0001:
+            out += extra[i:i + 4 + ln]
+        i += 4 + ln
+    return out
+
+
+def copy_entry(
+    src: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    dst: zipfile.ZipFile,
+    arcname: Optional[str] = None,
+) -> None:
+    """
+    Copia uma entrada de um ZIP para outro em stream (sem extrair para disco).
+    Preserva date_time e permissões da entrada de origem.
+    """
+    zi = new_zipinfo(arcname or info.filename, info.date_time)
+    zi.external_attr = info.external_attr
+    zi.file_size = info.file_size  # decide zip64 antecipadamente
+    with src.open(info, "r") as fin, dst.open(zi, "w") as fout:
+        shutil.copyfileobj(fin, fout, COPY_CHUNK)
+
+
+FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def raw_data_offset(src: zipfile.ZipFile, info: zipfile.ZipInfo) -> int:
+    """Offset (no arquivo de origem) do início dos dados comprimidos da entrada."""
+    with src._lock:
+        src.fp.seek(info.header_offset)
+        fheader = src.fp.read(zipfile.sizeFileHeader)
+    if len(fheader) != zipfile.sizeFileHeader:
+        raise zipfile.BadZipFile("Truncated file header")
+    fheader = struct.unpack(zipfile.structFileHeader, fheader)
+    if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile("Bad magic number for file header")
+    return (
+        info.header_offset
+        + zipfile.sizeFileHeader
+        + fheader[zipfile._FH_FILENAME_LENGTH]
+        + fheader[zipfile._FH_EXTRA_FIELD_LENGTH]
+    )
+
+
+def _iter_raw(src: zipfile.ZipFile, info: zipfile.ZipInfo, data_offset: int) -> Iterator[bytes]:
+    src.fp.seek(data_offset)
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = src.fp.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def iter_raw_entry(src: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[bytes]:
+    """Dados da entrada como estão no ZIP (comprimidos), em chunks; o lock da origem fica com o iterador."""
+    with src._lock:
+        yield from _iter_raw(src, info, raw_data_offset(src, info))
+
+
+def write_raw_entry(src: zipfile.ZipFile, info: zipfile.ZipInfo, fout: IO[bytes]) -> int:
+    """Grava em fout os dados da entrada como estão no ZIP (comprimidos); retorna os bytes gravados."""
+    written = 0
+    for chunk in iter_raw_entry(src, info):
+        fout.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def _append_compressed(dst: zipfile.ZipFile, zi: zipfile.ZipInfo, chunks: Iterable[bytes]) -> None:
+    """
+    Anexa uma entrada cujos dados já estão comprimidos (zi traz CRC, tamanhos
+    e compress_type corretos). Header local completo, sem data descriptor.
+    """
+    zi.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+    with dst._lock:
+        if dst._writing:
+            raise ValueError("Can't write to the ZIP file while there is another write handle open on it.")
+        if dst._seekable:
+            dst.fp.seek(dst.start_dir)
+        zi.header_offset = dst.fp.tell()
+        dst._writecheck(zi)
+        dst._didModify = True
+        dst.fp.write(zi.FileHeader())
+        for chunk in chunks:
+            dst.fp.write(chunk)
+        dst.filelist.append(zi)
+        dst.NameToInfo[zi.filename] = zi
+        dst.start_dir = dst.fp.tell()
+
+
+def _copy_zipinfo(info: zipfile.ZipInfo, arcname: Optional[str] = None) -> zipfile.ZipInfo:
+    """ZipInfo novo com metadados, método, CRC e tamanhos de info (para cópia crua)."""
+    zi = zipfile.ZipInfo(arcname or info.filename, date_time=info.date_time)
+    zi.compress_type = info.compress_type
+    zi.external_attr = info.external_attr
+    zi.create_system = info.create_system
+    zi.extra = _strip_zip64_extra(info.extra)
+    zi.comment = info.comment
+    zi.CRC = info.CRC
+    zi.compress_size = info.compress_size
+    zi.file_size = info.file_size
+    zi.flag_bits = info.flag_bits
+    return zi
+
+
+def copy_entry_raw(
+    src: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    dst: zipfile.ZipFile,
+    arcname: Optional[str] = None,
+    date_time: Optional[Tuple[int, ...]] = None,
+) -> None:
+    """
+    Copia a entrada sem descomprimir/recomprimir: os bytes já comprimidos
+    (e o CRC/tamanhos do central directory) vão da origem para o destino
+    inalterados. Entradas criptografadas caem no copy_entry (stream).
+    date_time: normaliza data/permissões (modo reprodutível); senão preserva.
+    """
+    if info.flag_bits & FLAG_ENCRYPTED:
+        copy_entry(src, info, dst, arcname=arcname)
+        return
+
+    zi = _copy_zipinfo(info, arcname)
+    if date_time is not None:
+        _normalize_zipinfo(zi, date_time, executable=bool((info.external_attr >> 16) & 0o111))
+
+    with src._lock:
+        _append_compressed(dst, zi, _iter_raw(src, info, raw_data_offset(src, info)))
+
+
+def read_stored_range(src: zipfile.ZipFile, info: zipfile.ZipInfo, start: int, end: int) -> bytes:
+    """
+    Bytes [start:end) do conteúdo de uma entrada ZIP_STORED, lidos direto do
+    arquivo de origem (seek, sem percorrer a entrada desde o início).
+    """
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & FLAG_ENCRYPTED:
+        raise ValueError(f"entrada não é ZIP_STORED em claro: {info.filename}")
+    start = max(0, min(start, info.file_size))
+    end = max(start, min(end, info.file_size))
+    with src._lock:
+        src.fp.seek(raw_data_offset(src, info) + start)
+        return src.fp.read(end - start)
+
+
+def _deflate(data: bytes, level: int) -> Tuple[bytes, int]:
+    """Deflate cru (formato ZIP) + CRC32. zlib libera o GIL: roda em paralelo."""
+    co = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return co.compress(data) + co.flush(), zlib.crc32(data)
+
+
+@dataclass
+class _PackItem:
+    arcname: str
+    kind: str  # file | bytes | raw | blob | stream | stored
+    size: int = 0
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+    src: Optional[zipfile.ZipFile] = None
+    info: Optional[zipfile.ZipInfo] = None
+    produce: Optional[Callable[[IO[bytes]], None]] = None
+    prepare: Optional[Callable[[], Tuple[int, int, Iterable[bytes]]]] = None
+    date_time: Optional[Tuple[int, ...]] = None
+    compress_type: Optional[int] = None  # None = decidido pela CompressionPolicy
+    deferred: bool = False
+
+
+class PackWriter:
+    """
+    Writer compartilhado dos ZIPs de pack.
+
+    As entradas são registradas (add_*) e escritas no close(), em ordem
+    determinística (path ordenado): arquivos e bytes gerados são comprimidos
+    num thread pool e uma única thread (a que chama close) serializa o ZIP,
+    com no máximo max_inflight_bytes não comprimidos em voo. Entradas maiores
+    que stream_threshold, entradas ZIP_STORED, cópias cruas (add_entry) e
+    produtores (add_stream, add_stored) são escritos em stream pelo serializador.
+
+    O método de cada entrada sem compress_type explícito vem da
+    CompressionPolicy (por tipo + sonda de compressibilidade) e o resultado
+    é acumulado em self.stats (por tipo: bytes, razão, segundos, métodos).
+    Entradas deferred=True são escritas por último, na ordem de registro
+    (p.ex. um receipt que registra as stats das demais). order: ordem
+    explícita dos arcnames (reconstrução fiel de outro ZIP); os demais vêm
+    depois, ordenados.
+
+    O ZIP é escrito num arquivo temporário ao lado de out_zip e publicado com
+    os.replace: leitores nunca veem um ZIP parcial.
+
+    Modo reprodutível (utils.reproducible_mode ativo na criação): todas as
+    entradas com data fixa, permissões 0644/0755 e create_system=unix, e o
+    mesmo compresslevel em todos os caminhos de compressão — entradas iguais
+    geram bytes de ZIP idênticos (mesma versão de zlib).
+
+    jobs <= 0 usa os.cpu_count().
+    """
+
+    def __init__(
+        self,
+        out_zip: Path,
+        jobs: int = 0,
+        compresslevel: int = zlib.Z_DEFAULT_COMPRESSION,
+        max_inflight_bytes: int = DEFAULT_MAX_INFLIGHT_BYTES,
+        stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+        policy: Optional[CompressionPolicy] = None,
+        order: Optional[List[str]] = None,
+    ) -> None:
+        self.out_zip = out_zip
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.policy = policy or CompressionPolicy(level=compresslevel)
+        self.compresslevel = self.policy.level
+        self.stats = CompressionStats()
+        self.order = order
+        self.max_inflight_bytes = max_inflight_bytes
+        self.stream_threshold = min(stream_threshold, max_inflight_bytes)
+        self.date_time = reproducible_date_time()
+        self._items: Dict[str, _PackItem] = {}
+        self._closed = False
+
+    def __enter__(self) -> "PackWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+
+    def __contains__(self, arcname: str) -> bool:
+        return arcname in self._items
+
+    # ── registro ──
+
+    def add_file(self, path: Path, arcname: str, compress_type: Optional[int] = None) -> None:
+        self._items[arcname] = _PackItem(arcname, "file", size=int(path.stat().st_size), path=path, compress_type=compress_type)
+
+    def add_bytes(self, arcname: str, data: bytes, compress_type: Optional[int] = None) -> None:
+        self._items[arcname] = _PackItem(arcname, "bytes", size=len(data), data=data, compress_type=compress_type)
+
+    def add_entry(self, src: zipfile.ZipFile, info: zipfile.ZipInfo, arcname: Optional[str] = None) -> None:
+        """Entrada inalterada de outro ZIP: copiada crua (sem recompressão)."""
+        name = arcname or info.filename
+        self._items[name] = _PackItem(name, "raw", size=int(info.file_size), src=src, info=info)
+
+    def add_blob(self, arcname: str, path: Path, info: zipfile.ZipInfo) -> None:
+        """Dados já comprimidos num arquivo (p.ex. blob do store): info traz método, CRC e tamanhos."""
+        self._items[arcname] = _PackItem(arcname, "blob", size=int(info.file_size), path=path, info=info)
+
+    def add_stream(
+        self,
+        arcname: str,
+        produce: Callable[[IO[bytes]], None],
+        compress_type: Optional[int] = None,
+        deferred: bool = False,
+    ) -> None:
+        """Entrada gerada em stream: produce(f) escreve o conteúdo no handle do ZIP."""
+        self._items.pop(arcname, None)
+        self._items[arcname] = _PackItem(arcname, "stream", produce=produce, compress_type=compress_type, deferred=deferred)
+
+    def add_stored(
+        self,
+        arcname: str,
+        prepare: Callable[[], Tuple[int, int, Iterable[bytes]]],
+        deferred: bool = False,
+    ) -> None:
+        """
+        Entrada ZIP_STORED com CRC e tamanho conhecidos antes dos dados:
+        prepare() -> (crc32, bytes, chunks), chamado na escrita. Os chunks
+        vão direto para o ZIP, sem recalcular o CRC (p.ex. cópia crua de uma
+        entrada STORED seguida de um sufixo com CRC continuado).
+        """
+        self._items.pop(arcname, None)
+        self._items[arcname] = _PackItem(arcname, "stored", prepare=prepare, compress_type=zipfile.ZIP_STORED, deferred=deferred)
+
+    # ── escrita ──
+
+    def _method(self, item: _PackItem, sample: Optional[bytes]) -> int:
+        if item.compress_type is not None:
+            return item.compress_type
+        return self.policy.choose(item.arcname, item.size, sample)
+
+    def _sample(self, item: _PackItem) -> Optional[bytes]:
+        if item.kind == "file":
+            with item.path.open("rb") as f:
+                return f.read(self.policy.probe_bytes)
+        if item.kind == "bytes":
+            return (item.data or b"")[: self.policy.probe_bytes]
+        return None
+
+    def _zipinfo(self, item: _PackItem, method: int) -> zipfile.ZipInfo:
+        if item.kind == "file" and self.date_time is None:
+            zi = zipfile.ZipInfo.from_file(item.path, item.arcname)
+            zi.compress_type = method
+            return zi
+        zi = new_zipinfo(item.arcname, item.date_time)
+        zi.compress_type = method
+        if self.date_time is not None:
+            executable = item.kind == "file" and bool(item.path.stat().st_mode & 0o111)
+            _normalize_zipinfo(zi, self.date_time, executable)
+        return zi
+
+    def _load(self, item: _PackItem) -> bytes:
+        if item.kind == "file":
+            return item.path.read_bytes()
+        return item.data or b""
+
+    def _compress(self, item: _PackItem) -> Tuple[bytes, int, int, int]:
+        data = self._load(item)
+        t0 = time.perf_counter()
+        method = self._method(item, data[: self.policy.probe_bytes])
+        if method == zipfile.ZIP_DEFLATED:
+            comp, crc = _deflate(data, self.compresslevel)
+        elif method == zipfile.ZIP_LZMA:
+            co = zipfile.LZMACompressor()
+            comp, crc = co.compress(data) + co.flush(), zlib.crc32(data)
+        else:
+            comp, crc = data, zlib.crc32(data)
+        self.stats.record(item.arcname, METHOD_NAMES.get(method, str(method)), len(data), len(comp), time.perf_counter() - t0)
+        return comp, crc, len(data), method
+
+    def _write_serial(self, z: zipfile.ZipFile, item: _PackItem) -> None:
+        if item.kind == "raw":
+            copy_entry_raw(item.src, item.info, z, arcname=item.arcname, date_time=self.date_time)
+            self.stats.record(item.arcname, "raw", item.info.file_size, item.info.compress_size)
+            return
+        if item.kind == "blob":
+            zi = _copy_zipinfo(item.info, item.arcname)
+            if self.date_time is not None:
+                _normalize_zipinfo(zi, self.date_time, executable=bool((zi.external_attr >> 16) & 0o111))
+            with item.path.open("rb") as fin:
+                _append_compressed(z, zi, iter(lambda: fin.read(COPY_CHUNK), b""))
+            self.stats.record(item.arcname, "raw", zi.file_size, zi.compress_size)
+            return
+        t0 = time.perf_counter()
+        if item.kind == "stored":
+            zi = self._zipinfo(item, zipfile.ZIP_STORED)
+            zi.CRC, zi.file_size, chunks = item.prepare()
+            zi.compress_size = zi.file_size
+            _append_compressed(z, zi, chunks)
+            self.stats.record(item.arcname, METHOD_NAMES.get(zipfile.ZIP_STORED, "stored"),
+                              zi.file_size, zi.compress_size, time.perf_counter() - t0)
+            return
+        zi = self._zipinfo(item, self._method(item, self._sample(item)))
+        if item.kind == "stream":
+            with z.open(zi, "w") as f:
+                item.produce(f)
+        elif item.kind == "file":
+            with item.path.open("rb") as fin, z.open(zi, "w") as fout:
+                shutil.copyfileobj(fin, fout, COPY_CHUNK)
+        else:
+            z.writestr(zi, item.data or b"")
+        self.stats.record(item.arcname, METHOD_NAMES.get(zi.compress_type, str(zi.compress_type)),
+                          zi.file_size, zi.compress_size, time.perf_counter() - t0)
+
+    def _write_compressed(self, z: zipfile.ZipFile, item: _PackItem, result: Tuple[bytes, int, int, int]) -> None:
+        comp, crc, size, method = result
+        zi = self._zipinfo(item, method)
+        if method == zipfile.ZIP_LZMA:
+            zi.flag_bits |= 0x02  # EOS marker (como zipfile._open_to_write)
+        zi.CRC = crc
+        zi.file_size = size
+        zi.compress_size = len(comp)
+        _append_compressed(z, zi, [comp])
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        ordered = [k for k in (self.order or []) if k in self._items]
+        first = set(ordered)
+        ordered += [k for k in sorted(self._items) if k not in first]
+        items = [self._items[k] for k in ordered if not self._items[k].deferred]
+        items += [it for it in self._items.values() if it.deferred]
+        tmp_out = self.out_zip.parent / f".{self.out_zip.name}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            self._write_all(tmp_out, items)
+            os.replace(tmp_out, self.out_zip)
+        finally:
+            if tmp_out.exists():
+                tmp_out.unlink()
+
+    def _write_all(self, out_path: Path, items: List[_PackItem]) -> None:
+        with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as z, \
+                ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            pending: Deque[Tuple[_PackItem, Optional[Future]]] = deque()
+            inflight = 0
+
+            def _drain_one() -> None:
+                nonlocal inflight
+                item, fut = pending.popleft()
+                if fut is None:
+                    self._write_serial(z, item)
+                else:
+                    self._write_compressed(z, item, fut.result())
+                    inflight -= item.size
+
+            for item in items:
+                if (
+                    item.kind in ("file", "bytes")
+                    and item.compress_type in (None, zipfile.ZIP_DEFLATED, zipfile.ZIP_LZMA)
+                    and item.size <= self.stream_threshold
+                ):
+                    while pending and inflight + item.size > self.max_inflight_bytes:
+                        _drain_one()
+                    inflight += item.size
+                    pending.append((item, pool.submit(self._compress, item)))
+                else:
+                    pending.append((item, None))
+            while pending:
+                _drain_one()
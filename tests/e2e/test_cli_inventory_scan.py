@@ -29,3 +29,107 @@ def test_cli_inventory_scan_ignores_noise(tmp_path: Path):
     assert data.get("trace_id") == "t1"
     assert data["summary"]["files"] == 1
     assert any("__MACOSX" in p or ".DS_Store" in p or "/._" in p or p.startswith("._") for p in data.get("ignored", []))
+
+def test_cli_inventory_scan_ndjson_matches_json(tmp_path: Path):
+    zpath = tmp_path / "t.zip"
+    with zipfile.ZipFile(zpath, "w") as z:
+        z.writestr("__MACOSX/._junk", "x")
+        for i in range(25):
+            z.writestr(f"docs/f{i:02d}.md", "# doc\n" * (i + 1))
+        z.writestr("data/x.csv", "a,b\n1,2\n")
+
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+
+    out_json = tmp_path / "inv.json"
+    out_nd = tmp_path / "inv.ndjson"
+    r = _run_cli(["inventory-scan", "--target", str(zpath), "--out", str(out_json), "--trace", "t1"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    r = _run_cli(["inventory-scan", "--target", str(zpath), "--out", str(out_nd), "--trace", "t1", "--format", "ndjson", "--jobs", "3"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+
+    data = json.loads(out_json.read_text(encoding="utf-8"))
+    lines = [json.loads(x) for x in out_nd.read_text(encoding="utf-8").splitlines()]
+    trailer = lines.pop()
+    assert trailer["record"] == "summary" and trailer["trace_id"] == "t1"
+    assert lines == data["items"]
+    assert trailer["summary"] == data["summary"]
+    assert trailer["ignored"] == data["ignored"]
+
+
+def test_cli_inventory_scan_recursive_chain_paths(tmp_path: Path):
+    from app.resolver import resolve_zip_chain
+
+    c = tmp_path / "C.zip"
+    with zipfile.ZipFile(c, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("deep.txt", "fundo")
+    b = tmp_path / "B.zip"
+    with zipfile.ZipFile(b, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("docs/PLAN.md", "hello-plan")
+        z.write(c, "C.zip", compress_type=zipfile.ZIP_DEFLATED)  # aninhado comprimido: spool
+    big = tmp_path / "big.zip"
+    with zipfile.ZipFile(big, "w") as z:
+        z.writestr("x.bin", b"\0" * 50_000)
+    a = tmp_path / "A.zip"
+    with zipfile.ZipFile(a, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("top.md", "# top")
+        z.write(b, "packs/B.zip", compress_type=zipfile.ZIP_STORED)  # aninhado stored: lido no lugar
+        z.write(big, "big.zip", compress_type=zipfile.ZIP_STORED)
+        z.writestr("fake.zip", "não é zip")
+
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    out = tmp_path / "inv.json"
+    r = _run_cli(["inventory-scan", "--target", str(a), "--out", str(out), "--recursive", "--jobs", "2",
+                  "--max-nested-bytes", "40000"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    data = json.loads(out.read_text(encoding="utf-8"))
+    paths = [it["path"] for it in data["items"]]
+    ref_plan = f"zip::{a}::packs/B.zip::docs/PLAN.md"
+    ref_deep = f"zip::{a}::packs/B.zip::C.zip::deep.txt"
+    assert paths == ["top.md", "packs/B.zip", ref_plan, f"zip::{a}::packs/B.zip::C.zip", ref_deep, "big.zip", "fake.zip"]
+    by_path = {it["path"]: it for it in data["items"]}
+    body, rep = resolve_zip_chain(ref_deep)
+    assert body == b"fundo" and rep["sha256"] == by_path[ref_deep]["sha256"]
+    reasons = {s["path"]: s["reason"] for s in data["nested_skipped"]}
+    assert reasons == {f"zip::{a}::big.zip": "size", f"zip::{a}::fake.zip": "not_a_zip"}
+
+    r = _run_cli(["inventory-scan", "--target", str(a), "--out", str(out), "--recursive", "--max-depth", "1", "--jobs", "1"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert ref_deep not in [it["path"] for it in data["items"]]
+    assert {"path": f"zip::{a}::packs/B.zip::C.zip", "reason": "depth"} in data["nested_skipped"]
+
+
+def test_cli_inventory_diff_detects_renames(tmp_path: Path):
+    a = tmp_path / "A.zip"
+    b = tmp_path / "B.zip"
+    with zipfile.ZipFile(a, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("same.md", "igual")
+        z.writestr("edit.md", "v1")
+        z.writestr("old/name.json", '{"x": 1}')
+        z.writestr("gone.txt", "tchau")
+        z.writestr("empty_a.txt", "")
+    with zipfile.ZipFile(b, "w", compression=zipfile.ZIP_STORED) as z:
+        z.writestr("same.md", "igual")
+        z.writestr("edit.md", "v2 maior")
+        z.writestr("new/name.json", '{"x": 1}')
+        z.writestr("novo.txt", "oi")
+        z.writestr("empty_b.txt", "")
+
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    for extra in ([], ["--confirm"]):
+        out = tmp_path / "diff.json"
+        r = _run_cli(["inventory-diff", "--from", str(a), "--to", str(b), "--out", str(out)] + extra, env, repo_root)
+        assert r.returncode == 0, r.stderr
+        d = json.loads(out.read_text(encoding="utf-8"))
+        assert d["confirmed"] is bool(extra)
+        assert d["added"] == ["empty_b.txt", "novo.txt"]
+        assert d["removed"] == ["empty_a.txt", "gone.txt"]
+        assert [m["path"] for m in d["modified"]] == ["edit.md"]
+        assert [(x["from"], x["to"]) for x in d["renamed"]] == [("old/name.json", "new/name.json")]
+        assert d["counts"]["unchanged"] == 1
@@ -41,3 +41,28 @@ def test_leak_check_pass_and_fail(tmp_path: Path):
     rep2 = json.loads(out_bad.read_text(encoding="utf-8"))
     assert rep2["status"] == "FAIL"
     assert rep2["counts"]["violations"] >= 1
+
+
+def test_leak_check_content_finds_secret_in_allowed_entry(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory") + os.pathsep + str(repo_root)
+    policy = repo_root / "governance" / "audience_policy.team_pack0_only.v1.json"
+
+    key = "AKIA" + "ABCDEFGHIJKLMNOP"
+    target = tmp_path / "team.zip"
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("docs/PLAN.md", "plano sem segredo; AKIA sozinho não conta\n")
+        z.writestr("runbooks/deploy.md", "x" * 3000 + f"\nexport AWS_ACCESS_KEY_ID={key}\n")
+
+    out = tmp_path / "rep.json"
+    r0 = _run_cli(["leak-check", "--target", str(target), "--policy", str(policy), "--out", str(out)], env, repo_root)
+    assert r0.returncode == 0, r0.stderr
+    assert "content_scan" not in json.loads(out.read_text(encoding="utf-8"))
+
+    r = _run_cli(["leak-check", "--target", str(target), "--policy", str(policy), "--out", str(out), "--content", "--jobs", "2"], env, repo_root)
+    assert r.returncode == 2
+    rep = json.loads(out.read_text(encoding="utf-8"))
+    assert rep["status"] == "FAIL" and rep["counts"]["secrets"] == 1
+    assert rep["violations"] == [{"path": "runbooks/deploy.md", "reason": "secret", "pattern": "aws_access_key_id", "offset": 3000 + len("\nexport AWS_ACCESS_KEY_ID=")}]
+    assert rep["content_scan"]["entries"] == 2 and rep["content_scan"]["bytes_scanned"] > 3000
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from app.utils import sha256_file
+
+
+def _run_cli(args: list[str], env: dict[str,str], cwd: Path) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, "-m", "app.cli"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def test_cli_reproducible_outputs_are_byte_identical(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    env.pop("SOURCE_DATE_EPOCH", None)
+
+    def _pipeline(run_dir: Path) -> dict:
+        run_dir.mkdir()
+        r = _run_cli(["pack0", "--module", "meetcore", "--out", str(run_dir), "--trace", "T0", "--reproducible"], env, repo_root)
+        assert r.returncode == 0, r.stderr
+        p0 = run_dir / "pack0-meetcore-0.0.1.zip"
+
+        rr = run_dir / "run_report.json"
+        rr.write_text(json.dumps({
+            "schema_version": "1.0", "pack_ref": "pack0-meetcore@0.0.1", "pack_sha256": sha256_file(p0),
+            "result": "pass", "checks": {}, "failures": [], "actor_id": "a", "trace_id": "T1",
+            "env_fingerprint": "x", "timestamp": "2026-01-01T00:00:00Z",
+        }), encoding="utf-8")
+        patch = run_dir / "patch_rr.zip"
+        r = _run_cli(["wrap-run-report", "--in", str(rr), "--out", str(patch), "--trace", "T2", "--reproducible"], env, repo_root)
+        assert r.returncode == 0, r.stderr
+
+        outs = {"pack0": p0, "patch": patch}
+        for flag in ([], ["--stream"]):
+            snap = run_dir / f"snap{''.join(flag)}.zip"
+            r = _run_cli(["merge", "--inputs", str(p0), str(patch), "--out", str(snap), "--tmp", str(run_dir / "tmp"),
+                          "--trace", "M1", "--reproducible"] + flag, env, repo_root)
+            assert r.returncode == 0, r.stderr
+            outs[f"merge{''.join(flag)}"] = snap
+        return {k: sha256_file(v) for k, v in outs.items()}
+
+    first = _pipeline(tmp_path / "a")
+    time.sleep(2.1)  # resolução de data do ZIP: 2s
+    second = _pipeline(tmp_path / "b")
+    assert first == second
+
+    with zipfile.ZipFile(tmp_path / "a" / "snap.zip", "r") as z:
+        assert {i.date_time for i in z.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+        assert {i.external_attr >> 16 for i in z.infolist()} <= {0o644, 0o755}
+        assert json.loads(z.read("history/merge_receipts/M1.json"))["timestamp"] == "1980-01-01T00:00:00Z"
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+from app.resolver import ZipChainResolver
+
+
+def _run_cli(args: list[str], env: dict[str,str], cwd: Path) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, "-m", "app.cli"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def _bundle(tmp_path: Path) -> Path:
+    c = tmp_path / "C.zip"
+    with zipfile.ZipFile(c, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("deep.md", "fundo")
+    b = tmp_path / "B.zip"
+    with zipfile.ZipFile(b, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for i in range(5):
+            z.writestr(f"docs/d{i}.md", f"doc {i}")
+        z.write(c, "C.zip")
+    a = tmp_path / "A.zip"
+    with zipfile.ZipFile(a, "w") as z:
+        z.write(b, "B.zip", compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("top.md", "topo")
+    return a
+
+
+def test_cli_resolve_batch_opens_each_archive_once(tmp_path: Path):
+    a = _bundle(tmp_path)
+    refs = tmp_path / "refs.jsonl"
+    lines = [json.dumps(f"zip::{a}::B.zip::docs/d{i}.md") for i in (3, 0, 4)]
+    lines.append(json.dumps({"ref": f"zip::{a}::B.zip::C.zip::deep.md", "out": "sub/deep.md"}))
+    lines.append(json.dumps(f"zip::{a}::B.zip::docs/missing.md"))
+    lines.append(json.dumps(f"zip::{a}::B.zip::docs/d1.md"))
+    refs.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    out_dir = tmp_path / "out"
+    r = _run_cli(["resolve", "--batch", str(refs), "--out-dir", str(out_dir), "--trace", "B1"], env, repo_root)
+    assert r.returncode == 2  # uma ref falhou
+    rep = json.loads((out_dir / "resolve.report.json").read_text(encoding="utf-8"))
+    assert rep["refs"] == 6 and rep["failed"] == 1
+    assert rep["archives"]["opened"] == 3  # A, A::B, A::B::C
+    res = rep["results"]
+    assert [x["ok"] for x in res] == [True, True, True, True, False, True]
+    assert Path(res[0]["out"]).read_text(encoding="utf-8") == "doc 3"
+    assert (out_dir / "sub" / "deep.md").read_text(encoding="utf-8") == "fundo"
+    assert "missing.md" in res[4]["error"]
+
+
+def test_zip_chain_resolver_lru_evicts_but_keeps_chain(tmp_path: Path):
+    a = _bundle(tmp_path)
+    with ZipChainResolver(max_open=2) as resolver:
+        assert resolver.read(f"zip::{a}::B.zip::C.zip::deep.md")[0] == b"fundo"
+        assert resolver.read(f"zip::{a}::top.md")[0] == b"topo"
+        assert resolver.read(f"zip::{a}::B.zip::docs/d2.md")[0] == b"doc 2"
+        assert resolver.stats["evicted"] >= 1
+        assert len(resolver._lru) <= 2
+
+
+def test_cli_resolve_range(tmp_path: Path):
+    a = _bundle(tmp_path)
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    out = tmp_path / "head.bin"
+    r = _run_cli(["resolve", "--ref", f"zip::{a}::B.zip::docs/d3.md", "--range", ":3", "--out", str(out), "--hash"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    assert out.read_bytes() == b"doc"
+    rep = json.loads((tmp_path / "head.bin.report.json").read_text(encoding="utf-8"))
+    assert rep["range"] == {"start": 0, "end": 3} and len(rep["sha256"]) == 64
+    r = _run_cli(["resolve", "--ref", f"zip::{a}::top.md", "--range", "5:2", "--out", str(out)], env, repo_root)
+    assert r.returncode == 2
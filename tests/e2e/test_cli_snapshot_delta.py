@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+from app.merger import merge_packs
+from app.utils import sha256_file
+
+
+def _run_cli(args: list[str], env: dict[str,str], cwd: Path) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, "-m", "app.cli"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def _mkzip(path: Path, files: dict):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+
+
+def test_cli_snapshot_delta_and_apply(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+
+    p0 = tmp_path / "p0.zip"
+    _mkzip(p0, {
+        "a.txt": "A" * 5000,
+        "docs/references/big.pdf": os.urandom(20000),
+        "old.txt": "vai sumir",
+        "history/run_reports/r1.json": "{}",
+    })
+    snap_a = tmp_path / "snap_a.zip"
+    merge_packs([p0], out_zip=snap_a, tmp_dir=tmp_path / "tmp", trace_id="t1", streaming=True)
+
+    patch = tmp_path / "patch.zip"
+    _mkzip(patch, {"a.txt": "A2", "new.txt": "novo", "history/run_reports/r2.json": "{}"})
+    snap_b = tmp_path / "snap_b.zip"
+    merge_packs([patch], out_zip=snap_b, tmp_dir=tmp_path / "tmp", trace_id="t2", base_zip=snap_a)
+    # tombstone: remove old.txt de B
+    snap_b2 = tmp_path / "snap_b2.zip"
+    with zipfile.ZipFile(snap_b, "r") as zi, zipfile.ZipFile(snap_b2, "w") as zo:
+        for info in zi.infolist():
+            if info.filename != "old.txt":
+                zo.writestr(info, zi.read(info))
+
+    delta = tmp_path / "delta.zip"
+    r = _run_cli(["snapshot-delta", "--from", str(snap_a), "--to", str(snap_b2), "--out", str(delta), "--trace", "D1"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    rep = json.loads((tmp_path / "delta.zip.report.json").read_text(encoding="utf-8"))
+    assert rep["counts"]["tombstones"] == 1
+    with zipfile.ZipFile(delta, "r") as z:
+        names = set(z.namelist())
+        manifest = json.loads(z.read("delta.json"))
+    assert "files/a.txt" in names and "files/new.txt" in names
+    assert "files/docs/references/big.pdf" not in names  # inalterado: não vai no delta
+    assert manifest["tombstones"] == ["old.txt"]
+    assert "a.txt" in manifest["changed"] and "new.txt" in manifest["added"]
+    assert rep["bytes"]["delta_zip"] < rep["bytes"]["to_zip"]
+
+    rebuilt = tmp_path / "rebuilt.zip"
+    r = _run_cli(["snapshot-apply", "--base", str(snap_a), "--delta", str(delta), "--out", str(rebuilt)], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    rep = json.loads((tmp_path / "rebuilt.zip.report.json").read_text(encoding="utf-8"))
+    assert rep["ok"] and rep["byte_identical"]
+    assert sha256_file(rebuilt) == sha256_file(snap_b2)
+
+    # base errada é recusada
+    r = _run_cli(["snapshot-apply", "--base", str(snap_b), "--delta", str(delta), "--out", str(tmp_path / "x.zip")], env, repo_root)
+    assert r.returncode == 2 and "não é o 'from'" in r.stderr
+
+    # --reproducible: delta byte-idêntico entre execuções, datas fixas
+    env.pop("SOURCE_DATE_EPOCH", None)
+    outs = []
+    for k in range(2):
+        out = tmp_path / f"delta_r{k}.zip"
+        r = _run_cli(["snapshot-delta", "--from", str(snap_a), "--to", str(snap_b2), "--out", str(out),
+                      "--trace", "D1", "--reproducible"], env, repo_root)
+        assert r.returncode == 0, r.stderr
+        outs.append(out)
+    assert sha256_file(outs[0]) == sha256_file(outs[1])
+    with zipfile.ZipFile(outs[0], "r") as z:
+        assert {info.date_time for info in z.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+    r = _run_cli(["snapshot-apply", "--base", str(snap_a), "--delta", str(outs[0]), "--out", str(tmp_path / "rebuilt_r.zip"),
+                  "--reproducible"], env, repo_root)
+    assert r.returncode == 0, r.stderr
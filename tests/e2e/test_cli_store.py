@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+from app.utils import sha256_file
+from app.zipio import PackWriter
+
+
+def _run_cli(args: list[str], env: dict[str,str], cwd: Path) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, "-m", "app.cli"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def _mkpack(path: Path, files: dict):
+    with PackWriter(path) as w:
+        for name, content in files.items():
+            w.add_bytes(name, content)
+
+
+def test_cli_store_put_get_gc_and_merge(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    store = tmp_path / "store"
+
+    shared = {
+        "contracts/events/a.schema.json": b'{"type": "object"}' * 200,
+        "docs/runbooks/RUNBOOK.md": b"# runbook\n" * 500,
+    }
+    p0 = tmp_path / "p0.zip"
+    _mkpack(p0, {**shared, "a.txt": b"v1"})
+    p1 = tmp_path / "p1.zip"
+    _mkpack(p1, {**shared, "b.txt": b"v2", "history/run_reports/r1.json": b"{}"})
+
+    r = _run_cli(["store", "put", "--store", str(store), "--pack", str(p0), "--out", str(tmp_path / "put0.json")], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    r = _run_cli(["store", "put", "--store", str(store), "--pack", str(p1), "--out", str(tmp_path / "put1.json")], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    put1 = json.loads((tmp_path / "put1.json").read_text(encoding="utf-8"))
+    assert put1["entries"] == 4 and put1["new_blobs"] == 2 and put1["dedup_entries"] == 2
+
+    # rebuild: só catalog + cópia crua dos blobs
+    out = tmp_path / "p1_rebuilt.zip"
+    r = _run_cli(["store", "get", "--store", str(store), "--name", "p1", "--out", str(out)], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    rep = json.loads((tmp_path / "p1_rebuilt.zip.report.json").read_text(encoding="utf-8"))
+    assert rep["ok"] and rep["byte_identical"]
+    assert sha256_file(out) == sha256_file(p1)
+
+    # merge lendo do store e registrando o snapshot no catalog
+    snap = tmp_path / "snap.zip"
+    r = _run_cli(["merge", "--inputs", "store:p0", "store:p1", "--out", str(snap), "--tmp", str(tmp_path / "tmp"),
+                  "--stream", "--store", str(store)], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    assert (store / "catalog" / "snap.json").exists()
+    with zipfile.ZipFile(snap) as z:
+        assert z.read("docs/runbooks/RUNBOOK.md") == shared["docs/runbooks/RUNBOOK.md"]
+        assert "a.txt" in z.namelist() and "b.txt" in z.namelist()
+
+    # plano sobre refs do store: só o catalog é lido, sem --tmp
+    plan_out = tmp_path / "plan.json"
+    r = _run_cli(["merge", "--plan", "--base", "store:snap", "--inputs", "store:p0", "--out", str(plan_out),
+                  "--store", str(store)], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    plan = json.loads(plan_out.read_text(encoding="utf-8"))
+    assert [(l["path"], l["role"]) for l in plan["layers"]] == [("store:snap", "base"), ("store:p0", "layer")]
+    assert {e["path"]: e["layer"] for e in plan["entries"]}["a.txt"] == 1
+    # --tmp só é exigido pelo merge por extração (sem --stream/--base/--store)
+    r = _run_cli(["merge", "--inputs", str(p0), "--out", str(tmp_path / "x.zip")], env, repo_root)
+    assert r.returncode == 2 and "--tmp" in r.stderr
+    r = _run_cli(["merge", "--inputs", str(p0), "--out", str(tmp_path / "streamed.zip"), "--stream"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    r = _run_cli(["merge", "--base", str(tmp_path / "streamed.zip"), "--inputs", str(p1),
+                  "--out", str(tmp_path / "incremental.zip"), "--trace", "inc"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+
+    # gc: só blobs sem referência no catalog são removidos
+    (store / "catalog" / "p0.json").unlink()
+    (store / "catalog" / "snap.json").unlink()
+    r = _run_cli(["store", "gc", "--store", str(store), "--out", str(tmp_path / "gc.json")], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    gc = json.loads((tmp_path / "gc.json").read_text(encoding="utf-8"))
+    assert gc["blobs_removed"] >= 1 and gc["blobs_kept"] == 4
+    r = _run_cli(["store", "get", "--store", str(store), "--name", "p1", "--out", str(tmp_path / "again.zip")], env, repo_root)
+    assert r.returncode == 0, r.stderr
+
+    r = _run_cli(["store", "get", "--store", str(store), "--name", "p0", "--out", str(tmp_path / "x.zip")], env, repo_root)
+    assert r.returncode == 2 and "não encontrado" in r.stderr
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+from app.hashchain import append_to_file
+from app.merger import merge_packs
+
+
+def _run_cli(args: list[str], env: dict[str,str], cwd: Path) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, "-m", "app.cli"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def _snapshot(path: Path, chain: bytes) -> None:
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("history/chain_state.json", json.dumps({"blocking_reasons": []}))
+        z.writestr("history/hashchain.jsonl", chain)
+
+
+def test_cli_verify_hashchain_parallel_checkpoint_and_resume(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    env["LAI_HASHCHAIN_KEY"] = "segredo-de-teste"
+
+    chain_path = tmp_path / "hashchain.jsonl"
+    for i in range(30):
+        append_to_file(chain_path, f"{i:064x}")
+    snap = tmp_path / "snap.zip"
+    _snapshot(snap, chain_path.read_bytes())
+
+    out = tmp_path / "verify.json"
+    cp_zip = tmp_path / "patch_cp.zip"
+    r = _run_cli(["verify-hashchain", "--target", str(snap), "--out", str(out), "--jobs", "2", "--chunk", "4",
+                  "--checkpoint-every", "10", "--checkpoint-out", str(cp_zip), "--trace", "V1"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    rep = json.loads(out.read_text(encoding="utf-8"))
+    assert rep["ok"] and rep["entries"] == rep["verified_entries"] == 30
+    assert rep["resumed_from"] is None
+    doc_entry = rep["checkpoint_out"]["entry"]
+    with zipfile.ZipFile(cp_zip, "r") as z:
+        doc = json.loads(z.read(doc_entry))
+    assert doc_entry.startswith("history/hashchain_checkpoints/000000000030_")
+    assert [c["entries"] for c in doc["checkpoints"]] == [12, 20, 30]
+    assert doc["signature"]["alg"] == "hmac-sha256"
+
+    # checkpoint aplicado ao snapshot: a próxima verificação só olha o que veio depois
+    snap2 = tmp_path / "snap2.zip"
+    merge_packs([cp_zip], out_zip=snap2, tmp_dir=tmp_path / "tmp", trace_id="m2", base_zip=snap, generate_software_book=False)
+    r = _run_cli(["verify-hashchain", "--target", str(snap2), "--out", str(out), "--jobs", "1"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    rep = json.loads(out.read_text(encoding="utf-8"))
+    assert rep["ok"] and rep["entries"] == 31 and rep["verified_entries"] == 1
+    assert rep["resumed_from"]["entries"] == 30
+
+    # novo checkpoint (mesmo --trace) tem outro nome: aplicá-lo não viola o append-only
+    cp_zip2 = tmp_path / "patch_cp2.zip"
+    r = _run_cli(["verify-hashchain", "--target", str(snap2), "--out", str(out), "--jobs", "1",
+                  "--checkpoint-out", str(cp_zip2), "--trace", "V1"], env, repo_root)
+    assert r.returncode == 0, r.stderr
+    assert json.loads(out.read_text(encoding="utf-8"))["checkpoint_out"]["entry"] != doc_entry
+    merge_packs([cp_zip2], out_zip=tmp_path / "snap3.zip", tmp_dir=tmp_path / "tmp", trace_id="m3", base_zip=snap2,
+                generate_software_book=False)
+
+    # checkpoint com chave errada é ignorado (verificação completa)
+    env_other = {**env, "LAI_HASHCHAIN_KEY": "outra"}
+    r = _run_cli(["verify-hashchain", "--target", str(snap2), "--out", str(out), "--jobs", "1"], env_other, repo_root)
+    assert r.returncode == 0, r.stderr
+    assert json.loads(out.read_text(encoding="utf-8"))["verified_entries"] == 31
+
+
+def test_cli_verify_hashchain_detects_tampering(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(repo_root / "services" / "pack-factory")
+    env.pop("LAI_HASHCHAIN_KEY", None)
+
+    chain_path = tmp_path / "hashchain.jsonl"
+    for i in range(10):
+        append_to_file(chain_path, f"{i:064x}")
+    lines = chain_path.read_text(encoding="utf-8").splitlines()
+    entry = json.loads(lines[5])
+    entry["payload_sha256"] = "f" * 64
+    lines[5] = json.dumps(entry)
+    snap = tmp_path / "snap.zip"
+    _snapshot(snap, ("\n".join(lines) + "\n").encode("utf-8"))
+
+    out = tmp_path / "verify.json"
+    r = _run_cli(["verify-hashchain", "--target", str(snap), "--out", str(out), "--chunk", "3", "--jobs", "2"], env, repo_root)
+    assert r.returncode == 2
+    rep = json.loads(out.read_text(encoding="utf-8"))
+    assert {"index": 5, "error": "hash_mismatch"} in rep["errors"]
+
+    r = _run_cli(["verify-hashchain", "--target", str(snap), "--out", str(out), "--checkpoint-out", str(tmp_path / "cp.zip")], env, repo_root)
+    assert r.returncode == 2 and "exige chave" in r.stderr
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import zipfile
+import zlib
+from pathlib import Path
+
+import pytest
+
+from app.merger import compact_snapshot, merge_packs, plan_merge
+
+
+def _mkzip(path: Path, files: dict):
+    with zipfile.ZipFile(path, "w") as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+
+
+def _read_all(path: Path) -> dict:
+    with zipfile.ZipFile(path, "r") as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def test_streaming_merge_matches_extract_merge(tmp_path: Path):
+    z1 = tmp_path / "p1.zip"
+    z2 = tmp_path / "p2.zip"
+    _mkzip(z1, {
+        "a.txt": "A1",
+        "contracts/x.json": "{}",
+        "runbooks/HOW_TO_RUN.md": "run",
+        "history/hashchain.jsonl": '{"hash": "h0"}\n',
+        "history/run_reports/r1.json": "{}",
+    })
+    _mkzip(z2, {
+        "a.txt": "A2",
+        "b.txt": "B",
+        "history/hashchain.jsonl": '{"hash": "h1"}\n',
+        "history/approvals/ap1.json": json.dumps({"pack_ref": "pack0-meetcore@0.0.1", "decision": "approved"}),
+    })
+
+    out_x = tmp_path / "extract.zip"
+    out_s = tmp_path / "stream.zip"
+    merge_packs([z1, z2], out_zip=out_x, tmp_dir=tmp_path / "tmp", trace_id="t", mode="promoted")
+    merge_packs([z1, z2], out_zip=out_s, tmp_dir=None, trace_id="t", mode="promoted", streaming=True)
+    assert not (tmp_path / "unused").exists()
+
+    ex = _read_all(out_x)
+    st = _read_all(out_s)
+    assert set(ex) == set(st)
+    assert st["a.txt"] == b"A2"
+    for name in ("docs/public/FILEMAP.md", "docs/public/SOFTWARE_BOOK.md", "docs/public/PROMPT_CONTINUIDADE.md"):
+        assert ex[name] == st[name]
+
+    ex_chain = ex["history/hashchain.jsonl"].decode().splitlines()
+    st_chain = st["history/hashchain.jsonl"].decode().splitlines()
+    assert ex_chain[:2] == st_chain[:2] == ['{"hash": "h0"}', '{"hash": "h1"}']
+    assert json.loads(st_chain[-1])["prev_hash"] == "h1"
+    assert json.loads(st["history/chain_state.json"])["next_expected"] == "pack1"
+
+
+def test_streaming_merge_append_only_violation(tmp_path: Path):
+    z1 = tmp_path / "p1.zip"
+    z2 = tmp_path / "p2.zip"
+    _mkzip(z1, {"history/run_reports/r1.json": "{}"})
+    _mkzip(z2, {"history/run_reports/r1.json": '{"x": 1}'})
+    with pytest.raises(RuntimeError, match="append-only violation"):
+        merge_packs([z1, z2], out_zip=tmp_path / "o.zip", tmp_dir=tmp_path / "tmp", streaming=True)
+
+
+def test_incremental_merge_on_base_snapshot(tmp_path: Path):
+    p0 = tmp_path / "p0.zip"
+    patch = tmp_path / "patch_ap.zip"
+    report = json.dumps({"log": "ok " * 20000})
+    _mkzip(p0, {"a.txt": "A", "history/run_reports/r1.json": report})
+    _mkzip(patch, {
+        "history/approvals/ap1.json": json.dumps({"pack_ref": "pack0-meetcore@0.0.1", "decision": "approved"}),
+    })
+
+    base = tmp_path / "snap_v1.zip"
+    merge_packs([p0], out_zip=base, tmp_dir=tmp_path / "tmp", trace_id="t1", streaming=True)
+
+    snap = tmp_path / "snap_v2.zip"
+    merge_packs([patch], out_zip=snap, tmp_dir=tmp_path / "tmp", trace_id="t2", mode="promoted", base_zip=base)
+
+    with zipfile.ZipFile(snap, "r") as z:
+        names = set(z.namelist())
+        assert {"a.txt", "history/run_reports/r1.json", "history/approvals/ap1.json"} <= names
+        assert {"history/merge_receipts/t1.json", "history/merge_receipts/t2.json"} <= names
+        receipt = json.loads(z.read("history/merge_receipts/t2.json"))
+        assert receipt["compression"]["json"]["methods"]["raw"] >= 2
+        assert {"files", "bytes", "compressed_bytes", "ratio", "seconds"} <= set(receipt["compression"]["md"])
+        assert receipt["base"]["path"] == "snap_v1.zip"
+        assert [i["path"] for i in receipt["inputs"]] == ["patch_ap.zip"]
+        chain = [json.loads(ln) for ln in z.read("history/hashchain.jsonl").decode().splitlines()]
+        assert len(chain) == 2
+        assert chain[1]["prev_hash"] == chain[0]["hash"]
+        tail = json.loads(z.read("history/hashchain.tail.json"))
+        info = z.getinfo("history/hashchain.jsonl")
+        assert (tail["bytes"], tail["crc32"], tail["last_hash"]) == (info.file_size, info.CRC, chain[1]["hash"])
+
+    # sidecar adulterado (mantendo CRC/tamanho) não confere com a linha da cauda: é ignorado
+    forged = tmp_path / "forged.zip"
+    with zipfile.ZipFile(snap, "r") as zs, zipfile.ZipFile(forged, "w") as zf:
+        for info in zs.infolist():
+            data = zs.read(info)
+            if info.filename == "history/hashchain.tail.json":
+                data = json.dumps({**json.loads(data), "last_hash": "from-sidecar"}).encode()
+            zf.writestr(info, data)
+    patch2 = tmp_path / "patch_rr.zip"
+    _mkzip(patch2, {"history/run_reports/r2.json": "{}"})
+    out = tmp_path / "snap_v3.zip"
+    merge_packs([patch2], out_zip=out, tmp_dir=tmp_path / "tmp", trace_id="t4", base_zip=forged)
+    with zipfile.ZipFile(out, "r") as z:
+        chain = [json.loads(ln) for ln in z.read("history/hashchain.jsonl").decode().splitlines()]
+        assert z.getinfo("history/hashchain.jsonl").compress_type == zipfile.ZIP_STORED
+        assert chain[-1]["prev_hash"] == chain[-2]["hash"] != "from-sidecar"
+
+    # patch que reescreve history/ da base continua bloqueado
+    bad = tmp_path / "bad.zip"
+    _mkzip(bad, {"history/run_reports/r1.json": '{"x": 1}'})
+    with pytest.raises(RuntimeError, match="append-only violation"):
+        merge_packs([bad], out_zip=tmp_path / "o.zip", tmp_dir=tmp_path / "tmp", trace_id="t3", base_zip=snap)
+
+
+def test_incremental_merge_copies_base_hashchain_raw(tmp_path: Path, monkeypatch):
+    p0 = tmp_path / "p0.zip"
+    _mkzip(p0, {"a.txt": "A", "history/run_reports/r1.json": "{}"})
+    base = tmp_path / "snap_v1.zip"
+    merge_packs([p0], out_zip=base, tmp_dir=None, trace_id="t1", streaming=True)
+    for k in range(2, 5):
+        patch = tmp_path / f"patch{k}.zip"
+        _mkzip(patch, {f"history/run_reports/r{k}.json": "{}"})
+        nxt = tmp_path / f"snap_v{k}.zip"
+        merge_packs([patch], out_zip=nxt, tmp_dir=None, trace_id=f"t{k}", base_zip=base)
+        base = nxt
+    with zipfile.ZipFile(base, "r") as z:
+        base_chain = z.read("history/hashchain.jsonl")
+
+    opened = []
+    real_open = zipfile.ZipFile.open
+
+    def _open(self, name, mode="r", *args, **kwargs):
+        if mode == "r":
+            opened.append((Path(str(self.filename)).name, getattr(name, "filename", name)))
+        return real_open(self, name, mode, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", _open)
+    patch = tmp_path / "patch_last.zip"
+    _mkzip(patch, {"history/run_reports/r9.json": "{}"})
+    snap = tmp_path / "snap_last.zip"
+    merge_packs([patch], out_zip=snap, tmp_dir=None, trace_id="t9", base_zip=base)
+    monkeypatch.undo()
+
+    # a cadeia da base não é descomprimida: cópia crua + CRC continuado
+    assert (base.name, "history/hashchain.jsonl") not in opened
+    with zipfile.ZipFile(snap, "r") as z:
+        assert z.testzip() is None
+        info = z.getinfo("history/hashchain.jsonl")
+        data = z.read(info)
+        tail = json.loads(z.read("history/hashchain.tail.json"))
+    assert data.startswith(base_chain) and data.count(b"\n") == 5
+    chain = [json.loads(ln) for ln in data.decode().splitlines()]
+    assert chain[-1]["prev_hash"] == chain[-2]["hash"]
+    assert (tail["bytes"], tail["crc32"], tail["last_offset"], tail["last_hash"]) == (
+        len(data), zlib.crc32(data), len(base_chain), chain[-1]["hash"])
+
+
+def test_merge_plan_from_central_directories(tmp_path: Path):
+    z1 = tmp_path / "p1.zip"
+    z2 = tmp_path / "p2.zip"
+    _mkzip(z1, {"a.txt": "A1", "history/run_reports/r1.json": "{}", "history/hashchain.jsonl": "{}\n"})
+    _mkzip(z2, {"a.txt": "A2", "history/run_reports/r1.json": "{}", "history/hashchain.jsonl": "{}\n"})
+
+    plan = plan_merge([z1, z2], trace_id="t")
+    assert plan["ok"] is False
+    assert plan["violations"] == [{"path": "history/run_reports/r1.json", "layer": 1, "existing_layer": 0, "reason": "append_only"}]
+    assert [s["layer"] for s in plan["hashchain_sources"]] == [0, 1]
+    a = next(e for e in plan["entries"] if e["path"] == "a.txt")
+    assert a["layer"] == 1 and a["overwritten_layers"] == [0]
+    assert plan["estimate"]["output_bytes"] >= 2
+
+    # merge por extração falha antes de criar qualquer layer em disco
+    tmp = tmp_path / "tmp"
+    with pytest.raises(RuntimeError, match="append-only violation"):
+        merge_packs([z1, z2], out_zip=tmp_path / "o.zip", tmp_dir=tmp)
+    assert not tmp.exists()
+
+
+def test_concurrent_merges_share_tmp_dir(tmp_path: Path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    tmp = tmp_path / "tmp"
+    jobs = []
+    for mod in ("meetcore", "lai-connect", "app-lai", "culture-people"):
+        z = tmp_path / f"pack0-{mod}.zip"
+        _mkzip(z, {f"docs/{mod}.md": mod * 1000, "history/run_reports/r.json": "{}"})
+        jobs.append((z, tmp_path / f"snap-{mod}.zip"))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futs = [pool.submit(merge_packs, [z], out_zip=out, tmp_dir=tmp, trace_id=out.stem) for z, out in jobs]
+        for f in futs:
+            f.result()
+
+    for z, out in jobs:
+        mod = z.stem[len("pack0-"):]
+        with zipfile.ZipFile(out, "r") as zz:
+            assert zz.testzip() is None
+            assert zz.read(f"docs/{mod}.md") == (mod * 1000).encode()
+            assert [n for n in zz.namelist() if n.startswith("docs/") and n.endswith(".md") and "/public/" not in n] == [f"docs/{mod}.md"]
+    # workspaces isolados são removidos ao final
+    assert list(tmp.iterdir()) == []
+
+
+def test_compact_snapshot_folds_lineage(tmp_path: Path):
+    p0 = tmp_path / "p0.zip"
+    patch = tmp_path / "patch_ap.zip"
+    report = json.dumps({"log": "ok " * 20000})
+    _mkzip(p0, {"a.txt": "A", "history/run_reports/r1.json": report})
+    _mkzip(patch, {
+        "02_INVENTORY/manifest.json": "{}",
+        "history/approvals/ap1.json": json.dumps({"pack_ref": "pack0-meetcore@0.0.1", "decision": "approved"}),
+    })
+    snap = tmp_path / "snap.zip"
+    merge_packs([p0, patch], out_zip=snap, tmp_dir=tmp_path / "tmp", trace_id="m1", mode="promoted", streaming=True)
+
+    # snapshot com history/ comprimido (p.ex. reempacotado fora do merge)
+    deflated = tmp_path / "snap_deflated.zip"
+    with zipfile.ZipFile(snap, "r") as zin, zipfile.ZipFile(deflated, "w", zipfile.ZIP_DEFLATED) as zout:
+        for name in zin.namelist():
+            zout.writestr(name, zin.read(name))
+    deflated.replace(snap)
+
+    base = tmp_path / "base.zip"
+    receipt = compact_snapshot(snap, [patch], base, trace_id="c1")
+    assert receipt["lineage"][0]["path"] == "patch_ap.zip"
+    assert receipt["hashchain"]["entries"] == 1
+
+    with zipfile.ZipFile(base, "r") as z:
+        assert z.getinfo("history/approvals/ap1.json").compress_type == zipfile.ZIP_STORED
+        # entrada comprimida no snapshot é regravada STORED, em stream
+        assert z.getinfo("history/run_reports/r1.json").compress_type == zipfile.ZIP_STORED
+        assert z.read("history/run_reports/r1.json").decode() == report
+        chain = [json.loads(ln) for ln in z.read("history/hashchain.jsonl").decode().splitlines()]
+        assert chain[-1]["entry_type"] == "compaction"
+        assert chain[-1]["prev_hash"] == receipt["hashchain"]["head_hash"]
+        stored = json.loads(z.read("history/compactions/c1.json"))
+        for item in stored["history"]:
+            assert hashlib.sha256(z.read(item["path"])).hexdigest() == item["sha256"]
+            assert z.getinfo(item["path"]).file_size == item["bytes"]
+
+    # a base compacta serve de ponto de partida para merge incremental
+    merge_packs([], out_zip=tmp_path / "next.zip", tmp_dir=tmp_path / "tmp", trace_id="m2", base_zip=base)
+
+    # patch fora do snapshot não pode ser "compactado"
+    other = tmp_path / "other.zip"
+    _mkzip(other, {"history/approvals/ap2.json": "{}"})
+    with pytest.raises(ValueError, match="não está incorporado"):
+        compact_snapshot(snap, [other], tmp_path / "bad.zip", trace_id="c2")
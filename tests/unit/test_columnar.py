@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+from app.columnar import ColumnarInventory, fleet_report, write_columnar
+from app.inventory import iter_scan_zip, scan_zip
+
+
+def _mkzip(path: Path, files: dict):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+
+
+def test_columnar_summary_and_join(tmp_path: Path):
+    files = {
+        "docs/a.md": "# a\n" * 100,
+        "docs/b.md": "# b",
+        "contracts/x.schema.json": "{}",
+        "README.md": "",
+        "img/logo.png": b"\x89PNG" + b"\0" * 3000,
+    }
+    a = tmp_path / "a.zip"
+    _mkzip(a, files)
+    b = tmp_path / "b.zip"
+    _mkzip(b, {**{k: v for k, v in files.items() if k != "docs/b.md"}, "docs/a.md": "mudou", "docs/c.md": "# b"})
+
+    write_columnar(iter_scan_zip(a), tmp_path / "a.npz", root=a.name)
+    write_columnar(iter_scan_zip(b), tmp_path / "b.npz", root=b.name)
+
+    inv = ColumnarInventory.load(tmp_path / "a.npz")
+    ref = scan_zip(a)
+    summary = inv.summary()
+    assert summary["files"] == ref["summary"]["files"]
+    assert summary["bytes"] == ref["summary"]["bytes"]
+    assert summary["by_kind"] == ref["summary"]["by_kind"]
+    assert summary["by_prefix"]["docs/"] == {"files": 2, "bytes": 403}
+    assert summary["by_prefix"][""] == {"files": 1, "bytes": 0}
+    assert {"lt": 1, "files": 1} in summary["size_histogram"]
+    assert [inv.path(i) for i in range(inv.rows)] == [it["path"] for it in ref["items"]]
+    assert [inv.sha256(i) for i in range(inv.rows)] == [it["sha256"] for it in ref["items"]]
+
+    rep = fleet_report([tmp_path / "a.npz", tmp_path / "b.npz"])
+    j = rep["joins"][0]
+    assert (j["common_paths"], j["changed"], j["only_from"], j["only_to"]) == (4, 1, 1, 1)
+    # docs/c.md tem o conteúdo do antigo docs/b.md: conta como compartilhado
+    assert j["shared_content_bytes"] == 2 + 0 + 3004 + 3
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+from app.digest_cache import DigestCache
+from app.inventory import scan_zip
+from app.utils import json_bytes, reproducible_mode
+
+
+def _mkzip(path: Path, files: dict):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+
+
+def test_digest_cache_rescan_hashes_only_changed_entries(tmp_path: Path):
+    files = {f"docs/f{i}.md": f"# doc {i}\n" * 100 for i in range(10)}
+    a = tmp_path / "a.zip"
+    _mkzip(a, files)
+    b = tmp_path / "b.zip"
+    _mkzip(b, {**files, "docs/f3.md": "alterado"})
+    cache_path = tmp_path / "digests.jsonl"
+
+    with DigestCache(cache_path) as cache:
+        scan_zip(a, cache=cache)
+        assert cache.stats() == {"hits": 0, "misses": 10, "entries": 10}
+
+    with open(cache_path, "a", encoding="utf-8") as f:
+        f.write('{"p": "truncad')  # linha parcial é ignorada
+
+    with DigestCache(cache_path) as cache, reproducible_mode():
+        cached = scan_zip(b, cache=cache, jobs=4)
+        assert (cache.hits, cache.misses) == (9, 1)
+        assert json_bytes(cached) == json_bytes(scan_zip(b))
+    assert len(DigestCache(cache_path)) == 11
@@ -0,0 +1,57 @@
+import json
+import zipfile
+import zlib
+from pathlib import Path
+
+from app.hashchain import append_to_file, last_line, tail_of_entry, tail_of_file
+
+
+def test_last_line_reads_from_the_end_across_blocks():
+    data = b"".join(json.dumps({"hash": f"h{i}", "pad": "x" * 50}).encode() + b"\n" for i in range(200)) + b"\n\n"
+    reads = []
+
+    def _read(start, end):
+        reads.append(end - start)
+        return data[start:end]
+
+    offset, line = last_line(_read, len(data), block=16)
+    assert json.loads(line)["hash"] == "h199"
+    assert data[offset:].rstrip() == line.encode()
+    assert sum(reads) < 200  # só a cauda foi lida
+    assert last_line(lambda s, e: b"", 0) == (0, "")
+
+
+def test_append_to_file_and_tail_of_entry(tmp_path: Path):
+    chain = tmp_path / "history" / "hashchain.jsonl"
+    first = append_to_file(chain, "a" * 64)
+    second = append_to_file(chain, "b" * 64)
+    lines = [json.loads(ln) for ln in chain.read_text().splitlines()]
+    assert lines[1]["prev_hash"] == lines[0]["hash"] == first["last_hash"]
+    assert tail_of_file(chain) == (second["last_offset"], lines[1]["hash"])
+    assert second["crc32"] == zlib.crc32(chain.read_bytes())
+
+    zp = tmp_path / "s.zip"
+    with zipfile.ZipFile(zp, "w") as z:
+        z.write(chain, "stored.jsonl", compress_type=zipfile.ZIP_STORED)
+        z.write(chain, "deflated.jsonl", compress_type=zipfile.ZIP_DEFLATED)
+        z.write(chain.parent / "hashchain.tail.json", "tail.json")
+        z.writestr("stale.json", json.dumps({**second, "last_hash": "stale", "crc32": 1}))
+        z.writestr("forged_hash.json", json.dumps({**second, "last_hash": "forjado"}))
+        z.writestr("forged_offset.json", json.dumps({**second, "last_offset": 0, "last_hash": lines[0]["hash"]}))
+    with zipfile.ZipFile(zp, "r") as z:
+        expected = (second["last_offset"], lines[1]["hash"])
+        assert tail_of_entry(z, z.getinfo("stored.jsonl")) == expected
+        assert tail_of_entry(z, z.getinfo("deflated.jsonl")) == expected
+        assert tail_of_entry(z, z.getinfo("deflated.jsonl"), z.getinfo("tail.json")) == expected
+        # sidecar que não bate com CRC/tamanho é ignorado
+        assert tail_of_entry(z, z.getinfo("deflated.jsonl"), z.getinfo("stale.json")) == expected
+        assert tail_of_entry(z, z.getinfo("stored.jsonl"), z.getinfo("tail.json")) == expected
+        # sidecar com CRC/tamanho certos mas last_hash/offset que não conferem com a linha
+        for forged in ("forged_hash.json", "forged_offset.json"):
+            assert tail_of_entry(z, z.getinfo("stored.jsonl"), z.getinfo(forged)) == expected
+
+    # CRC continuado do sidecar anterior == CRC do arquivo inteiro; sem sidecar, relido
+    (chain.parent / "hashchain.tail.json").unlink()
+    third = append_to_file(chain, "c" * 64)
+    assert third["crc32"] == zlib.crc32(chain.read_bytes())
+    assert append_to_file(chain, "d" * 64)["crc32"] == zlib.crc32(chain.read_bytes())
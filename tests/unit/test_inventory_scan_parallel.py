@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+import zipfile
+from pathlib import Path
+
+from app.inventory import scan_zip
+from app.utils import json_bytes, reproducible_mode
+
+
+def test_scan_zip_parallel_matches_sequential(tmp_path: Path):
+    zpath = tmp_path / "big.zip"
+    with zipfile.ZipFile(zpath, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for i in range(40):
+            z.writestr(f"dir{i % 3}/f{i:03d}.json", ("{\"i\": %d}\n" % i) * (i * 500 + 1))
+        z.writestr("bin/random.bin", os.urandom(3 * 1024 * 1024))
+        z.writestr("__MACOSX/._junk", "x")
+        z.writestr("stored.txt", "s" * 1000, compress_type=zipfile.ZIP_STORED)
+
+    with reproducible_mode():
+        seq = scan_zip(zpath, trace_id="t", jobs=1)
+        par = scan_zip(zpath, trace_id="t", jobs=4, window=3)
+    assert json_bytes(par) == json_bytes(seq)
+    assert [it["path"] for it in par["items"]][:2] == ["dir0/f000.json", "dir1/f001.json"]
+    assert par["summary"]["files"] == 42
+
+
+def test_iter_scan_zip_bounds_nested_subtrees_in_flight(tmp_path: Path, monkeypatch):
+    import app.inventory as inventory
+    import app.nested as nested_mod
+    from app.inventory import NestedScan, iter_scan_zip
+
+    outer = tmp_path / "outer.zip"
+    with zipfile.ZipFile(outer, "w") as z:
+        for k in range(6):
+            inner = tmp_path / f"n{k}.zip"
+            with zipfile.ZipFile(inner, "w", compression=zipfile.ZIP_DEFLATED) as zi:
+                for i in range(400):
+                    zi.writestr(f"d/f{i:04d}.txt", f"{k}-{i}")
+            z.write(inner, f"packs/n{k}.zip", compress_type=zipfile.ZIP_STORED)
+            z.writestr(f"top{k}.md", "x")
+
+    monkeypatch.setattr(inventory, "NESTED_QUEUE_ITEMS", 8)
+    produced = [0]
+    real_iter = nested_mod.iter_nested
+
+    def _counting(*a, **kw):
+        for item in real_iter(*a, **kw):
+            produced[0] += 1
+            yield item
+
+    monkeypatch.setattr(nested_mod, "iter_nested", _counting)
+
+    seq = list(iter_scan_zip(outer, jobs=1, nested=NestedScan()))
+    produced[0] = 0
+    consumed = 0
+    par = []
+    for item in iter_scan_zip(outer, jobs=3, nested=NestedScan()):
+        par.append(item)
+        if "::" in item["path"]:
+            consumed += 1
+            # no máximo jobs filas de 8 itens (+1 item na mão de cada produtor)
+            assert produced[0] - consumed <= 3 * (8 + 1)
+    assert par == seq and consumed == 6 * 400
+
+    # gerador fechado no meio: produtores bloqueados na fila não travam o fim
+    gen = iter_scan_zip(outer, jobs=3, nested=NestedScan())
+    for _ in range(20):
+        next(gen)
+    gen.close()
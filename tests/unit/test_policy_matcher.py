@@ -0,0 +1,72 @@
+import re
+
+from app.policy_matcher import PrefixTrie, combine_regexes, compile_policy
+from app.public_export import PublicExportPolicy, is_public_path
+
+
+AUDIENCE = {
+    "allowlist_prefixes": ["docs/", "02_INVENTORY/", "contracts/"],
+    "denylist_prefixes": ["docs/references/", "02_INVENTORY/semantic_index/", "history/"],
+    "denylist_regex": ["\\.pyc$", "^⚠️"],
+}
+PUBLIC = PublicExportPolicy(exclude_prefixes=["docs/private/"], exclude_name_regexes=["NUCLEOS", "[invalid"])
+
+
+def _reference(rel: str):
+    # avaliação original do export-team-pack (laços any(startswith) + regex por regex)
+    base = rel.split("/")[-1]
+    if any(rel.startswith(p) for p in AUDIENCE["denylist_prefixes"]):
+        return "deny_prefix"
+    if any(re.search(rx, base) for rx in AUDIENCE["denylist_regex"]):
+        return "deny_regex"
+    if not any(rel.startswith(p) for p in AUDIENCE["allowlist_prefixes"]):
+        return "outside_allowlist"
+    if any(rel.startswith(p) for p in PUBLIC.exclude_prefixes):
+        return "public_prefix"
+    if re.search("NUCLEOS", base, re.IGNORECASE):
+        return "public_regex"
+    return None
+
+
+def test_policy_matcher_matches_reference_semantics():
+    names = [
+        "docs/a.md", "docs/references/x.pdf", "docs/refs.md", "history/h.json", "docs/m.pyc",
+        "docs/⚠️ aviso.md", "services/app.py", "README.md", "docs/private/p.md", "docs/nucleos.md",
+        "02_INVENTORY/semantic_index/i.jsonl", "02_INVENTORY/manifest.json", "contracts/deep/x/y.json",
+        "docs\\win\\path.md",
+    ]
+    m = compile_policy(AUDIENCE, PUBLIC)
+    want = [_reference(n.replace("\\", "/")) for n in names]
+    assert m.classify_batch(names) == want
+    assert [m.classify(n.replace("\\", "/")) for n in names] == want
+    assert want.count(None) == 5
+
+    # prefixo que não termina em '/' desliga a memorização por diretório e continua correto
+    aud = dict(AUDIENCE, denylist_prefixes=["docs/ref"])
+    m2 = compile_policy(aud)
+    assert m2.classify_batch(["docs/refs.md", "docs/references/x.pdf", "docs/a.md"]) == ["deny_prefix", "deny_prefix", None]
+
+
+def test_policy_matcher_cache_and_trie():
+    assert compile_policy(AUDIENCE, PUBLIC) is compile_policy(dict(AUDIENCE), PUBLIC)
+    assert compile_policy(AUDIENCE) is not compile_policy(AUDIENCE, PUBLIC)
+
+    t = PrefixTrie(["docs/", "docs/references/", "dados/"])
+    assert t.size == 2  # docs/references/ já coberto por docs/
+    rx = t.compile()
+    assert rx.match("docs/x") and rx.match("dados/y") and not rx.match("doc/x")
+    assert PrefixTrie().compile() is None
+
+    # regex inválido da public policy é ignorado (como antes)
+    assert not is_public_path("a/NUCLEOS.md", PUBLIC)
+    assert is_public_path("a/b.md", PUBLIC)
+
+
+def test_combine_regexes_keeps_backreferences():
+    rx = combine_regexes(["(b)", r"(a)\1", r"\.pyc$"])
+    assert rx.search("aa") and rx.search("b") and rx.search("x.pyc")
+    assert not rx.search("ac")
+    assert combine_regexes([r"(?P<n>x)(?P=n)", r"(?P<n>y)"]).search("xx")
+
+    m = compile_policy({"denylist_regex": ["(b)", r"(a)\1"]})
+    assert m.classify_batch(["docs/aa.md", "docs/ac.md"]) == ["deny_regex", None]
@@ -1,3 +1,4 @@
+import hashlib
 import zipfile
 from pathlib import Path
 
@@ -19,3 +20,103 @@ def test_resolve_zip_chain(tmp_path: Path):
     b, rep = resolve_zip_chain(ref)
     assert b == b"hello-plan"
     assert rep["bytes"] == len(b)
+
+
+def test_resolve_zip_chain_nested_without_reading_intermediates(tmp_path: Path, monkeypatch):
+    import app.nested
+
+    c = tmp_path / "C.zip"
+    with zipfile.ZipFile(c, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("deep/file.txt", "no fundo")
+    b = tmp_path / "B.zip"
+    with zipfile.ZipFile(b, "w") as z:
+        z.write(c, "C.zip", compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("pad.bin", b"\0" * 100_000)
+    a = tmp_path / "A.zip"
+    with zipfile.ZipFile(a, "w") as z:
+        z.write(b, "packs/B.zip", compress_type=zipfile.ZIP_STORED)
+
+    # intermediários nunca passam por ZipFile.read; spool comprimido vai para disco
+    monkeypatch.setattr(app.nested, "SPOOL_MEM_BYTES", 16)
+    real_read = zipfile.ZipFile.read
+
+    def _read(self, name, pwd=None):
+        assert not str(getattr(name, "filename", name)).endswith(".zip")
+        return real_read(self, name, pwd)
+
+    monkeypatch.setattr(zipfile.ZipFile, "read", _read)
+    body, rep = resolve_zip_chain(f"zip::{a}::packs/B.zip::C.zip::deep/file.txt")
+    assert body == "no fundo".encode("utf-8")
+    assert rep["bytes"] == len(body)
+
+
+def test_iter_glob_chain_walks_nested_archives(tmp_path: Path, monkeypatch):
+    from app.resolver import iter_glob_chain
+
+    def _inner(name: str, files: dict) -> Path:
+        p = tmp_path / name
+        with zipfile.ZipFile(p, "w", compression=zipfile.ZIP_DEFLATED) as z:
+            for k, v in files.items():
+                z.writestr(k, v)
+        return p
+
+    b1 = _inner("B1.zip", {"docs/a.md": "a1", "docs/sub/deep.md": "d1", "docs/x.txt": "no"})
+    b2 = _inner("B2.zip", {"docs/b.md": "b2", "other/c.md": "no"})
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w") as z:
+        z.write(b1, "B1.zip", compress_type=zipfile.ZIP_STORED)
+        z.write(b2, "B2.zip", compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("notzip.zip", "x")
+        z.writestr("docs/top.md", "top")
+
+    opened = []
+    real_open = zipfile.ZipFile.open
+
+    def _counting_open(self, name, *a, **kw):
+        opened.append(getattr(name, "filename", name))
+        return real_open(self, name, *a, **kw)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", _counting_open)
+
+    got = []
+    for ref, stream, sha in iter_glob_chain(f"zip::{bundle}::*.zip::docs/**/*.md"):
+        data = stream.read()
+        assert hashlib.sha256(data).hexdigest() == sha
+        got.append((ref, data))
+    assert got == [
+        (f"zip::{bundle}::B1.zip::docs/a.md", b"a1"),
+        (f"zip::{bundle}::B1.zip::docs/sub/deep.md", b"d1"),
+        (f"zip::{bundle}::B2.zip::docs/b.md", b"b2"),
+    ]
+    # cada entrada casada é descomprimida uma vez só (hash + stream do mesmo spool)
+    assert sorted(n for n in opened if n.endswith(".md")) == ["docs/a.md", "docs/b.md", "docs/sub/deep.md"]
+    # refs concretas resolvem direto
+    assert resolve_zip_chain(got[1][0])[0] == b"d1"
+    assert [r for r, _, _ in iter_glob_chain(f"zip::{tmp_path}/bund*.zip::docs/*.md")] == [f"zip::{bundle}::docs/top.md"]
+
+
+def test_open_ref_and_range_reads(tmp_path: Path):
+    from app.resolver import open_ref, read_ref_range
+
+    payload = bytes(range(256)) * 4000
+    inner = tmp_path / "B.zip"
+    with zipfile.ZipFile(inner, "w") as z:
+        z.writestr("big.jsonl", payload, compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("raw.pdf", payload, compress_type=zipfile.ZIP_STORED)
+    outer = tmp_path / "A.zip"
+    with zipfile.ZipFile(outer, "w") as z:
+        z.write(inner, "B.zip", compress_type=zipfile.ZIP_STORED)
+
+    for name in ("big.jsonl", "raw.pdf"):
+        ref = f"zip::{outer}::B.zip::{name}"
+        with open_ref(ref) as f:
+            assert f.seekable()
+            f.seek(1000)
+            assert f.read(10) == payload[1000:1010]
+            f.seek(5)
+            assert f.read(3) == payload[5:8]
+        data, rep = read_ref_range(ref, 100, 4196)
+        assert data == payload[100:4196] and "sha256" not in rep
+        assert rep["range"] == {"start": 100, "end": 4196}
+        tail, rep = read_ref_range(ref, len(payload) - 7, None, with_hash=True)
+        assert tail == payload[-7:] and rep["sha256"] == hashlib.sha256(tail).hexdigest()
@@ -0,0 +1,57 @@
+import io
+
+import app.secret_scan as secret_scan
+from app.secret_scan import MarkerScanner, SECRET_PATTERNS, SecretPattern
+
+
+def test_marker_scanner_across_chunks_and_overlapping_markers(monkeypatch):
+    monkeypatch.setattr(secret_scan, "SCAN_CHUNK", 1000)
+    scanner = MarkerScanner(SECRET_PATTERNS)
+    token = "sk-ant-" + "a" * 30
+
+    # marcador cruzando a fronteira de chunk: offset absoluto
+    for pad in (0, 990, 995, 1000, 2490, 5000):
+        data = b"." * pad + token.encode("ascii") + b"\n" + b"." * 50
+        hit, read = scanner.scan_stream(io.BytesIO(data))
+        assert hit == (pad, "anthropic_api_key"), pad
+
+    # sem confirmação do regex não é achado; "sk-" mais curto não esconde "sk-ant-"
+    assert scanner.scan_stream(io.BytesIO(b"AKIA curto, sk- nada"))[0] is None
+    assert scanner.first_match(b"xsk-" + b"B" * 24) == (1, "openai_api_key")
+
+    # marcador sobreposto (começa dentro de outro) e early exit no primeiro
+    monkeypatch.setattr(secret_scan, "SCAN_MAX_SECRET", 100)
+    s = MarkerScanner([SecretPattern("ab", "abc", r"abcX"), SecretPattern("cd", "cde")])
+    data = b"abcde" + b"z" * 5000 + b"abcX"
+    hit, read = s.scan_stream(io.BytesIO(data))
+    assert hit == (2, "cd")
+    assert read < len(data)
+
+
+def test_long_jwt_found_at_any_chunk_position(monkeypatch):
+    monkeypatch.setattr(secret_scan, "SCAN_CHUNK", 4096)
+    scanner = MarkerScanner(SECRET_PATTERNS)
+    jwt = b"eyJhbGciOiJIUzI1NiJ9." + b"eyJ" + b"p" * 700 + b"." + b"s" * 43
+    for pad in (0, 4096 - 10, 4096 - 600, 4096 - len(jwt) + 5, 3 * 4096 - 300):
+        data = b"." * pad + jwt + b"\n" + b"." * 5000
+        assert scanner.scan_stream(io.BytesIO(data))[0] == (pad, "jwt"), pad
+    # marcador não confirmado perto do fim de um chunk não esconde o segredo seguinte
+    data = b"." * 4090 + b"eyJ nada " + b"." * 100 + jwt
+    assert scanner.scan_stream(io.BytesIO(data))[0] == (4090 + 9 + 100, "jwt")
+
+
+def test_ignore_case_marker_finds_env_var_form():
+    scanner = MarkerScanner(SECRET_PATTERNS)
+    value = b"=abcdefghijklmnopqrstuvwxyz1234"
+    for name in (b"AWS_SECRET_ACCESS_KEY", b"aws_secret_access_key", b"Aws_Secret_Access_Key"):
+        assert scanner.scan_stream(io.BytesIO(b"export " + name + value + b"\n"))[0] == (7, "aws_secret_access_key"), name
+    assert scanner.first_match(b"AWS_SECRET_ACCESS_KEY=curto") is None
+
+    # marcadores exatos e ignore_case convivem; prefixo de um é candidato do outro
+    s = MarkerScanner([SecretPattern("exact", "TOKEN_X"), SecretPattern("folded", "token", r"(?i)token=\S+", ignore_case=True)])
+    assert s.first_match(b"..TOKEN=abc") == (2, "folded")
+    assert s.first_match(b"..TOKEN_X") == (2, "exact")
+    assert s.first_match(b"..token_x") is None
+    assert secret_scan.secret_patterns_from_policy(
+        {"secret_patterns": [{"id": "k", "marker": "KEY", "ignore_case": True}]}
+    )[0].ignore_case
@@ -0,0 +1,96 @@
+import fcntl
+import json
+import zipfile
+from pathlib import Path
+
+from app.store import PackStore
+from app.zipio import PackWriter
+
+
+def _lock_is_held(store: PackStore) -> bool:
+    with (store.root / ".store.lock").open("a+b") as fh:
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        return False
+
+
+def test_put_holds_store_lock_for_blobs_and_catalog(tmp_path: Path, monkeypatch):
+    pack = tmp_path / "p.zip"
+    with PackWriter(pack) as w:
+        w.add_bytes("a.txt", b"a" * 1000)
+        w.add_bytes("docs/b.md", b"# b\n" * 100, compress_type=zipfile.ZIP_STORED)
+    store = PackStore(tmp_path / "store")
+
+    held = []
+    put_entry = PackStore._put_entry
+    write_catalog = Path.write_bytes
+
+    def _spy_entry(self, z, info):
+        held.append(("blob", _lock_is_held(self)))
+        return put_entry(self, z, info)
+
+    def _spy_write(path, data):
+        if path.parent.name == "catalog":
+            held.append(("catalog", _lock_is_held(store)))
+        return write_catalog(path, data)
+
+    monkeypatch.setattr(PackStore, "_put_entry", _spy_entry)
+    monkeypatch.setattr(Path, "write_bytes", _spy_write)
+    rep = store.put(pack)
+    monkeypatch.undo()
+
+    assert rep["entries"] == 2 and rep["new_blobs"] == 2
+    assert held == [("blob", True), ("blob", True), ("catalog", True)]
+    assert not _lock_is_held(store)
+
+    # blobs crus (write_raw_entry) reconstroem o pack idêntico
+    assert store.get("p", tmp_path / "out.zip")["byte_identical"]
+
+
+def test_merge_and_export_read_store_refs_without_rebuild(tmp_path: Path, monkeypatch):
+    from app.exporter import export_team_pack
+    from app.merger import merge_packs
+    from app.utils import sha256_file
+
+    p0 = tmp_path / "p0.zip"
+    p1 = tmp_path / "p1.zip"
+    with PackWriter(p0) as w:
+        w.add_bytes("docs/a.md", b"# a\n" * 300)
+        w.add_bytes("docs/references/x.pdf", b"%PDF", compress_type=zipfile.ZIP_STORED)
+        w.add_bytes("history/hashchain.jsonl", b"")
+    with PackWriter(p1) as w:
+        w.add_bytes("docs/b.md", b"# b\n" * 300)
+        w.add_bytes("history/run_reports/r1.json", b"{}")
+    store = PackStore(tmp_path / "store")
+    store.put(p0)
+    store.put(p1)
+
+    def _no_rebuild(*a, **kw):
+        raise AssertionError("store ref reconstruído")
+
+    monkeypatch.setattr(PackStore, "get", _no_rebuild)
+    snap = tmp_path / "snap.zip"
+    merge_packs([Path("store:p0"), Path("store:p1")], out_zip=snap, tmp_dir=tmp_path / "tmp", trace_id="m1",
+                generate_software_book=False, store=store)
+    plain = tmp_path / "plain.zip"
+    merge_packs([p0, p1], out_zip=plain, tmp_dir=tmp_path / "tmp", trace_id="m1", generate_software_book=False, streaming=True)
+
+    with zipfile.ZipFile(snap) as z, zipfile.ZipFile(plain) as zp:
+        assert z.testzip() is None
+        for n in ("docs/a.md", "docs/b.md", "docs/references/x.pdf", "history/run_reports/r1.json"):
+            assert z.read(n) == zp.read(n)
+            assert z.getinfo(n).compress_type == zp.getinfo(n).compress_type
+        receipt = json.loads(z.read("history/merge_receipts/m1.json"))
+    assert receipt["inputs"] == [{"path": "store:p0", "sha256": sha256_file(p0)}, {"path": "store:p1", "sha256": sha256_file(p1)}]
+    assert store.has("snap")
+
+    repo_root = Path(__file__).resolve().parents[2]
+    rep = export_team_pack(repo_root, Path("store:snap"), tmp_path / "team.zip", "t1", store=store)
+    assert rep["in"] == "store:snap" and store.has("team")
+    with zipfile.ZipFile(tmp_path / "team.zip") as z:
+        assert z.testzip() is None
+        assert z.read("docs/a.md") == b"# a\n" * 300
+        assert "docs/references/x.pdf" not in z.namelist()
@@ -0,0 +1,98 @@
+import os
+import zipfile
+from pathlib import Path
+
+from app.compression import CompressionPolicy
+from app.zipio import PackWriter, copy_entry_raw
+
+
+def test_copy_entry_raw_keeps_compressed_bytes(tmp_path: Path):
+    src = tmp_path / "src.zip"
+    with zipfile.ZipFile(src, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("docs/a.md", "conteudo " * 500)
+        z.writestr("docs/b.bin", b"\x00\x01" * 10, compress_type=zipfile.ZIP_STORED)
+
+    dst = tmp_path / "dst.zip"
+    with zipfile.ZipFile(src, "r") as zs, zipfile.ZipFile(dst, "w") as zd:
+        for info in zs.infolist():
+            copy_entry_raw(zs, info, zd, arcname="copy/" + info.filename)
+
+    with zipfile.ZipFile(src, "r") as zs, zipfile.ZipFile(dst, "r") as zd:
+        assert zd.testzip() is None
+        for info in zs.infolist():
+            out = zd.getinfo("copy/" + info.filename)
+            assert (out.CRC, out.compress_size, out.compress_type) == (info.CRC, info.compress_size, info.compress_type)
+            assert zd.read(out) == zs.read(info)
+
+
+def test_pack_writer_sorted_and_parallel(tmp_path: Path):
+    f = tmp_path / "big.txt"
+    f.write_text("linha\n" * 5000)
+    src = tmp_path / "src.zip"
+    with zipfile.ZipFile(src, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("raw.md", "raw")
+
+    out = tmp_path / "out.zip"
+    with zipfile.ZipFile(src, "r") as zs:
+        # janela minúscula força drenagem intercalada com a compressão
+        with PackWriter(out, jobs=4, max_inflight_bytes=64, stream_threshold=32) as w:
+            w.add_bytes("c.txt", b"c" * 40)
+            w.add_file(f, "a/big.txt")
+            w.add_entry(zs, zs.getinfo("raw.md"), "b/raw.md")
+            w.add_stream("d.jsonl", lambda fh: fh.write(b"{}\n"))
+            for i in range(20):
+                w.add_bytes(f"e/{i:02d}.txt", str(i).encode())
+
+    with zipfile.ZipFile(out, "r") as z:
+        assert z.testzip() is None
+        names = z.namelist()
+        assert names == sorted(names)
+        assert z.read("a/big.txt") == f.read_bytes()
+        assert z.read("b/raw.md") == b"raw"
+        assert z.read("c.txt") == b"c" * 40
+        assert z.read("d.jsonl") == b"{}\n"
+        assert z.read("e/07.txt") == b"7"
+
+
+def test_pack_writer_compression_policy_and_stats(tmp_path: Path):
+    out = tmp_path / "out.zip"
+    with PackWriter(out, jobs=2, stream_threshold=1024, policy=CompressionPolicy(lzma_min_bytes=50_000)) as w:
+        w.add_bytes("docs/references/a.pdf", b"%PDF-1.4 " * 200)
+        w.add_bytes("bin/random.dat", os.urandom(4096))
+        w.add_bytes("bin/zeros.dat", b"\x00" * 4096)
+        w.add_bytes("docs/small.md", b"# titulo\n" * 100)
+        w.add_bytes("data/big.jsonl", b'{"k": "v"}\n' * 10_000)
+        w.add_bytes("forced.md", b"x" * 100, compress_type=zipfile.ZIP_STORED)
+
+    with zipfile.ZipFile(out, "r") as z:
+        assert z.testzip() is None
+        types = {i.filename: i.compress_type for i in z.infolist()}
+        assert z.read("data/big.jsonl") == b'{"k": "v"}\n' * 10_000
+    assert types == {
+        "bin/random.dat": zipfile.ZIP_STORED,
+        "bin/zeros.dat": zipfile.ZIP_DEFLATED,
+        "data/big.jsonl": zipfile.ZIP_LZMA,
+        "docs/references/a.pdf": zipfile.ZIP_STORED,
+        "docs/small.md": zipfile.ZIP_DEFLATED,
+        "forced.md": zipfile.ZIP_STORED,
+    }
+    stats = w.stats.to_dict()
+    assert stats["pdf"]["methods"] == {"stored": 1}
+    assert stats["md"]["methods"] == {"deflated": 1, "stored": 1}
+    assert stats["json"]["ratio"] < 0.1 and "seconds" in stats["json"]
+
+
+def test_pack_writer_lzma_in_pool_and_serial(tmp_path: Path):
+    out = tmp_path / "out.zip"
+    small = b'{"linha": 1}\n' * 2_000  # <= stream_threshold: comprimido no pool
+    big = b'{"linha": 2}\n' * 20_000  # > stream_threshold: serial
+    with PackWriter(out, jobs=4, stream_threshold=64 * 1024, policy=CompressionPolicy(lzma_min_bytes=1024)) as w:
+        w.add_bytes("data/small.jsonl", small)
+        w.add_bytes("data/big.jsonl", big)
+
+    with zipfile.ZipFile(out, "r") as z:
+        assert z.testzip() is None
+        assert z.getinfo("data/small.jsonl").compress_type == zipfile.ZIP_LZMA
+        assert z.getinfo("data/big.jsonl").compress_type == zipfile.ZIP_LZMA
+        assert z.read("data/small.jsonl") == small
+        assert z.read("data/big.jsonl") == big